@@ -0,0 +1,99 @@
+#Compares copy-on-write forks (branching.fork) with copy.deepcopy for taking a snapshot of a game: the
+#time and the memory (tracemalloc) of the snapshot itself, and of a what-if branch that makes one
+#offshore move and advances 24 months. Also measures the cost of an undoable action (Timeline.apply)
+#against a plain engine.apply_action, and checks that the fork and the deep copy end up identical. Both
+#copies are timed under tracemalloc, which slows the many allocations of deepcopy the most.
+#
+#Usage: python benchmarks/bench_branching.py [--sizes 1000,10000,100000] [--products 2]
+
+import argparse
+import copy
+import gc
+import itertools
+import time
+import tracemalloc
+
+from synthetic import make_state
+
+import branching
+import engine
+
+
+def measured(function):
+    """
+    This function calls function() under tracemalloc.
+
+    :return: a tuple of (result, seconds, bytes still allocated by the call).
+    """
+    # A collection of the whole portfolio falling inside a measurement would swamp a fork.
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, allocated
+
+
+def offshore_move(state):
+    """
+    This function returns the what-if actions: move the first company that is not offshore into the
+    first offshore company.
+    """
+    company = next(company for company in state.companies if not company.offshore)
+    return [('add_company_to_offshore', (0, company.id))]
+
+
+def deep_what_if(state, actions, months):
+    branch = copy.deepcopy(state)
+    for action, args in actions:
+        engine.apply_action(branch, action, *args)
+    engine.advance_months(branch, months)
+    return branch
+
+
+def figures(state):
+    return (state.cash_balance, state.months_passed, state.total_taxed_profit,
+            [(company.revenue, company.profit_margin, company.offshore_id, company.taxed_profit) for company in state.companies])
+
+
+def per_call(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare copy-on-write forks with deepcopy.")
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--products', type=int, default=2)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'companies':>10} | {'snapshot':<8} {'deepcopy':>19} {'fork':>19} | {'what-if':<8} {'deepcopy':>19} {'fork':>19} | same")
+    for size in map(int, args.sizes.split(',')):
+        state = make_state(size, product_count=args.products)
+        state.cash_balance = 1e12
+        # The first fork turns the lists into SharedLists, a one-off conversion.
+        branching.fork(state)
+        actions = offshore_move(state)
+        _, fork_time, fork_bytes = measured(lambda: branching.fork(state))
+        forked, fork_branch_time, fork_branch_bytes = measured(lambda: branching.what_if(state, actions, 24))
+        _, deep_time, deep_bytes = measured(lambda: copy.deepcopy(state))
+        deep, deep_branch_time, deep_branch_bytes = measured(lambda: deep_what_if(state, actions, 24))
+        same = figures(deep) == figures(forked)
+        del _, deep, forked
+        print(f"{size:>10} | {'':<8} {deep_time * 1e3:8.2f} ms {deep_bytes / 2 ** 20:6.2f} MB {fork_time * 1e3:8.3f} ms {fork_bytes / 2 ** 10:6.1f} KB | "
+              f"{'':<8} {deep_branch_time * 1e3:8.2f} ms {deep_branch_bytes / 2 ** 20:6.2f} MB {fork_branch_time * 1e3:8.3f} ms {fork_branch_bytes / 2 ** 10:6.1f} KB | "
+              f"{'yes' if same else 'NO'}")
+
+    state = make_state(10000, product_count=args.products)
+    state.cash_balance = 1e12
+    indexes = itertools.cycle(range(len(state.companies)))
+    plain = per_call(lambda: engine.apply_action(state, 'add_product', next(indexes), "Product", 100), args.calls)
+    timeline = branching.Timeline(state, limit=args.calls)
+    undoable = per_call(lambda: timeline.apply('add_product', next(indexes), "Product", 100), args.calls)
+    undo = per_call(timeline.undo, args.calls)
+    print(f"add_product on 10000 companies: plain {plain * 1e6:.1f} us, undoable {undoable * 1e6:.1f} us, undo {undo * 1e6:.1f} us")
@@ -0,0 +1,73 @@
+#Compares the bulk actions with the same changes made one action at a time through engine.apply_action:
+#creating thousands of Construction companies, attaching 50 products to every Dropshipping company and
+#moving a third of the companies into an offshore company. Checks that both ways end up with the same
+#companies and cash balance.
+#
+#Usage: python benchmarks/bench_bulk.py [--companies 5000] [--products 50]
+
+import argparse
+import time
+
+from synthetic import load_catalogs
+
+import engine
+
+
+def company_fields(state):
+    return [(company.revenue, company.profit_margin, company.capital, company.offshore_id, len(company.products))
+            for company in state.companies]
+
+
+def build(catalogs, steps, bulk):
+    """
+    This function plays the steps on a new game, either as bulk actions or one item at a time.
+
+    :param steps: a list of (single action, bulk action, function returning the list of items) triples;
+    every item is a tuple of the single action's arguments
+    :return: a tuple of (game, seconds per step).
+    """
+    state = engine.new_game("Bulk", 0.75, *catalogs)
+    state.cash_balance = 1e15
+    engine.apply_action(state, 'create_offshore_company', 0, "Offshore")
+    times = []
+    for single, bulk_action, items in steps:
+        items = items(state)
+        start = time.perf_counter()
+        if bulk:
+            if bulk_action == 'add_companies_to_offshore':
+                engine.apply_action(state, bulk_action, 0, [company_index for _, company_index in items])
+            else:
+                engine.apply_action(state, bulk_action, items)
+        else:
+            for item in items:
+                engine.apply_action(state, single, *item)
+        times.append(time.perf_counter() - start)
+    return state, times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the bulk actions with one action per item.")
+    parser.add_argument('--companies', type=int, default=5000)
+    parser.add_argument('--products', type=int, default=50)
+    args = parser.parse_args()
+
+    catalogs = load_catalogs()
+    names = [business_type['name'] for business_type in catalogs[0]]
+    construction, dropshipping = names.index('Construction'), names.index('Dropshipping')
+    steps = [
+        ('create_company', 'create_companies',
+         lambda state: [(construction, f"Construction {i}", 600000) for i in range(args.companies)]
+         + [(dropshipping, f"Shop {i}", 2000) for i in range(args.companies)]),
+        ('add_product', 'add_products',
+         lambda state: [(company.id, f"Product {k}", 500) for company in state.companies
+                        if company.industry == 'Dropshipping' for k in range(args.products)]),
+        ('add_company_to_offshore', 'add_companies_to_offshore',
+         lambda state: [(0, company.id) for company in state.companies if company.id % 3 == 0]),
+    ]
+    single, single_times = build(catalogs, steps, bulk=False)
+    bulk, bulk_times = build(catalogs, steps, bulk=True)
+    for (name, bulk_name, _), single_time, bulk_time in zip(steps, single_times, bulk_times):
+        print(f"{bulk_name:<26} one at a time {single_time * 1e3:9.1f} ms, bulk {bulk_time * 1e3:9.1f} ms ({single_time / bulk_time:4.1f}x)")
+    same = single.cash_balance == bulk.cash_balance and company_fields(single) == company_fields(bulk)
+    print(f"same companies and cash balance: {'yes' if same else 'NO'}; "
+          f"monthly cash flows differ by {abs(single.total_taxed_profit - bulk.total_taxed_profit) / abs(single.total_taxed_profit):.2g} relative")
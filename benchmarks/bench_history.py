@@ -0,0 +1,59 @@
+#Measures what recording the monthly history costs per month, and how fast it is exported, for
+#growing portfolios.
+#
+#Usage: python benchmarks/bench_history.py [--months N] [--budget MB] [company_count ...]
+#Defaults to 600 months with an 8 MB budget for 10^3, 10^4 and 10^5 companies.
+
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic import make_state
+
+import engine
+import history
+
+
+def run(company_count, months, budget, directory):
+    state = make_state(company_count)
+    start = time.perf_counter()
+    for _ in range(months):
+        engine.advance_month(state)
+    bare = (time.perf_counter() - start) / months
+
+    results = []
+    for companies in (False, True):
+        state.history = history.HistoryRecorder(memory_budget=budget, companies=companies)
+        start = time.perf_counter()
+        for _ in range(months):
+            engine.advance_month(state)
+        results.append((time.perf_counter() - start) / months)
+    recorder = state.history
+
+    csv_path = os.path.join(directory, 'history.csv')
+    binary_path = os.path.join(directory, 'history.bin')
+    start = time.perf_counter()
+    with open(csv_path, 'w', newline='') as file:
+        recorder.write_csv(file, 'companies')
+    csv_time = time.perf_counter() - start
+    start = time.perf_counter()
+    with open(binary_path, 'wb') as file:
+        recorder.write_binary(file, 'companies')
+    binary_time = time.perf_counter() - start
+
+    print(f"{company_count:>7} companies | month {bare * 1e6:8.1f} us, with portfolio history {results[0] * 1e6:8.1f} us, "
+          f"with company history {results[1] * 1e6:10.1f} us | {len(recorder.companies):>4} company rows in "
+          f"{recorder.nbytes() / 1e6:5.2f} MB | CSV {os.path.getsize(csv_path) / 1e6:7.1f} MB in {csv_time * 1000:8.1f} ms | "
+          f"binary {os.path.getsize(binary_path) / 1e6:5.2f} MB in {binary_time * 1000:6.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure history recording and export.")
+    parser.add_argument('sizes', nargs='*', type=int, default=[10 ** 3, 10 ** 4, 10 ** 5])
+    parser.add_argument('--months', type=int, default=600)
+    parser.add_argument('--budget', type=float, default=8, help="memory budget in MB")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            run(size, args.months, int(args.budget * 1024 * 1024), directory)
@@ -0,0 +1,53 @@
+#Measures what the instrumentation costs per action: engine.apply_action without an Instrumentation, with
+#one that only times, and with one that also tracks net memory blocks, against calling the engine function
+#directly. Also times a snapshot and a dump of the measurements.
+#
+#Usage: python benchmarks/bench_instrumentation.py [--calls N]
+
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic import make_state
+
+import engine
+import instrumentation
+
+
+def per_call(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the cost of the action instrumentation.")
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+
+    state = make_state(1000)
+    direct = per_call(lambda: engine.advance_month(state), args.calls)
+    disabled = per_call(lambda: engine.apply_action(state, 'advance_month'), args.calls)
+    state.instrumentation = instrumentation.Instrumentation(net_blocks=False)
+    timed = per_call(lambda: engine.apply_action(state, 'advance_month'), args.calls)
+    state.instrumentation = instrumentation.Instrumentation()
+    blocks = per_call(lambda: engine.apply_action(state, 'advance_month'), args.calls)
+
+    print(f"advance_month called directly       {direct * 1e9:8.0f} ns")
+    print(f"apply_action, no instrumentation     {disabled * 1e9:8.0f} ns")
+    print(f"apply_action, timing                 {timed * 1e9:8.0f} ns ({(timed - disabled) * 1e9:+.0f} ns)")
+    print(f"apply_action, timing and net blocks  {blocks * 1e9:8.0f} ns ({(blocks - disabled) * 1e9:+.0f} ns)")
+
+    measured = state.instrumentation
+    start = time.perf_counter()
+    snapshot = measured.snapshot(state)
+    snapshot_time = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'profile.json')
+        start = time.perf_counter()
+        measured.dump(path)
+        dump_time = time.perf_counter() - start
+    print(f"snapshot {snapshot_time * 1e3:.2f} ms, dump {dump_time * 1e3:.2f} ms, {len(snapshot['slow_calls'])} slow calls kept")
+    print(instrumentation.format_snapshot(snapshot))
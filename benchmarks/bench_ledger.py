@@ -0,0 +1,76 @@
+#Measures the product ledger on a portfolio with millions of products: building it, answering the
+#per-company and portfolio product aggregates against walking the product lists, keeping it up to date
+#through add_product and remove_product, finding the top products, and the memory it takes.
+#
+#Usage: python benchmarks/bench_ledger.py [--companies 20000] [--products 50]
+
+import argparse
+import math
+import random
+import time
+import tracemalloc
+
+from synthetic import make_state
+
+import engine
+import ledger
+
+
+def timed(function, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the columnar product ledger.")
+    parser.add_argument('--companies', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--changes', type=int, default=100000)
+    args = parser.parse_args()
+
+    state = make_state(args.companies, product_count=args.products)
+    state.cash_balance = 1e15
+    tracemalloc.start()
+    products, build_time = timed(lambda: ledger.ProductLedger.from_state(state))
+    ledger_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    state.ledger = products
+    print(f"{products.product_count} products: ledger built in {build_time:.2f} s, {ledger_bytes / 2 ** 20:.1f} MB")
+
+    walked, walk_time = timed(lambda: (sum(len(company.products) for company in state.companies),
+                                       math.fsum(product.investment for company in state.companies for product in company.products)))
+    summary, summary_time = timed(products.summary, 1000)
+    print(f"portfolio aggregate: walking the lists {walk_time * 1e3:.1f} ms, ledger {summary_time * 1e9:.0f} ns "
+          f"({'same' if walked == summary[:2] else 'DIFFERENT'})")
+
+    company = state.companies[len(state.companies) // 2]
+    _, company_walk = timed(lambda: math.fsum(product.revenue for product in company.products), 1000)
+    _, company_summary = timed(lambda: products.company_summary(company.id), 1000)
+    print(f"company aggregate: walking its list {company_walk * 1e9:.0f} ns, ledger {company_summary * 1e9:.0f} ns")
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for change in range(args.changes):
+        index = rng.randrange(len(state.companies))
+        if change % 2 and state.companies[index].products:
+            engine.remove_product(state, index, rng.randrange(len(state.companies[index].products)))
+        else:
+            engine.add_product(state, index, "Product", 100)
+    with_ledger = (time.perf_counter() - start) / args.changes
+    exact = ledger.ProductLedger.from_state(state).summary()
+    drift = abs(exact[2] - products.summary()[2]) / exact[2]
+    top, top_time = timed(lambda: products.top(10))
+    state.ledger = None
+    start = time.perf_counter()
+    for change in range(args.changes):
+        index = rng.randrange(len(state.companies))
+        if change % 2 and state.companies[index].products:
+            engine.remove_product(state, index, rng.randrange(len(state.companies[index].products)))
+        else:
+            engine.add_product(state, index, "Product", 100)
+    without_ledger = (time.perf_counter() - start) / args.changes
+    print(f"add/remove product: {without_ledger * 1e6:.2f} us without the ledger, {with_ledger * 1e6:.2f} us with it")
+    print(f"after {args.changes} changes the kept revenue total differs from a rebuild by {drift:.2g} (relative)")
+    print(f"top 10 products by revenue in {top_time * 1e3:.1f} ms: {top[0]}")
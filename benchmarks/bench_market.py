@@ -0,0 +1,64 @@
+#Measures the market model: the cost of one month for growing portfolios, against drawing the same
+#kind of revenue noise company by company with the random module, and checks that the results do not
+#depend on how the months are batched or how the companies are split.
+#
+#Usage: python benchmarks/bench_market.py [--sizes 1000,10000,100000] [--months 24]
+
+import argparse
+import math
+import random
+import time
+
+from synthetic import load_catalogs, make_state
+
+import branching
+import engine
+import market
+
+
+def per_company_cash_flow(state, rng, volatility):
+    """
+    This function is the loop the market model replaces: one noise draw per company in Python.
+    """
+    cash_flow = 0.0
+    for company in state.companies:
+        noise = math.exp(rng.gauss(0, volatility) - volatility * volatility / 2)
+        profit = engine.company_figures(state, company)[1] * noise
+        cash_flow += ((profit * state.difficulty_level) - company.capital * engine.OPERATING_COST_RATE) * (1 - engine.company_tax_rate(state, company))
+    return cash_flow
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the market model.")
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--months', type=int, default=24)
+    args = parser.parse_args()
+
+    business_types, _, offshore_locations = load_catalogs()
+    for size in map(int, args.sizes.split(',')):
+        state = make_state(size)
+        state.cash_balance = 0.0
+        model = market.MarketModel(business_types, offshore_locations, seed=7)
+
+        batched = branching.fork(state)
+        start = time.perf_counter()
+        market.advance_months(batched, model, args.months)
+        vectorized = (time.perf_counter() - start) / args.months
+
+        monthly = branching.fork(state)
+        for _ in range(args.months):
+            market.advance_month(monthly, market.MarketModel(business_types, offshore_locations, seed=7))
+
+        half = size // 2
+        split = model.revenue_noise(3, half), model.revenue_noise(3, size - half, first=half)
+        whole = model.revenue_noise(3, size)
+        same_split = bool((whole[:half] == split[0]).all() and (whole[half:] == split[1]).all())
+
+        rng = random.Random(7)
+        start = time.perf_counter()
+        per_company_cash_flow(state, rng, model.revenue_volatility)
+        looped = time.perf_counter() - start
+
+        print(f"{size:>8} companies | market month {vectorized * 1e3:8.2f} ms | per-company loop {looped * 1e3:8.2f} ms "
+              f"({looped / vectorized:5.1f}x) | {args.months} months batched = one by one: {batched.cash_balance == monthly.cash_balance} | "
+              f"split companies = whole: {same_split}")
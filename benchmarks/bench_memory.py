@@ -0,0 +1,61 @@
+#Reports the memory used per company by the record types in models.py and by the plain dictionaries
+#they replaced, for companies with 0, 10 and 100 products.
+#
+#Usage: python benchmarks/bench_memory.py [--companies N]
+
+import argparse
+import tracemalloc
+
+from synthetic import load_catalogs
+
+import engine
+from models import Company, Product
+
+
+def build_records(company_count, product_count, business_types):
+    companies = []
+    for i in range(company_count):
+        business = business_types[i % len(business_types)]
+        company = Company(i, f"Company {i + 1}", business['name'], business['startup_capital'], business['revenue'], business['profit_margin'])
+        for j in range(product_count):
+            investment = 1000 + j
+            company.products.append(Product(f"Product {j + 1}", investment, investment * engine.PRODUCT_REVENUE_RATE))
+        companies.append(company)
+    return companies
+
+
+def build_dicts(company_count, product_count, business_types):
+    companies = []
+    for i in range(company_count):
+        business = business_types[i % len(business_types)]
+        company = {'id': i, 'name': f"Company {i + 1}", 'industry': business['name'], 'capital': business['startup_capital'], 'offshore': False, 'offshore_id': None, 'revenue': business['revenue'], 'profit_margin': business['profit_margin'], 'products': [], 'monthly_revenue': 0.0, 'monthly_profit': 0.0, 'taxed_profit': 0.0}
+        for j in range(product_count):
+            investment = 1000 + j
+            company['products'].append({'name': f"Product {j + 1}", 'investment': investment, 'revenue': investment * engine.PRODUCT_REVENUE_RATE})
+        companies.append(company)
+    return companies
+
+
+def bytes_per_company(build, company_count, product_count, business_types):
+    """
+    This function returns the traced memory allocated by `build`, divided by the number of companies.
+    """
+    tracemalloc.start()
+    companies = build(company_count, product_count, business_types)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del companies
+    return size / company_count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the memory used by company records and dictionaries.")
+    parser.add_argument('--companies', type=int, default=10000)
+    args = parser.parse_args()
+    business_types = load_catalogs()[0]
+    for product_count in (0, 10, 100):
+        company_count = max(1, args.companies // max(1, product_count // 10))
+        records = bytes_per_company(build_records, company_count, product_count, business_types)
+        dicts = bytes_per_company(build_dicts, company_count, product_count, business_types)
+        print(f"{product_count:>3} products | dict {dicts:10.0f} B/company | records {records:10.0f} B/company | "
+              f"saving {100 * (1 - records / dicts):5.1f}%")
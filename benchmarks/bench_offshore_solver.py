@@ -0,0 +1,46 @@
+#Measures the offshore planner on large portfolios and location catalogs, and checks that applying
+#the plan changes the monthly cash flow by exactly the gain the plan predicts.
+#
+#Usage: python benchmarks/bench_offshore_solver.py [--locations N] [company_count ...]
+#Defaults to 10^3, 10^4 and 10^5 companies and 10^4 synthetic locations.
+
+import argparse
+import random
+import time
+
+from synthetic import make_state
+
+import offshore
+
+
+def synthetic_locations(count, seed=0):
+    rng = random.Random(seed)
+    return [{'name': f"Location {i + 1}", 'setup_cost': rng.randrange(1000, 10 ** 7, 1000), 'tax_rate': rng.choice((0.0, 0.02, 0.05, 0.1, 0.125, 0.2, 0.3))}
+            for i in range(count)]
+
+
+def run(company_count, location_count):
+    state = make_state(company_count, offshore_count=0)
+    state.offshore_locations = synthetic_locations(location_count)
+    state.cash_balance = 10 ** 7
+    start = time.perf_counter()
+    plan = offshore.plan_offshore(state, horizon=24)
+    plan_time = time.perf_counter() - start
+    before = state.total_taxed_profit
+    start = time.perf_counter()
+    plan.apply(state)
+    apply_time = time.perf_counter() - start
+    change = state.total_taxed_profit - before
+    exact = abs(change - plan.monthly_gain) <= 1e-9 * max(1.0, abs(change))
+    print(f"{company_count:>8} companies {location_count:>7} locations | plan {plan_time * 1000:8.1f} ms | apply {apply_time * 1000:8.1f} ms | "
+          f"{len(plan.new_offshore_companies)} new, {len(plan.assignments):>7} moves | monthly gain {plan.monthly_gain:16.2f} "
+          f"({'matches' if exact else 'MISMATCH'})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the offshore planner.")
+    parser.add_argument('sizes', nargs='*', type=int, default=[10 ** 3, 10 ** 4, 10 ** 5])
+    parser.add_argument('--locations', type=int, default=10 ** 4)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.locations)
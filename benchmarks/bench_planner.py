@@ -0,0 +1,70 @@
+#Measures the strategy planner: how fast it finds the fastest way to the cash target at every
+#difficulty level with one worker and with several, checks that both find the same plan and that the
+#plan replays to the cash balance it promises, and compares the planner's memory estimate with what
+#tracemalloc measures.
+#
+#Usage: python benchmarks/bench_planner.py [--workers N] [--max-expansions N] [--target CASH]
+#The searches are bounded by expansions rather than time, so every run explores the same nodes.
+
+import argparse
+import os
+import time
+import tracemalloc
+
+from synthetic import load_catalogs
+
+import engine
+import planner
+
+DIFFICULTY_LEVELS = (1, 0.75, 0.5, 0.25)
+
+
+def timed_plan(state, target, max_expansions, workers):
+    start = time.perf_counter()
+    plan = planner.plan_cash_target(state, target, max_expansions=max_expansions, workers=workers, time_limit=3600)
+    return plan, time.perf_counter() - start
+
+
+def replays(catalogs, difficulty_level, plan):
+    game = engine.new_game("Planner", difficulty_level, *catalogs)
+    plan.apply(game)
+    return game.cash_balance == plan.cash_balance and game.months_passed == plan.months
+
+
+def memory_estimate(state, target, expansions):
+    """
+    This function runs one search in this process under tracemalloc and returns the bytes the
+    planner estimated for its stored nodes and the bytes tracemalloc saw still allocated.
+    """
+    context = (state.player_name, state.difficulty_level, state.business_types, state.management_personnel, state.offshore_locations)
+    tracemalloc.start()
+    search = planner._Search(context, target, state.months_passed + planner.DEFAULT_MAX_MONTHS, planner.DEFAULT_FRACTIONS,
+                             planner.DEFAULT_MAX_COMPANIES, None, time.time() + 3600, 1 << 62, expansions)
+    search.add(planner.snapshot(state), frozenset(), None)
+    search.run()
+    measured = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return search.memory, measured
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the strategy planner.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-expansions', type=int, default=20000)
+    parser.add_argument('--target', type=float, default=planner.DEFAULT_TARGET_CASH)
+    args = parser.parse_args()
+
+    catalogs = load_catalogs()
+    for level in DIFFICULTY_LEVELS:
+        state = engine.new_game("Planner", level, *catalogs)
+        serial, serial_time = timed_plan(state, args.target, args.max_expansions, 1)
+        parallel, parallel_time = timed_plan(state, args.target, args.max_expansions, args.workers)
+        same = (serial.actions, serial.cash_balance) == (parallel.actions, parallel.cash_balance)
+        found = f"{serial.months:>3} months, {len(serial.actions):>3} actions" if serial.actions else "no plan           "
+        print(f"difficulty {level:<5} | {found} | {serial.expansions:>7} nodes, "
+              f"{'complete' if serial.complete else 'stopped by ' + serial.stopped:<22} | 1 worker {serial_time:7.2f} s "
+              f"({serial.expansions / serial_time:8.0f} nodes/s), {args.workers} workers {parallel_time:7.2f} s | "
+              f"{'same plan' if same else 'DIFFERENT PLAN'}, {'replays' if serial.actions is None or replays(catalogs, level, serial) else 'REPLAY MISMATCH'}")
+
+    estimated, measured = memory_estimate(engine.new_game("Planner", 1, *catalogs), args.target, min(args.max_expansions, 5000))
+    print(f"memory of stored nodes: estimated {estimated / 2 ** 20:.1f} MB, measured {measured / 2 ** 20:.1f} MB")
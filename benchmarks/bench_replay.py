@@ -0,0 +1,89 @@
+#Measures how long a journaled game takes to rebuild, from month 0 and from the latest checkpoint, and
+#checks that both replays reproduce the live game.
+#
+#Usage: python benchmarks/bench_replay.py [--interval N] [action_count ...]
+#Defaults to journals of 10^3, 10^4 and 10^5 actions with a checkpoint every 500 actions.
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from synthetic import load_catalogs
+
+import engine
+import journal
+
+
+def play(path, action_count, interval, seed=0):
+    """
+    This function plays a scripted game of `action_count` journaled actions: it keeps opening
+    companies, adding products, hiring managers and advancing months. Actions the engine rejects are
+    not journaled, as in a real game.
+    """
+    business_types, management_personnel, offshore_locations = load_catalogs()
+    state = journal.start_game(path, "Benchmark", 0.75, business_types, management_personnel, offshore_locations,
+                               cash_balance=10 ** 9, checkpoint_interval=interval)
+    rng = random.Random(seed)
+    engine.apply_action(state, 'create_offshore_company', 0, "Holding")
+    while state.journal.seq < action_count:
+        roll = rng.random()
+        if roll < 0.3 or not state.companies:
+            business_index = rng.randrange(len(business_types))
+            capital = state.business_types[business_index]['startup_capital'] * rng.randint(1, 3)
+            engine.apply_action(state, 'create_company', business_index, f"Company {len(state.companies) + 1}", capital)
+        elif roll < 0.6:
+            engine.apply_action(state, 'add_product', rng.randrange(len(state.companies)), "Product", rng.randint(100, 5000))
+        elif roll < 0.7:
+            company_index = rng.randrange(len(state.companies))
+            if state.companies[company_index].offshore_id is None:
+                engine.apply_action(state, 'add_company_to_offshore', 0, company_index)
+        elif roll < 0.8:
+            company_index = rng.randrange(len(state.companies))
+            if state.companies[company_index].management is None:
+                try:
+                    engine.apply_action(state, 'hire_management', company_index, 0)
+                except engine.ActionError:
+                    pass
+        else:
+            engine.apply_action(state, 'advance_month')
+    state.journal.close()
+    return state
+
+
+def same_state(left, right):
+    return (left.cash_balance == right.cash_balance and left.months_passed == right.months_passed
+            and left.total_taxed_profit == right.total_taxed_profit
+            and [dict(company, products=None) for company in left.companies] == [dict(company, products=None) for company in right.companies]
+            and [[dict(product) for product in company.products] for company in left.companies]
+            == [[dict(product) for product in company.products] for company in right.companies])
+
+
+def run(action_count, interval, directory):
+    path = os.path.join(directory, f"game{action_count}.journal")
+    start = time.perf_counter()
+    live = play(path, action_count, interval)
+    play_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    full, _ = journal.replay(path, use_checkpoints=False)
+    full_time = time.perf_counter() - start
+    start = time.perf_counter()
+    resumed, _ = journal.replay(path)
+    checkpoint_time = time.perf_counter() - start
+
+    ok = same_state(live, full) and same_state(live, resumed)
+    print(f"{action_count:>8} actions | {len(live.companies):>6} companies | journal {os.path.getsize(path) / 1e6:7.2f} MB | "
+          f"play {play_time * 1000:9.1f} ms | replay from start {full_time * 1000:9.1f} ms | "
+          f"from checkpoint {checkpoint_time * 1000:8.1f} ms | {'identical' if ok else 'MISMATCH'}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure journal replay time with and without checkpoints.")
+    parser.add_argument('sizes', nargs='*', type=int, default=[10 ** 3, 10 ** 4, 10 ** 5])
+    parser.add_argument('--interval', type=int, default=journal.DEFAULT_CHECKPOINT_INTERVAL)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            run(size, args.interval, directory)
@@ -0,0 +1,140 @@
+#Measures the results store: inserting runs in batches against one commit per run with SQLite's
+#default settings (rollback journal, synchronous=FULL), several processes inserting into the same
+#database at once (throughput and the longest wait for a batch), and the leaderboard, rank, percentile
+#and aggregate queries over a million stored runs, against grouping the whole table. Checks that the
+#kept aggregates agree with the table.
+#
+#Usage: python benchmarks/bench_results.py [--rows 1000000] [--processes 4] [--path /tmp/bench_results.db]
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import results
+
+DIFFICULTY_LEVELS = (1.0, 0.75, 0.5, 0.25)
+OUTCOMES = ('bankrupt', 'target', 'horizon')
+INDUSTRIES = ('Dropshipping', 'Technology', 'Finance', 'Retail', 'Healthcare')
+
+
+def make_rows(count, seed):
+    """
+    This function returns `count` reproducible synthetic rows for the runs table.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        companies = rng.randrange(1, 200)
+        composition = json.dumps({rng.choice(INDUSTRIES): companies}, separators=(',', ':'))
+        rows.append((time.time(), 'montecarlo:bench', f"Player {rng.randrange(10000)}", rng.choice(DIFFICULTY_LEVELS),
+                     rng.lognormvariate(13, 2) - 50000, rng.randrange(1, 601), rng.choice(OUTCOMES), companies,
+                     rng.randrange(3), companies * 2, rng.gauss(1e4, 1e4), composition))
+    return rows
+
+
+def remove(path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def writer(path, count, seed, batch_size, waits):
+    """
+    This function inserts `count` rows from one process and reports its longest flush.
+    """
+    rows = make_rows(count, seed)
+    longest = 0.0
+    with results.ResultsStore(path, batch_size=len(rows) + 1) as store:
+        for start in range(0, count, batch_size):
+            store.add_many(rows[start:start + batch_size])
+            begin = time.perf_counter()
+            store.flush()
+            longest = max(longest, time.perf_counter() - begin)
+    waits.put(longest)
+
+
+def timed(function, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the results store.")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--concurrent-rows', type=int, default=50000, help="rows inserted by each process")
+    parser.add_argument('--path', default=os.path.join(os.environ.get('TMPDIR', '/tmp'), 'bench_results.db'))
+    args = parser.parse_args()
+
+    # One commit per run with the sqlite3 module's defaults.
+    remove(args.path)
+    sample = make_rows(2000, 1)
+    connection = sqlite3.connect(args.path)
+    for statement in results.SCHEMA.split(';'):
+        connection.execute(statement)
+    start = time.perf_counter()
+    for row in sample:
+        connection.execute(results._INSERT_RUN, row)
+        connection.commit()
+    single = time.perf_counter() - start
+    connection.close()
+    remove(args.path)
+    rows = make_rows(args.rows, 0)
+    with results.ResultsStore(args.path) as store:
+        _, batched = timed(lambda: store.add_many(rows))
+        store.flush()
+    print(f"insert: one commit per run {len(sample) / single:,.0f} runs/s, "
+          f"batches of {results.DEFAULT_BATCH_SIZE} {args.rows / batched:,.0f} runs/s ({single / len(sample) * args.rows / batched:.0f}x)")
+
+    concurrent_path = args.path + '.concurrent'
+    remove(concurrent_path)
+    results.ResultsStore(concurrent_path).close()
+    waits = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=writer, args=(concurrent_path, args.concurrent_rows, seed, results.DEFAULT_BATCH_SIZE, waits))
+                 for seed in range(args.processes)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    longest = max(waits.get() for _ in processes)
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    with results.ResultsStore(concurrent_path) as store:
+        stored = len(store)
+    remove(concurrent_path)
+    print(f"{args.processes} processes writing at once: {stored:,} runs stored at {stored / elapsed:,.0f} runs/s "
+          f"(including start-up), longest batch {longest * 1e3:.1f} ms")
+
+    with results.ResultsStore(args.path) as store:
+        top, top_time = timed(lambda: store.leaderboard(10), 100)
+        _, level_time = timed(lambda: store.leaderboard(10, difficulty=0.5), 100)
+        _, player_time = timed(lambda: store.leaderboard(10, player="Player 42"), 100)
+        print(f"top 10 of {len(store):,} runs: overall {top_time * 1e3:.2f} ms, one difficulty {level_time * 1e3:.2f} ms, "
+              f"one player {player_time * 1e3:.2f} ms; best {top[0]}")
+        _, rank_time = timed(lambda: store.rank(1e6, difficulty=0.5), 10)
+        median, median_time = timed(lambda: store.percentile(50, difficulty=0.5))
+        print(f"rank of $1M at one difficulty {rank_time * 1e3:.1f} ms, median final cash {median:,.0f} in {median_time * 1e3:.1f} ms")
+        kept, kept_time = timed(lambda: store.aggregates(), 100)
+        scanned, scan_time = timed(lambda: store.connection.execute(
+            "SELECT difficulty, count(*), avg(final_cash), min(final_cash), max(final_cash), avg(months) "
+            "FROM runs GROUP BY difficulty ORDER BY difficulty").fetchall())
+        same = all(kept[level]['runs'] == runs and abs(kept[level]['mean_cash'] - mean) <= 1e-9 * abs(mean)
+                   and kept[level]['min_cash'] == low and kept[level]['max_cash'] == high
+                   and abs(kept[level]['mean_months'] - months) <= 1e-9 * months
+                   for level, runs, mean, low, high, months in scanned)
+        print(f"aggregates per difficulty: kept totals {kept_time * 1e3:.2f} ms, grouping the table {scan_time * 1e3:.0f} ms "
+              f"({'same' if same else 'DIFFERENT'})")
+        _, summary_time = timed(lambda: store.player_summary("Player 42"), 100)
+        print(f"one player's summary {summary_time * 1e3:.2f} ms")
+    remove(args.path)
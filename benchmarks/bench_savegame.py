@@ -0,0 +1,66 @@
+#Measures save and load throughput of the binary save format against a JSON dump of the same game.
+#
+#Usage: python benchmarks/bench_savegame.py [--products N] [company_count ...]
+#Defaults to 10^4, 10^5 and 10^6 companies with 2 products each.
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from synthetic import make_state
+
+import savegame
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def as_json(state):
+    return {'player_name': state.player_name, 'cash_balance': state.cash_balance, 'months_passed': state.months_passed,
+            'companies': [dict(company, products=[dict(product) for product in company.products]) for company in state.companies],
+            'offshore_companies': [dict(offshore, companies=list(offshore.companies)) for offshore in state.offshore_companies]}
+
+
+def save_json(state, path):
+    with open(path, 'w') as file:
+        json.dump(as_json(state), file)
+
+
+def load_json(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def run(company_count, product_count, directory):
+    state = make_state(company_count, product_count=product_count)
+
+    binary_path = os.path.join(directory, 'game.bts')
+    json_path = os.path.join(directory, 'game.json')
+    save_time, size = timed(savegame.save_game, state, binary_path)
+    open_time, save = timed(savegame.open_save, binary_path)
+    save.close()
+    load_time, _ = timed(savegame.load_game, binary_path)
+    json_save_time, _ = timed(save_json, state, json_path)
+    json_load_time, _ = timed(load_json, json_path)
+    json_size = os.path.getsize(json_path)
+
+    megabytes = size / 1e6
+    print(f"{company_count:>9} companies | {megabytes:8.1f} MB (JSON {json_size / 1e6:8.1f} MB) | "
+          f"save {save_time * 1000:9.1f} ms ({megabytes / save_time:7.1f} MB/s) | open {open_time * 1000:6.3f} ms | "
+          f"load {load_time * 1000:9.1f} ms ({company_count / load_time:10.0f} companies/s) | "
+          f"JSON save {json_save_time * 1000:9.1f} ms, parse {json_load_time * 1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure binary save/load throughput.")
+    parser.add_argument('sizes', nargs='*', type=int, default=[10 ** 4, 10 ** 5, 10 ** 6])
+    parser.add_argument('--products', type=int, default=2)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            run(size, args.products, directory)
@@ -0,0 +1,123 @@
+#Load generator for the game server: opens many concurrent sessions on localhost, plays a short scripted
+#game in each one and reports sessions per second and the p50/p99 latency of an action (from sending
+#the request line to reading the reply line).
+#
+#Usage: python benchmarks/bench_server.py [--sessions 2000] [--concurrency 500] [--months 10]
+#                                         [--host HOST --port PORT]
+#Without --port a server is started in a subprocess on a free port and stopped afterwards.
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from synthetic import ROOT
+
+
+def script(session_index, months):
+    """
+    This function returns the requests one session sends: start a game, open a shop, then every month
+    invest in a product and advance the month, checking the status at the end.
+    """
+    requests = [{'action': 'new_game', 'args': [f"Player {session_index}", 1]},
+                {'action': 'create_company', 'args': [2, "Shop", 1000]}]
+    for month in range(months):
+        requests.append({'action': 'add_product', 'args': [0, f"Product {month + 1}", 100]})
+        requests.append({'action': 'advance_month'})
+    requests.append({'action': 'status'})
+    requests.append({'action': 'quit'})
+    return requests
+
+
+async def run_session(host, port, requests, latencies, failures):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for request in requests:
+            line = json.dumps(request, separators=(',', ':')).encode() + b'\n'
+            start = time.perf_counter()
+            writer.write(line)
+            await writer.drain()
+            reply = await reader.readline()
+            latencies.append(time.perf_counter() - start)
+            if not reply:
+                failures.append("connection closed")
+                return
+            decoded = json.loads(reply)
+            if not decoded['ok']:
+                failures.append(decoded['error'])
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, sessions, concurrency, months):
+    """
+    This function runs `sessions` sessions, at most `concurrency` at a time.
+
+    :return: a tuple of (elapsed seconds, action latencies, failure messages).
+    """
+    latencies = []
+    failures = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited(session_index):
+        async with limit:
+            try:
+                await run_session(host, port, script(session_index, months), latencies, failures)
+            except (ConnectionError, OSError) as error:
+                failures.append(str(error))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(sessions)))
+    return time.perf_counter() - start, latencies, failures
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(percent / 100 * len(sorted_values)))]
+
+
+def start_server():
+    """
+    This function starts the server in a subprocess on a free port.
+
+    :return: a tuple of (process, host, port).
+    """
+    process = subprocess.Popen([sys.executable, 'server.py', '--port', '0', '--max-sessions', '100000'], cwd=ROOT,
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Listening on "):
+        process.kill()
+        raise RuntimeError(f"the server did not start: {line!r}")
+    host, port = line.split()[-1].rsplit(':', 1)
+    return process, host, int(port)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load-test the game server on localhost.")
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    parser.add_argument('--months', type=int, default=10)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None)
+    args = parser.parse_args()
+
+    process = None
+    host, port = args.host, args.port
+    if port is None:
+        process, host, port = start_server()
+    try:
+        elapsed, latencies, failures = asyncio.run(run_load(host, port, args.sessions, args.concurrency, args.months))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    latencies.sort()
+    print(f"{args.sessions} sessions ({args.concurrency} concurrent, {len(latencies)} actions) in {elapsed:.2f} s on {os.cpu_count()} CPU(s)")
+    print(f"sessions/s {args.sessions / elapsed:10.1f}    actions/s {len(latencies) / elapsed:10.1f}")
+    print(f"latency p50 {percentile(latencies, 50) * 1000:8.2f} ms    p99 {percentile(latencies, 99) * 1000:8.2f} ms")
+    if failures:
+        print(f"{len(failures)} failures, first: {failures[0]}")
@@ -0,0 +1,63 @@
+#Measures the batch manager matcher on large portfolios and rosters, and checks that applying the plan
+#raises the monthly profit net of salaries, and the game's monthly cash flow, by exactly the gains the
+#plan predicts.
+#
+#Usage: python benchmarks/bench_staffing.py [--no-scipy] [--companies N ...] [--managers N ...]
+#Defaults to 10^3 and 10^4 companies with the shipped roster and synthetic rosters of 300 and 2000
+#managers. --no-scipy times the built-in Hungarian algorithm instead of SciPy.
+
+import argparse
+import random
+import time
+
+from synthetic import make_state
+
+import engine
+import staffing
+
+
+def synthetic_roster(count, seed=0):
+    rng = random.Random(seed)
+    return [{'name': f"Manager {i + 1}", 'salary': rng.randrange(5000, 500000, 500), 'revenue_boost': rng.choice((0.0, 0.05, 0.1, 0.15, 0.2)),
+             'profit_margin_boost': rng.choice((0.0, 0.02, 0.05, 0.1, 0.15))} for i in range(count)]
+
+
+def net_profit(state):
+    return sum(company.monthly_profit - (company.management['salary'] if company.management is not None else 0) for company in state.companies)
+
+
+def run(company_count, manager_count):
+    state = make_state(company_count)
+    if manager_count:
+        state.management_personnel = synthetic_roster(manager_count)
+    state.cash_balance = float('inf')
+    before = net_profit(state)
+    cash_flow_before = engine.monthly_cash_flow(state)
+    start = time.perf_counter()
+    plan = staffing.plan_management(state)
+    plan_time = time.perf_counter() - start
+    start = time.perf_counter()
+    plan.apply(state)
+    apply_time = time.perf_counter() - start
+    change = net_profit(state) - before
+    cash_flow_change = engine.monthly_cash_flow(state) - cash_flow_before
+    exact = (abs(change - plan.monthly_gain) <= 1e-9 * max(1.0, abs(change))
+             and abs(cash_flow_change - plan.cash_flow_gain) <= 1e-9 * max(1.0, abs(cash_flow_change)))
+    print(f"{company_count:>7} companies {len(state.management_personnel):>5} managers | plan {plan_time * 1000:9.1f} ms | "
+          f"apply {apply_time * 1000:7.1f} ms | {len(plan.assignments):>5} hires | monthly gain {plan.monthly_gain:18.2f} "
+          f"cash flow gain {plan.cash_flow_gain:18.2f} "
+          f"({'matches' if exact else 'MISMATCH'})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the batch manager matcher.")
+    parser.add_argument('--companies', type=int, nargs='*', default=[10 ** 3, 10 ** 4])
+    parser.add_argument('--managers', type=int, nargs='*', default=[0, 300, 2000], help="roster sizes; 0 is the shipped roster")
+    parser.add_argument('--no-scipy', action='store_true')
+    args = parser.parse_args()
+    if args.no_scipy:
+        staffing.linear_sum_assignment = None
+    print(f"solver: {'SciPy linear_sum_assignment' if staffing.linear_sum_assignment is not None else 'built-in Hungarian'}")
+    for company_count in args.companies:
+        for manager_count in args.managers:
+            run(company_count, manager_count)
@@ -0,0 +1,77 @@
+#Measures how quickly the game starts: the cost of importing main.py in a fresh interpreter, and the
+#time from launching `python main.py` until the main menu is shown, with the name and difficulty
+#answered from a pipe as soon as they are asked for.
+#
+#Usage: python benchmarks/bench_startup.py [--runs N]
+#Every figure is the median of N fresh processes. The import cost is reported both as measured from
+#outside (minus the start of an interpreter that imports nothing) and as the in-process time that
+#-X importtime reports for main. When PYTHONDONTWRITEBYTECODE is set, every import compiles from source.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from synthetic import ROOT
+
+MENU_PROMPT = b"Enter the number corresponding to your choice: "
+
+
+def run_seconds(code):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def import_time_of_main():
+    """
+    This function returns the cumulative import time of main, in seconds, as -X importtime reports it,
+    and checks that the import printed nothing and asked for nothing.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=ROOT, check=True,
+                            stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if result.stdout:
+        raise RuntimeError(f"importing main printed {result.stdout!r}")
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == 'main':
+            return int(fields[1]) / 1e6
+    raise RuntimeError("-X importtime did not report main")
+
+
+def time_to_first_menu():
+    """
+    This function starts the game, answers the name and difficulty prompts and returns the seconds from
+    launching the process until the first menu prompt was read.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'main.py'], cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    process.stdin.write(b"Benchmark\n1\n")
+    process.stdin.flush()
+    output = b''
+    while MENU_PROMPT not in output:
+        chunk = os.read(process.stdout.fileno(), 65536)
+        if not chunk:
+            raise RuntimeError(f"the game exited before showing the menu: {output[-500:]!r}")
+        output += chunk
+    elapsed = time.perf_counter() - start
+    process.communicate(b"11\n")
+    return elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure import time and time-to-first-menu of the game.")
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    interpreter = statistics.median(run_seconds('pass') for _ in range(args.runs))
+    imported = statistics.median(run_seconds('import main') for _ in range(args.runs))
+    in_process = statistics.median(import_time_of_main() for _ in range(args.runs))
+    first_menu = statistics.median(time_to_first_menu() for _ in range(args.runs))
+    print(f"bytecode cache: {'off (PYTHONDONTWRITEBYTECODE)' if sys.dont_write_bytecode else 'on'}")
+    print(f"interpreter start      {interpreter * 1000:8.1f} ms")
+    print(f"import main            {(imported - interpreter) * 1000:8.1f} ms above interpreter start "
+          f"({in_process * 1000:.1f} ms by -X importtime)")
+    print(f"time to first menu     {first_menu * 1000:8.1f} ms from launch")
@@ -0,0 +1,193 @@
+#Times every state-transition function of the engine, and the player information screen, on
+#synthetic portfolios of growing size, and writes the results to a JSON file so runs can be compared.
+#
+#Each axis is grown on its own from a base game of 10^4 companies, 8 offshore companies and no products:
+#the number of companies, the number of offshore companies and the number of products per company.
+#Every operation is timed as the best of --repeat rounds of up to --ops calls and reported per call.
+#
+#Usage: python benchmarks/bench_suite.py [--output results.json] [--compare previous.json] [--quick]
+#With --compare, each result is printed next to the matching result of the earlier run.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from synthetic import ROOT, make_state
+
+import engine
+import main
+
+BASE = {'companies': 10 ** 4, 'offshore': 8, 'products': 0}
+AXES = {'companies': [10 ** 3, 10 ** 4, 10 ** 5], 'offshore': [1, 8, 64], 'products': [0, 10, 100]}
+QUICK_AXES = {'companies': [10 ** 3, 10 ** 4], 'offshore': [1, 8], 'products': [0, 10]}
+# Enough cash for every action the suite performs, without the special cases of an infinite balance.
+CASH = 1e18
+
+
+def time_rounds(repeat, targets, prepare, operation, restore):
+    """
+    This function times `operation` on every target in each of `repeat` rounds and returns the fastest
+    round divided by the number of targets. `prepare` and `restore` run untimed before and after every
+    round, with the same target, so every round starts from the same game.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        for target in targets:
+            prepare(target)
+        start = time.perf_counter()
+        for target in targets:
+            operation(target)
+        best = min(best, time.perf_counter() - start)
+        for target in targets:
+            restore(target)
+    return best / len(targets)
+
+
+def spread(state, ops, predicate):
+    """
+    This function returns the indexes of up to `ops` companies for which `predicate` holds, spread over
+    the whole portfolio.
+    """
+    step = max(1, len(state.companies) // ops)
+    return [company.id for company in state.companies[::step] if predicate(company)][:ops]
+
+
+def cases(state, ops):
+    """
+    This function returns the operations to time on `state` as (name, targets, prepare, operation,
+    restore) tuples. Operations that change the portfolio are undone by `restore`.
+    """
+    offshore_id = state.offshore_companies[0].id
+    salary = state.management_personnel[0]['salary']
+
+    def nothing(target):
+        pass
+
+    def add_offshore(company_index):
+        engine.add_company_to_offshore(state, offshore_id, company_index)
+
+    def remove_offshore(company_index):
+        engine.remove_company_from_offshore(state, offshore_id, company_index)
+
+    def hire(company_index):
+        engine.hire_management(state, company_index, 0)
+
+    def fire(company_index):
+        engine.fire_management(state, company_index)
+
+    def add_product(company_index):
+        engine.add_product(state, company_index, "Benchmark product", 1000)
+
+    def remove_last_product(company_index):
+        engine.remove_product(state, company_index, len(state.companies[company_index].products) - 1)
+
+    def tick(target):
+        engine.update_cash_balance(state.cash_balance, state.companies, state.offshore_companies, state.difficulty_level)
+
+    def advance(target):
+        engine.advance_month(state)
+
+    def reset_clock(target):
+        state.cash_balance = CASH
+        state.months_passed = 0
+
+    def display(target):
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.display_player_info(state)
+
+    outside = spread(state, ops, lambda company: company.offshore_id is None)
+    unmanaged = spread(state, ops, lambda company: company.management is None and company.monthly_profit >= salary)
+    return [('update_cash_balance', [None], nothing, tick, nothing),
+            ('advance_month', [None] * ops, nothing, advance, reset_clock),
+            ('add_company_to_offshore', outside, nothing, add_offshore, remove_offshore),
+            ('remove_company_from_offshore', outside, add_offshore, remove_offshore, nothing),
+            ('hire_management', unmanaged, nothing, hire, fire),
+            ('fire_management', unmanaged, hire, fire, nothing),
+            ('add_product', spread(state, ops, lambda company: True), nothing, add_product, remove_last_product),
+            ('display_player_info', [None], nothing, display, nothing)]
+
+
+def configurations(axes):
+    """
+    This function yields the portfolio configurations to measure: the base configuration with one axis
+    changed at a time, each configuration once.
+    """
+    seen = set()
+    for axis, values in axes.items():
+        for value in values:
+            configuration = dict(BASE, **{axis: value})
+            key = tuple(sorted(configuration.items()))
+            if key not in seen:
+                seen.add(key)
+                yield configuration
+
+
+def run(axes, ops, repeat):
+    results = []
+    for configuration in configurations(axes):
+        start = time.perf_counter()
+        state = make_state(configuration['companies'], offshore_count=configuration['offshore'], product_count=configuration['products'])
+        build_time = time.perf_counter() - start
+        state.cash_balance = CASH
+        for name, targets, prepare, operation, restore in cases(state, ops):
+            if not targets:
+                continue
+            seconds = time_rounds(repeat, targets, prepare, operation, restore)
+            results.append(dict(configuration, operation=name, calls=len(targets), seconds_per_call=seconds))
+            print(f"{configuration['companies']:>7} companies {configuration['offshore']:>3} offshore {configuration['products']:>4} products | "
+                  f"{name:<30} {seconds * 1e6:12.2f} us/call")
+        print(f"  (portfolio built in {build_time:.1f} s)")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'python': sys.version.split()[0], 'implementation': platform.python_implementation(), 'platform': platform.platform(),
+            'machine': platform.machine(), 'cpu_count': os.cpu_count(), 'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def result_key(result):
+    return (result['operation'], result['companies'], result['offshore'], result['products'])
+
+
+def compare(results, path):
+    """
+    This function prints every result next to the matching result of an earlier run.
+    """
+    with open(path) as file:
+        previous = {result_key(result): result for result in json.load(file)['results']}
+    print(f"\nCompared with {path}:")
+    for result in results:
+        before = previous.get(result_key(result))
+        if before is None:
+            continue
+        ratio = result['seconds_per_call'] / before['seconds_per_call']
+        print(f"{result['companies']:>7} companies {result['offshore']:>3} offshore {result['products']:>4} products | "
+              f"{result['operation']:<30} {before['seconds_per_call'] * 1e6:12.2f} -> {result['seconds_per_call'] * 1e6:12.2f} us/call "
+              f"({ratio:5.2f}x{' SLOWER' if ratio > 1.25 else ''})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time every state-transition function on synthetic portfolios.")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="a results file of an earlier run to compare with")
+    parser.add_argument('--ops', type=int, default=200, help="calls per round for the per-company operations")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help="smaller portfolios, for a fast check")
+    args = parser.parse_args()
+
+    results = run(QUICK_AXES if args.quick else AXES, args.ops, args.repeat)
+    with open(args.output, 'w') as file:
+        json.dump({'environment': environment(), 'ops': args.ops, 'repeat': args.repeat, 'results': results}, file, indent=1)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
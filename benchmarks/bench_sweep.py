@@ -0,0 +1,69 @@
+#Measures the sensitivity sweep: a grid of 10^5+ combinations of difficulty, default tax rate,
+#operating cost rate and two offshore locations' tax rates, evaluated in one broadcast computation,
+#against re-running engine.update_cash_balance once per combination (timed on a sample of the points
+#and extrapolated). Checks that both agree on the sampled points.
+#
+#Usage: python benchmarks/bench_sweep.py [--companies 100000] [--samples 20]
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from synthetic import make_state
+
+import engine
+import sensitivity
+from models import OffshoreEntity
+
+
+def tick(state, parameters):
+    """
+    This function re-runs the monthly tick with the parameters of one grid point.
+    """
+    rates = {axis[len(sensitivity.LOCATION_AXIS_PREFIX):]: value for axis, value in parameters.items()
+             if axis.startswith(sensitivity.LOCATION_AXIS_PREFIX)}
+    offshore_companies = [OffshoreEntity(entity.id, entity.name, entity.location, rates.get(entity.location, entity.tax_rate))
+                          for entity in state.offshore_companies]
+    saved = engine.DEFAULT_TAX_RATE, engine.OPERATING_COST_RATE
+    engine.DEFAULT_TAX_RATE, engine.OPERATING_COST_RATE = parameters['default_tax_rate'], parameters['operating_cost_rate']
+    try:
+        return engine.update_cash_balance(0.0, state.companies, offshore_companies, parameters['difficulty_level'])
+    finally:
+        engine.DEFAULT_TAX_RATE, engine.OPERATING_COST_RATE = saved
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the broadcast sensitivity sweep.")
+    parser.add_argument('--companies', type=int, default=100000)
+    parser.add_argument('--samples', type=int, default=20)
+    args = parser.parse_args()
+
+    state = make_state(args.companies)
+    locations = sorted({entity.location for entity in state.offshore_companies})[:2]
+    grid = {'difficulty_levels': [1, 0.75, 0.5, 0.25], 'default_tax_rates': np.linspace(0, 0.45, 46),
+            'operating_cost_rates': np.linspace(0, 0.1, 21),
+            'location_tax_rates': {location: np.linspace(0, 0.3, 7) for location in locations}}
+    start = time.perf_counter()
+    result = sensitivity.sweep(state, **grid)
+    sweep_time = time.perf_counter() - start
+    print(f"{len(result)} combinations over {args.companies} companies: sweep {sweep_time * 1e3:.1f} ms "
+          f"({result.cash_flow.nbytes / 2 ** 20:.1f} MB cube)")
+
+    rng = random.Random(0)
+    points = [tuple(rng.randrange(length) for length in result.cash_flow.shape) for _ in range(args.samples)]
+    start = time.perf_counter()
+    ticks = [tick(state, result.parameters(point)) for point in points]
+    per_point = (time.perf_counter() - start) / args.samples
+    error = max(abs(value - result.cash_flow[point]) / max(1.0, abs(value)) for value, point in zip(ticks, points))
+    print(f"one tick per combination: {per_point * 1e3:.1f} ms each, about {per_point * len(result):.0f} s for the grid "
+          f"({per_point * len(result) / sweep_time:.0f}x); largest relative difference {error:.1g}")
+
+    start = time.perf_counter()
+    best, worst = result.argmax(), result.argmin()
+    median = result.percentile(50, keep=('difficulty_level',))
+    print(f"argmax, argmin and per-difficulty median in {(time.perf_counter() - start) * 1e3:.1f} ms")
+    print(f"best  {best}")
+    print(f"worst {worst}")
+    print(f"median by difficulty {dict(zip(result.values[0].tolist(), median.tolist()))}")
@@ -0,0 +1,51 @@
+#Compares engine.update_cash_balance (per-company loop) with the NumPy struct-of-arrays engine.
+#
+#Usage: python benchmarks/bench_vectorized_tick.py [--offshore-share SHARE] [company_count ...]
+#Defaults to 10^3, 10^5 and 10^6 companies, half of them in an offshore company.
+
+import argparse
+import time
+
+from synthetic import make_state
+
+from engine import update_cash_balance
+from vectorized import PortfolioArrays
+
+DIFFICULTY_LEVEL = 0.75
+STARTING_CASH = 10000
+
+
+def best_of(repeat, function, *args):
+    """
+    This function runs `function` `repeat` times and returns the fastest wall time and the last result.
+    """
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(company_count, offshore_share):
+    state = make_state(company_count, offshore_share=offshore_share, difficulty_level=DIFFICULTY_LEVEL)
+    companies, offshore_companies = state.companies, state.offshore_companies
+    repeat = 5 if company_count <= 100000 else 2
+
+    loop_time, loop_cash = best_of(repeat, update_cash_balance, STARTING_CASH, companies, offshore_companies, DIFFICULTY_LEVEL)
+    build_time, arrays = best_of(1, PortfolioArrays.from_companies, companies, offshore_companies)
+    vector_time, vector_cash = best_of(repeat, arrays.update_cash_balance, STARTING_CASH, DIFFICULTY_LEVEL)
+
+    assert loop_cash == vector_cash, (loop_cash, vector_cash)
+    print(f"{company_count:>9} companies | loop {loop_time * 1000:10.3f} ms | vectorized {vector_time * 1000:8.3f} ms "
+          f"(build {build_time * 1000:9.3f} ms) | speedup {loop_time / vector_time:7.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the per-company tick with the vectorized tick.")
+    parser.add_argument('sizes', nargs='*', type=int, default=[10 ** 3, 10 ** 5, 10 ** 6])
+    parser.add_argument('--offshore-share', type=float, default=0.5)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.offshore_share)
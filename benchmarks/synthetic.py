@@ -0,0 +1,51 @@
+#Synthetic portfolios for the benchmarks, built from the game's own JSON catalogs.
+
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import catalog
+import engine
+
+
+def load_catalogs():
+    """
+    This function loads the three JSON catalogs that ship with the game.
+
+    :return: a tuple of (business_types, management_personnel, offshore_locations).
+    """
+    return catalog.load_catalogs(ROOT)
+
+
+def make_state(company_count, offshore_count=8, offshore_share=0.5, difficulty_level=0.75, seed=0, product_count=0):
+    """
+    This function builds a reproducible synthetic game through the engine's own actions.
+
+    :param company_count: the number of companies to create
+    :param offshore_count: the number of offshore companies to create
+    :param offshore_share: the fraction of companies that are added to an offshore company
+    :param difficulty_level: the difficulty multiplier of the game
+    :param seed: the seed of the random generator, so runs can be compared
+    :param product_count: the number of products added to every company
+    :return: an engine.GameState with enough cash left to keep playing.
+    """
+    business_types, management_personnel, offshore_locations = load_catalogs()
+    state = engine.new_game("Benchmark", difficulty_level, business_types, management_personnel, offshore_locations)
+    state.cash_balance = float('inf')
+    rng = random.Random(seed)
+    for i in range(offshore_count if company_count else 0):
+        engine.create_offshore_company(state, i % len(offshore_locations), f"Offshore {i + 1}")
+    for i in range(company_count):
+        business_index = rng.randrange(len(business_types))
+        capital = business_types[business_index]['startup_capital'] * rng.randint(1, 3)
+        engine.create_company(state, business_index, f"Company {i + 1}", capital)
+        if state.offshore_companies and rng.random() < offshore_share:
+            engine.add_company_to_offshore(state, rng.randrange(len(state.offshore_companies)), i)
+        for j in range(product_count):
+            engine.add_product(state, i, f"Product {j + 1}", 1000 + j)
+    state.cash_balance = engine.STARTING_CASH_BALANCE
+    return state
@@ -0,0 +1,240 @@
+#Cheap copies of a game for undo/redo and what-if branches.
+#
+#fork(state) returns a second GameState that starts out sharing every company, product and offshore
+#company with the first. Either game can then be played on independently: the engine copies a shared
+#record the first time one of the two games changes it (see engine._writable_company), so a fork costs
+#memory in proportion to what the games do afterwards, not to the size of the portfolio.
+#
+#The lists of companies and offshore companies are shared the same way. fork() turns them into
+#SharedLists, which hold their items in chunks of CHUNK references; forking copies the list of chunks,
+#one reference per CHUNK companies, and writing an item copies its chunk first if it is shared. Changing
+#a company that belongs to an offshore company also copies that offshore company's member dictionary,
+#once per offshore company and fork.
+#
+#A fork gets no journal, no history and no product ledger: it is a hypothetical game, not a
+#continuation of the recorded one. It keeps the instrumentation, so the cost of its actions is measured
+#with the others.
+#
+#Timeline builds undo and redo on top of fork(): every action is preceded by a fork of the game as it
+#was, and undoing an action puts that fork's contents back into the same GameState object. A product
+#ledger attached to the game is refreshed for the companies whose records differ between the two, which
+#the chunks the games still share rule out quickly (see _changed_ids). what_if()
+#plays a list of actions and months on a fork and returns it, e.g. to compare the cash balance in 24
+#months with and without an offshore move:
+#
+#    without = what_if(state, months=24)
+#    with_move = what_if(state, [('add_company_to_offshore', (0, 3))], months=24)
+
+import itertools
+from collections import deque
+
+import engine
+
+CHUNK_BITS = 6
+CHUNK = 1 << CHUNK_BITS
+_CHUNK_MASK = CHUNK - 1
+DEFAULT_UNDO_LIMIT = 100
+
+
+class SharedList:
+    """
+    A list of references that shares its chunks with the lists it was shared with (share()) until one of
+    them writes. It supports what the engine and the other modules do with state.companies: len(),
+    indexing, slicing, item assignment, append() and iteration.
+    """
+
+    __slots__ = ('chunks', 'owned', 'length')
+
+    def __init__(self, items=()):
+        items = list(items)
+        self.chunks = [items[start:start + CHUNK] for start in range(0, len(items), CHUNK)]
+        # One flag per chunk: whether this list may change the chunk in place.
+        self.owned = bytearray(b'\x01') * len(self.chunks)
+        self.length = len(items)
+
+    def share(self):
+        """
+        This function returns a new SharedList with the same items. Both lists copy a chunk before
+        changing it from now on.
+        """
+        shared = object.__new__(SharedList)
+        shared.chunks = list(self.chunks)
+        shared.owned = bytearray(len(self.chunks))
+        shared.length = self.length
+        self.owned = bytearray(len(self.chunks))
+        return shared
+
+    def _position(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("list index out of range")
+        return index
+
+    def _writable_chunk(self, chunk):
+        if not self.owned[chunk]:
+            self.chunks[chunk] = list(self.chunks[chunk])
+            self.owned[chunk] = 1
+        return self.chunks[chunk]
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step < 0:
+                return list(self)[index]
+            return list(itertools.islice(self, start, stop, step))
+        index = self._position(index)
+        return self.chunks[index >> CHUNK_BITS][index & _CHUNK_MASK]
+
+    def __setitem__(self, index, value):
+        index = self._position(index)
+        self._writable_chunk(index >> CHUNK_BITS)[index & _CHUNK_MASK] = value
+
+    def append(self, value):
+        """
+        This function adds an item at the end, like list.append.
+        """
+        if self.length & _CHUNK_MASK == 0:
+            self.chunks.append([value])
+            self.owned.append(1)
+        else:
+            self._writable_chunk(len(self.chunks) - 1).append(value)
+        self.length += 1
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.chunks)
+
+    def __repr__(self):
+        return f"SharedList({list(self)!r})"
+
+
+def fork(state):
+    """
+    This function returns a copy of a game that shares its records with the original until either game
+    changes them. The lists of companies and offshore companies of the original become SharedLists.
+
+    :param state: the GameState to copy
+    :return: a new GameState without a journal, history or product ledger.
+    """
+    if not isinstance(state.companies, SharedList):
+        state.companies = SharedList(state.companies)
+    if not isinstance(state.offshore_companies, SharedList):
+        state.offshore_companies = SharedList(state.offshore_companies)
+    branch = object.__new__(engine.GameState)
+    for slot in engine.GameState.__slots__:
+        setattr(branch, slot, getattr(state, slot))
+    branch.companies = state.companies.share()
+    branch.offshore_companies = state.offshore_companies.share()
+    branch.journal = None
+    branch.history = None
+    branch.ledger = None
+    # From now on every record either game has is shared with the other.
+    state.owned = set()
+    branch.owned = set()
+    return branch
+
+
+def _changed_ids(items, other):
+    """
+    This function returns the indexes at which two lists of records hold different records, including
+    the indexes only the longer one has. Chunks two SharedLists still share hold the same records and
+    are skipped, so comparing a game with a fork of it takes time in proportion to the chunks either
+    one has written since.
+    """
+    changed = list(range(min(len(items), len(other)), max(len(items), len(other))))
+    if isinstance(items, SharedList) and isinstance(other, SharedList):
+        for chunk_index, (chunk, other_chunk) in enumerate(zip(items.chunks, other.chunks)):
+            if chunk is not other_chunk:
+                first = chunk_index << CHUNK_BITS
+                changed.extend(first + position for position, (item, other_item) in enumerate(zip(chunk, other_chunk))
+                               if item is not other_item)
+    else:
+        changed.extend(index for index, (item, other_item) in enumerate(zip(items, other)) if item is not other_item)
+    return changed
+
+
+def _restore(state, snapshot):
+    """
+    This function makes `state` the game `snapshot` holds, keeping its journal, history and
+    instrumentation, and refreshing its product ledger for the companies whose records change. The
+    snapshot must not be used afterwards.
+    """
+    changed = _changed_ids(state.companies, snapshot.companies) if state.ledger is not None else None
+    for slot in engine.GameState.__slots__:
+        if slot not in ('journal', 'history', 'instrumentation', 'ledger'):
+            setattr(state, slot, getattr(snapshot, slot))
+    if state.ledger is not None:
+        state.ledger.refresh(state, changed)
+
+
+def what_if(state, actions=(), months=0):
+    """
+    This function plays actions and months on a fork of a game, leaving the game itself unchanged.
+
+    :param state: the GameState to branch from
+    :param actions: a list of (action name, arguments) pairs, as engine.apply_action takes them
+    :param months: the number of months to advance after the actions
+    :return: the forked GameState after the actions and months.
+    """
+    branch = fork(state)
+    for action, args in actions:
+        engine.apply_action(branch, action, *args)
+    if months > 0:
+        engine.advance_months(branch, months)
+    return branch
+
+
+class Timeline:
+    """
+    Undo and redo for the actions of one game.
+    """
+
+    def __init__(self, state, limit=DEFAULT_UNDO_LIMIT):
+        """
+        :param state: the GameState the actions are applied to. It must not have a journal, which
+        could not be replayed once actions are undone.
+        :param limit: the number of actions that can be undone; older ones are forgotten
+        """
+        if state.journal is not None:
+            raise ValueError("A game with a journal cannot be undone.")
+        self.state = state
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = []
+
+    def apply(self, action, *args):
+        """
+        This function performs an action through engine.apply_action so that it can be undone. Doing
+        so forgets the actions that were undone.
+
+        :return: whatever the action returns.
+        """
+        before = fork(self.state)
+        try:
+            result = engine.apply_action(self.state, action, *args)
+        except Exception:
+            _restore(self.state, before)
+            raise
+        self.undo_stack.append(before)
+        self.redo_stack.clear()
+        return result
+
+    def undo(self):
+        """
+        This function puts the game back the way it was before the last action that was not undone.
+        """
+        if not self.undo_stack:
+            raise engine.ActionError("There is nothing to undo.")
+        self.redo_stack.append(fork(self.state))
+        _restore(self.state, self.undo_stack.pop())
+
+    def redo(self):
+        """
+        This function performs the last undone action again.
+        """
+        if not self.redo_stack:
+            raise engine.ActionError("There is nothing to redo.")
+        self.undo_stack.append(fork(self.state))
+        _restore(self.state, self.redo_stack.pop())
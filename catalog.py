@@ -0,0 +1,302 @@
+#Loading and indexing of the game's catalogs: business types, management personnel and offshore locations.
+#
+#A catalog is validated against its schema the first time it is loaded. The validated form is then
+#compiled with marshal into __pycache__/<file>.catalog next to the source, keyed by the source file's
+#modification time and size, so later starts skip both JSON parsing and validation until the file
+#changes.
+#
+#Catalogs come in two formats:
+#
+#1. <name>.json holds a JSON array of entries, as shipped with the game. It is loaded into a Catalog, a
+#   list of the entries with a name -> entry index.
+#
+#2. <name>.jsonl holds one entry per line, for catalogs with tens of thousands of entries. It is opened
+#   as a LazyCatalog: compiling it streams through the file once, keeping only where each line starts
+#   and the entry names, and entries are parsed when they are first used.
+#
+#json is imported only by the functions that parse a file. Loading catalogs whose compiled cache is
+#current does not import it, which keeps the game's startup short.
+
+import marshal
+import math
+import os
+from array import array
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# The catalogs of a game, by kind, with the file name they are loaded from.
+CATALOG_FILES = {'business_types': 'business_types', 'management': 'management', 'offshore_locations': 'offshore_locations'}
+
+NUMBER = 'number'
+SCHEMAS = {
+    'business_types': {'name': str, 'startup_capital': NUMBER, 'revenue': NUMBER, 'profit_margin': NUMBER},
+    'management': {'name': str, 'salary': NUMBER, 'revenue_boost': NUMBER, 'profit_margin_boost': NUMBER},
+    'offshore_locations': {'name': str, 'setup_cost': NUMBER, 'tax_rate': NUMBER},
+}
+
+CACHE_VERSION = 1
+
+
+class CatalogError(ValueError):
+    """
+    Raised when a catalog file does not match its schema.
+    """
+
+
+def validate_entry(kind, entry, where):
+    """
+    This function checks one catalog entry against the schema of its catalog. Every field of the schema
+    must be present: names must be non-empty strings and numbers must be finite and not negative. Extra
+    fields are allowed and kept.
+
+    :param kind: the kind of catalog, a key of SCHEMAS
+    :param entry: the decoded entry
+    :param where: a description of where the entry comes from, used in error messages
+    :return: the entry.
+    """
+    if not isinstance(entry, dict):
+        raise CatalogError(f"{where}: expected an object, got {type(entry).__name__}")
+    for key, expected in SCHEMAS[kind].items():
+        if key not in entry:
+            raise CatalogError(f"{where}: missing '{key}'")
+        value = entry[key]
+        if expected is str:
+            valid = isinstance(value, str) and value != ''
+        else:
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value >= 0
+        if not valid:
+            raise CatalogError(f"{where}: invalid '{key}': {value!r}")
+    return entry
+
+
+def _kind_of(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for kind, name in CATALOG_FILES.items():
+        if stem == name:
+            return kind
+    raise CatalogError(f"{path}: cannot tell which catalog this is; pass its kind")
+
+
+def _name_positions(names, path):
+    positions = {}
+    for index, name in enumerate(names):
+        if name in positions:
+            raise CatalogError(f"{path}: entry {index + 1} repeats the name {name!r}")
+        positions[name] = index
+    return positions
+
+
+class Catalog(list):
+    """
+    A catalog loaded in full: a list of its entries with a name -> position index. Treat it as
+    read-only; the index is not updated when the list changes.
+    """
+
+    def __init__(self, entries, positions=None):
+        super().__init__(entries)
+        self.positions = _name_positions([entry['name'] for entry in self], 'catalog') if positions is None else positions
+
+    def index_of(self, name):
+        """
+        This function returns the position of the entry called `name`, or None.
+        """
+        return self.positions.get(name)
+
+    def get(self, name, default=None):
+        """
+        This function returns the entry called `name`, or `default`.
+        """
+        index = self.positions.get(name)
+        return default if index is None else self[index]
+
+
+class LazyCatalog:
+    """
+    A JSON Lines catalog whose entries are read from the file when they are first used. It supports
+    len(), indexing and iteration like a list, plus lookups by name. Entries that were read once are
+    kept, so the same position always returns the same entry. It holds the file open until close() is
+    called or the `with` block it is used in ends.
+    """
+
+    def __init__(self, path, kind, offsets, names):
+        self.path = path
+        self.kind = kind
+        self._offsets = offsets
+        self._names = names
+        self.positions = None
+        self._entries = {}
+        self._file = open(path, 'rb')
+
+    def close(self):
+        """
+        This function closes the catalog file. Entries that were already read stay available.
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _read(self, index):
+        import json
+        start = self._offsets[index]
+        self._file.seek(start)
+        line = self._file.read(self._offsets[index + 1] - start)
+        return validate_entry(self.kind, json.loads(line), f"{self.path}:{index + 1}")
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('catalog index out of range')
+        entry = self._entries.get(index)
+        if entry is None:
+            entry = self._entries[index] = self._read(index)
+        return entry
+
+    def __iter__(self):
+        # Streams through the file without keeping the entries that were not read before. It reads
+        # through a handle of its own, so indexing the catalog while iterating does not move it.
+        import json
+        with open(self.path, 'rb') as file:
+            file.seek(self._offsets[0])
+            for index in range(len(self)):
+                line = file.read(self._offsets[index + 1] - self._offsets[index])
+                entry = self._entries.get(index)
+                yield entry if entry is not None else validate_entry(self.kind, json.loads(line), f"{self.path}:{index + 1}")
+
+    def index_of(self, name):
+        """
+        This function returns the position of the entry called `name`, or None.
+        """
+        if self.positions is None:
+            self.positions = {entry_name: index for index, entry_name in enumerate(self._names)}
+        return self.positions.get(name)
+
+    def get(self, name, default=None):
+        """
+        This function returns the entry called `name`, or `default`.
+        """
+        index = self.index_of(name)
+        return default if index is None else self[index]
+
+
+def _cache_path(path):
+    directory, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, '__pycache__', filename + '.catalog')
+
+
+def _read_cache(path, stat):
+    try:
+        with open(_cache_path(path), 'rb') as file:
+            # marshal.load on a file object reads it in small pieces; loading from bytes is much faster.
+            compiled = marshal.loads(file.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if (not isinstance(compiled, dict) or compiled.get('version') != CACHE_VERSION
+            or compiled.get('mtime_ns') != stat.st_mtime_ns or compiled.get('size') != stat.st_size):
+        return None
+    return compiled
+
+
+def _write_cache(path, stat, compiled):
+    # A catalog in a read-only directory is simply compiled again on the next start.
+    cache_path = _cache_path(path)
+    compiled = dict(compiled, version=CACHE_VERSION, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            marshal.dump(compiled, file)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        pass
+
+
+def _compile_json(path, kind):
+    import json
+    with open(path, encoding='utf-8') as file:
+        try:
+            entries = json.load(file)
+        except ValueError as error:
+            raise CatalogError(f"{path}: {error}") from None
+    if not isinstance(entries, list):
+        raise CatalogError(f"{path}: expected a list of entries")
+    for index, entry in enumerate(entries):
+        validate_entry(kind, entry, f"{path}: entry {index + 1}")
+    _name_positions([entry['name'] for entry in entries], path)
+    return {'entries': entries}
+
+
+def _compile_jsonl(path, kind):
+    import json
+    offsets = array('q')
+    names = []
+    position = 0
+    with open(path, 'rb') as file:
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                try:
+                    entry = json.loads(line)
+                except ValueError as error:
+                    raise CatalogError(f"{path}:{number}: {error}") from None
+                names.append(validate_entry(kind, entry, f"{path}:{number}")['name'])
+                offsets.append(position)
+            position += len(line)
+    _name_positions(names, path)
+    # Every entry ends where the next one starts, the last one at the end of the file. Blank lines
+    # are read with the entry before them; json.loads ignores the whitespace.
+    offsets.append(position)
+    return {'offsets': offsets.tobytes(), 'names': names}
+
+
+def load_catalog(path, kind=None, use_cache=True):
+    """
+    This function loads a catalog file, validating it against its schema. The validated form is
+    cached next to the file and reused for as long as the file is unchanged.
+
+    :param path: the path of a .json or .jsonl catalog file
+    :param kind: the kind of catalog, a key of SCHEMAS; by default it is taken from the file name
+    :param use_cache: set to False to ignore and not write the compiled cache
+    :return: a Catalog for a .json file, or a LazyCatalog for a .jsonl file.
+    """
+    kind = kind or _kind_of(path)
+    lines = path.endswith('.jsonl')
+    stat = os.stat(path)
+    compiled = _read_cache(path, stat) if use_cache else None
+    if compiled is None:
+        compiled = _compile_jsonl(path, kind) if lines else _compile_json(path, kind)
+        if use_cache:
+            _write_cache(path, stat, compiled)
+    if lines:
+        offsets = array('q')
+        offsets.frombytes(compiled['offsets'])
+        return LazyCatalog(path, kind, offsets, compiled['names'])
+    return Catalog(compiled['entries'])
+
+
+def catalog_path(kind, directory=ROOT):
+    """
+    This function returns the file a catalog is loaded from: <name>.jsonl if it exists in `directory`,
+    else <name>.json.
+    """
+    base = os.path.join(directory, CATALOG_FILES[kind])
+    return base + '.jsonl' if os.path.exists(base + '.jsonl') else base + '.json'
+
+
+def load_catalogs(directory=ROOT, use_cache=True):
+    """
+    This function loads the three catalogs of a game.
+
+    :param directory: the directory that holds the catalog files
+    :param use_cache: set to False to ignore and not write the compiled caches
+    :return: a tuple of (business_types, management_personnel, offshore_locations).
+    """
+    return tuple(load_catalog(catalog_path(kind, directory), kind, use_cache) for kind in CATALOG_FILES)
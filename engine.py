@@ -0,0 +1,919 @@
+#Headless simulation engine for the Business Tycoon game.
+#
+#Every state transition the game supports lives here as a plain function that takes a GameState and
+#explicit, already-resolved arguments (catalog indices, names, amounts) and never calls input() or
+#print(). Invalid actions raise ActionError with the message the interactive game shows to the player.
+#main.py is a thin client on top of this module: it prompts for the arguments, calls the engine and
+#prints the outcome.
+#
+#The engine is the only place the arguments are checked, since the game server and the scripted drivers
+#call it directly: every amount of money an action takes from the player must be a finite number
+#greater than zero.
+#
+#Indices are 0-based. Company and offshore company ids are their position in state.companies and
+#state.offshore_companies; neither is ever deleted, so the ids stay stable for the whole game.
+#
+#Companies, products and offshore companies are the compact records from models.py. The engine uses
+#attribute access; the records also accept dictionary-style access for older callers.
+#
+#Every company caches its 'monthly_revenue', 'monthly_profit' (before difficulty, operating cost and
+#tax) and 'taxed_profit' (what it adds to the cash balance each month), and the GameState keeps the
+#portfolio totals of those three figures. The actions that change a company call refresh_company,
+#which recomputes that one company and applies the difference to the totals, so the monthly tick and
+#the status screen read the totals in constant time instead of rescanning every company.
+#
+#The bulk actions (create_companies, add_products, add_companies_to_offshore, reassign_management and
+#reassign_offshore) check every item before they change anything, so a bulk action either applies in
+#full or leaves the game as it was. They apply the same arithmetic to each item as the single actions.
+#
+#A product's 'revenue' is what it adds to the company's revenue without a manager. A manager multiplies
+#the whole revenue, products included, so remove_product takes the product's revenue off scaled by the
+#current manager's revenue boost, whichever managers came and went since the product was added.
+#
+#Games forked with branching.fork share their companies and offshore companies until one side changes
+#them. Such a game has a set of the records it owns (state.owned); the actions pass every record they
+#are about to change through _writable_company or _writable_offshore, which copy a shared record and
+#put the copy in its place first. Games that were never forked have state.owned = None and pay one
+#attribute check per change.
+
+import math
+
+from models import Company, OffshoreEntity, Product
+
+DEFAULT_TAX_RATE = 0.15
+OPERATING_COST_RATE = 0.05
+PRODUCT_REVENUE_RATE = 0.1
+STARTING_CASH_BALANCE = 10000
+
+# Industries that support company_action, with what the action does in their words.
+COMPANY_ACTIONS = {
+    'Dropshipping': 'launch this product',
+    'Construction': 'start this project',
+}
+
+
+class ActionError(ValueError):
+    """
+    Raised when an action cannot be performed in the current game state. The message is meant to be
+    shown to the player as-is.
+    """
+
+
+class GameState:
+    """
+    The complete state of one game: the player, their money, their companies and offshore companies,
+    and the catalogs the actions choose from.
+    """
+
+    __slots__ = ('player_name', 'cash_balance', 'difficulty_level', 'months_passed', 'companies',
+                 'offshore_companies', 'business_types', 'business_types_by_name', 'management_personnel', 'offshore_locations',
+                 'total_monthly_revenue', 'total_monthly_profit', 'total_taxed_profit', 'journal', 'history', 'instrumentation',
+                 'ledger', 'owned')
+
+    def __init__(self, player_name, cash_balance, difficulty_level, business_types, management_personnel, offshore_locations):
+        self.player_name = player_name
+        self.cash_balance = cash_balance
+        self.difficulty_level = difficulty_level
+        self.months_passed = 0
+        self.companies = []
+        self.offshore_companies = []
+        self.business_types = business_types
+        self.business_types_by_name = {business_type['name']: business_type for business_type in business_types}
+        self.management_personnel = management_personnel
+        self.offshore_locations = offshore_locations
+        self.total_monthly_revenue = 0.0
+        self.total_monthly_profit = 0.0
+        self.total_taxed_profit = 0.0
+        # A journal.Journal that apply_action reports every successful action to, or None.
+        self.journal = None
+        # A history.HistoryRecorder that records the figures of every month, or None.
+        self.history = None
+        # An instrumentation.Instrumentation that apply_action reports the cost of every action to, or None.
+        self.instrumentation = None
+        # A ledger.ProductLedger of the product aggregates, which add_product and remove_product keep up to
+        # date, or None.
+        self.ledger = None
+        # The records this game may change in place while it shares the others with a fork, or None if
+        # it shares nothing.
+        self.owned = None
+
+
+def new_game(player_name, difficulty_level, business_types, management_personnel, offshore_locations, cash_balance=STARTING_CASH_BALANCE):
+    """
+    This function starts a new game. Like the interactive game, it halves the starting cash balance and
+    the revenue and profit margin of every business type. The catalogs passed in are not modified.
+
+    :param player_name: The name of the player
+    :param difficulty_level: the difficulty multiplier applied to company profits (1, 0.75, 0.5 or 0.25)
+    :param business_types: a list of dictionaries with the keys 'name', 'startup_capital', 'revenue'
+    and 'profit_margin'
+    :param management_personnel: a list of dictionaries with the keys 'name', 'salary',
+    'revenue_boost' and 'profit_margin_boost'
+    :param offshore_locations: a list of dictionaries with the keys 'name', 'setup_cost' and 'tax_rate'
+    :param cash_balance: the starting cash balance before the reduction
+    :return: a new GameState.
+    """
+    cash_balance *= 0.5  # Reduce the starting cash balance
+    business_types = [dict(business_type,
+                           revenue=business_type['revenue'] * 0.5,  # Reduce the revenue
+                           profit_margin=business_type['profit_margin'] * 0.5)  # Reduce the profit margin
+                      for business_type in business_types]
+    return GameState(player_name, cash_balance, difficulty_level, business_types, management_personnel, offshore_locations)
+
+
+def _lookup(items, index, message):
+    """
+    This function returns items[index], raising ActionError with `message` for an out-of-range index or
+    one that is not an int (a float or a bool would slip past the range check).
+    """
+    if _is_index(index) and 0 <= index < len(items):
+        return items[index]
+    raise ActionError(message)
+
+
+def _is_index(value):
+    """
+    This function tells whether `value` can be used as an index: an int, but not a bool.
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_amount(amount, message):
+    """
+    This function raises ActionError with `message` unless `amount` is a finite number greater than
+    zero. Every action that takes an amount of money from the player checks it first: the cash checks
+    alone would let a negative or NaN amount through and add money to the cash balance.
+    """
+    try:
+        if math.isfinite(amount) and amount > 0:
+            return
+    except (TypeError, OverflowError):
+        pass
+    raise ActionError(message)
+
+
+def _entries(items, size, message):
+    """
+    This function raises ActionError with `message` unless `items` is a list or tuple of lists or
+    tuples of `size` values each, the shape of the bulk actions' specs and assignments. The bulk actions
+    check it first, so a malformed entry is refused before anything changes.
+
+    :return: `items`.
+    """
+    if not isinstance(items, (list, tuple)):
+        raise ActionError(message)
+    for item in items:
+        if not isinstance(item, (list, tuple)) or len(item) != size:
+            raise ActionError(message)
+    return items
+
+
+def _check_months(months, min_cash, target_cash):
+    """
+    This function raises ActionError unless `months` is a whole number the cash arithmetic can handle
+    and the thresholds are None or numbers, the arguments of advance_months and advance_market_months.
+    """
+    if not _is_index(months):
+        raise ActionError("The number of months must be a whole number.")
+    try:
+        float(months)
+    except OverflowError:
+        raise ActionError("The number of months is too large.") from None
+    for threshold in (min_cash, target_cash):
+        if threshold is not None and not (isinstance(threshold, (int, float)) and not isinstance(threshold, bool)):
+            raise ActionError("The cash thresholds must be numbers.")
+
+
+def get_company(state, company_index):
+    """
+    This function returns the company at `company_index` in the player's list of companies.
+    """
+    return _lookup(state.companies, company_index, "Invalid company number. Please try again.")
+
+
+def get_offshore_company(state, offshore_index):
+    """
+    This function returns the offshore company at `offshore_index` in the player's list of offshore
+    companies.
+    """
+    return _lookup(state.offshore_companies, offshore_index, "Invalid offshore company number. Please try again.")
+
+
+def _writable_company(state, company):
+    """
+    This function returns the company the game may change in place: `company` itself, or, if the game
+    shares it with a fork, a copy that replaces it in state.companies and in its offshore company.
+    """
+    owned = state.owned
+    if owned is None or company in owned:
+        return company
+    company = company.copy()
+    owned.add(company)
+    state.companies[company.id] = company
+    if company.offshore:
+        _writable_offshore(state, state.offshore_companies[company.offshore_id]).companies[company.id] = company
+    return company
+
+
+def _writable_offshore(state, offshore_company):
+    """
+    This function returns the offshore company the game may change in place, like _writable_company.
+    """
+    owned = state.owned
+    if owned is None or offshore_company in owned:
+        return offshore_company
+    offshore_company = offshore_company.copy()
+    owned.add(offshore_company)
+    state.offshore_companies[offshore_company.id] = offshore_company
+    return offshore_company
+
+
+def monthly_revenue(company):
+    """
+    This function returns the monthly revenue of a company: its revenue multiplied by its capital.
+    """
+    return company.revenue * company.capital
+
+
+def monthly_profit(company, difficulty_level=1):
+    """
+    This function returns the monthly profit of a company, before operating cost and tax.
+
+    :param company: the Company to read
+    :param difficulty_level: the difficulty multiplier; hiring decisions use the unscaled profit
+    :return: the monthly revenue multiplied by the profit margin and the difficulty level.
+    """
+    return company.revenue * company.capital * company.profit_margin * difficulty_level
+
+
+def company_tax_rate(state, company):
+    """
+    This function returns the tax rate that applies to a company: the tax rate of its offshore company,
+    or the default tax rate.
+    """
+    if company.offshore:
+        return state.offshore_companies[company.offshore_id].tax_rate
+    return DEFAULT_TAX_RATE
+
+
+def company_figures(state, company):
+    """
+    This function computes the monthly figures of one company from scratch.
+
+    :param state: the GameState the company belongs to
+    :param company: the Company to read
+    :return: a tuple of (monthly revenue, monthly profit, taxed profit). The taxed profit is computed
+    exactly like update_cash_balance does.
+    """
+    revenue = monthly_revenue(company)
+    profit = revenue * company.profit_margin
+    operating_cost = company.capital * OPERATING_COST_RATE
+    taxed_profit = ((profit * state.difficulty_level) - operating_cost) * (1 - company_tax_rate(state, company))  # Deduct operating_cost before taxes
+    return revenue, profit, taxed_profit
+
+
+def refresh_company(state, company):
+    """
+    This function recomputes the cached monthly figures of one company after it changed and applies
+    the difference to the portfolio totals of the GameState.
+
+    :param state: the GameState the company belongs to
+    :param company: the Company that changed
+    """
+    revenue, profit, taxed_profit = company_figures(state, company)
+    state.total_monthly_revenue += revenue - company.monthly_revenue
+    state.total_monthly_profit += profit - company.monthly_profit
+    state.total_taxed_profit += taxed_profit - company.taxed_profit
+    company.monthly_revenue = revenue
+    company.monthly_profit = profit
+    company.taxed_profit = taxed_profit
+
+
+def recompute_totals(state):
+    """
+    This function recomputes every company's cached figures and the portfolio totals from scratch. The
+    totals are kept up to date with differences, so after a very long game they can drift from an
+    exact sum in the last few bits; this brings them back in line.
+
+    :param state: the GameState to update
+    """
+    for company in state.companies:
+        company = _writable_company(state, company)
+        company.monthly_revenue, company.monthly_profit, company.taxed_profit = company_figures(state, company)
+    state.total_monthly_revenue = math.fsum(company.monthly_revenue for company in state.companies)
+    state.total_monthly_profit = math.fsum(company.monthly_profit for company in state.companies)
+    state.total_taxed_profit = math.fsum(company.taxed_profit for company in state.companies)
+
+
+def create_company(state, business_index, company_name, capital):
+    """
+    This function creates a new company of the chosen business type, subtracts its capital from the
+    cash balance and adds it to the player's companies.
+
+    :param state: the GameState to modify
+    :param business_index: the index of the business type in state.business_types
+    :param company_name: the name of the new company
+    :param capital: the initial capital, a finite amount of at least the business type's startup
+    capital
+    :return: the Company that was created.
+    """
+    business = _lookup(state.business_types, business_index, "Invalid business type. Please try again.")
+    _check_amount(capital, "The capital must be a positive amount. Please try again.")
+    if capital < business['startup_capital']:
+        raise ActionError("You don't have enough capital to start this business. Please try again.")
+    if state.cash_balance < capital:
+        raise ActionError("You don't have enough cash to start this business. Please try again.")
+    state.cash_balance -= capital
+    return _open_company(state, business, company_name, capital)
+
+
+def _open_company(state, business, company_name, capital):
+    """
+    This function adds a company of a business type to the player's companies, once its capital has
+    been paid.
+    """
+    company = Company(len(state.companies), company_name, business['name'], capital, business['revenue'], business['profit_margin'])
+    state.companies.append(company)
+    if state.owned is not None:
+        state.owned.add(company)
+    refresh_company(state, company)
+    return company
+
+
+def create_companies(state, specs):
+    """
+    This function creates many companies at once, with the same rules and arithmetic as create_company
+    applied to each of them in order. Everything is checked before anything changes, so either every
+    company is created or the game is left as it was.
+
+    :param state: the GameState to modify
+    :param specs: a list of (business index, company name, capital) triples
+    :return: the list of companies that were created.
+    """
+    _entries(specs, 3, "Every company needs a business type, a name and a capital.")
+    businesses = []
+    cash_balance = state.cash_balance
+    for position, (business_index, company_name, capital) in enumerate(specs):
+        business = _lookup(state.business_types, business_index, f"Invalid business type for company number {position + 1}. Please try again.")
+        _check_amount(capital, f"The capital of company number {position + 1} must be a positive amount. Please try again.")
+        if capital < business['startup_capital']:
+            raise ActionError(f"You don't have enough capital to start company number {position + 1}. Please try again.")
+        if cash_balance < capital:
+            raise ActionError(f"You don't have enough cash to start company number {position + 1}. Please try again.")
+        cash_balance -= capital
+        businesses.append(business)
+
+    state.cash_balance = cash_balance
+    return [_open_company(state, business, company_name, capital) for business, (_, company_name, capital) in zip(businesses, specs)]
+
+
+def hire_management(state, company_index, manager_index):
+    """
+    This function hires a manager for a company that has none, provided the company's monthly profit
+    covers the manager's salary, and applies the manager's revenue and profit margin boosts.
+
+    :param state: the GameState to modify
+    :param company_index: the index of the company in state.companies
+    :param manager_index: the index of the manager in state.management_personnel
+    :return: the company the manager was hired for.
+    """
+    company = get_company(state, company_index)
+    if company.management is not None:
+        raise ActionError(f"{company.name} already has a manager: {company.management['name']}. Please fire the current manager before hiring a new one.")
+    manager = _lookup(state.management_personnel, manager_index, "Invalid manager. Please try again.")
+    if manager['salary'] > company.monthly_profit:
+        raise ActionError("You don't have enough monthly profit to hire this manager. Please try again.")
+    company = _writable_company(state, company)
+    company.revenue *= (1 + manager['revenue_boost'])
+    company.profit_margin += manager['profit_margin_boost']
+    company.management = manager
+    refresh_company(state, company)
+    return company
+
+
+def fire_management(state, company_index):
+    """
+    This function fires the manager of a company and reverts the manager's boosts.
+
+    :param state: the GameState to modify
+    :param company_index: the index of the company in state.companies
+    :return: the manager who was fired.
+    """
+    company = get_company(state, company_index)
+    manager = company.management
+    if manager is None:
+        raise ActionError(f"{company.name} does not have a manager to fire.")
+    company = _writable_company(state, company)
+    company.management = None
+    company.revenue /= (1 + manager['revenue_boost'])
+    company.profit_margin -= manager['profit_margin_boost']
+    refresh_company(state, company)
+    return manager
+
+
+def _without_manager(company):
+    """
+    This function returns the (revenue, profit margin) a company has once its manager is fired,
+    computed exactly like fire_management computes them.
+    """
+    manager = company.management
+    if manager is None:
+        return company.revenue, company.profit_margin
+    return company.revenue / (1 + manager['revenue_boost']), company.profit_margin - manager['profit_margin_boost']
+
+
+def _revenue_multiplier(company):
+    # What the company's manager multiplies its revenue by.
+    manager = company.management
+    return 1.0 if manager is None else 1 + manager['revenue_boost']
+
+
+def reassign_management(state, assignments):
+    """
+    This function changes the managers of many companies at once: every listed company's current
+    manager is fired and the new one hired, with the same affordability rule as hire_management.
+    Everything is checked before anything changes, so either every assignment is applied or the game is
+    left as it was.
+
+    :param state: the GameState to modify
+    :param assignments: a list of (company index, manager index) pairs. The manager index may be None
+    to leave the company without a manager.
+    :return: the list of companies that were changed.
+    """
+    _entries(assignments, 2, "Every assignment needs a company number and a manager.")
+    companies = []
+    seen = set()
+    for company_index, manager_index in assignments:
+        company = get_company(state, company_index)
+        if company_index in seen:
+            raise ActionError(f"Company number {company_index + 1} is assigned more than once.")
+        seen.add(company_index)
+        if manager_index is not None:
+            manager = _lookup(state.management_personnel, manager_index, "Invalid manager. Please try again.")
+            revenue, profit_margin = _without_manager(company)
+            if manager['salary'] > revenue * company.capital * profit_margin:
+                raise ActionError(f"{company.name} doesn't have enough monthly profit to hire {manager['name']}.")
+        companies.append(company)
+
+    for company, (company_index, manager_index) in zip(companies, assignments):
+        if company.management is not None:
+            fire_management(state, company_index)
+        if manager_index is not None:
+            hire_management(state, company_index, manager_index)
+    return companies
+
+
+def company_action(state, company_index, cost):
+    """
+    This function performs the industry-specific action of a company (launching a product for a
+    Dropshipping company, starting a building project for a Construction company). The cost is paid
+    from the cash balance and increases the company's revenue by cost times the business type's profit
+    margin.
+
+    :param state: the GameState to modify
+    :param company_index: the index of the company in state.companies
+    :param cost: the amount of money to spend on the action
+    :return: the company the action was performed on.
+    """
+    company = get_company(state, company_index)
+    business_type = state.business_types_by_name.get(company.industry)
+    if business_type is None:
+        raise ActionError("Error: Business type not found.")
+    action = COMPANY_ACTIONS.get(company.industry)
+    if action is None:
+        raise ActionError(f"There is no action available for {company.industry} companies.")
+    _check_amount(cost, "The cost must be a positive amount. Please try again.")
+    if state.cash_balance < cost:
+        raise ActionError(f"You don't have enough cash to {action}. Please try again.")
+    state.cash_balance -= cost
+    company = _writable_company(state, company)
+    company.revenue += cost * business_type['profit_margin']
+    refresh_company(state, company)
+    return company
+
+
+def create_offshore_company(state, location_index, offshore_name):
+    """
+    This function sets up an offshore company in the chosen location and subtracts the setup cost from
+    the cash balance.
+
+    :param state: the GameState to modify
+    :param location_index: the index of the location in state.offshore_locations
+    :param offshore_name: the name of the new offshore company
+    :return: the OffshoreEntity that was created.
+    """
+    location = _lookup(state.offshore_locations, location_index, "Invalid offshore location. Please try again.")
+    if state.cash_balance < location['setup_cost']:
+        raise ActionError("You don't have enough cash to set up an offshore company in this location. Please try again.")
+    state.cash_balance -= location['setup_cost']
+    offshore_company = OffshoreEntity(len(state.offshore_companies), offshore_name, location['name'], location['tax_rate'])
+    state.offshore_companies.append(offshore_company)
+    if state.owned is not None:
+        state.owned.add(offshore_company)
+    return offshore_company
+
+
+def add_company_to_offshore(state, offshore_index, company_index):
+    """
+    This function adds a company that is not part of any offshore company to an offshore company.
+
+    :param state: the GameState to modify
+    :param offshore_index: the index of the offshore company in state.offshore_companies
+    :param company_index: the index of the company in state.companies
+    :return: the company that was added.
+    """
+    offshore_company = get_offshore_company(state, offshore_index)
+    company = get_company(state, company_index)
+    if company.offshore:
+        raise ActionError(f"{company.name} is already part of an offshore company. Please remove it from the current offshore company before adding it to a new one.")
+    offshore_company = _writable_offshore(state, offshore_company)
+    company = _writable_company(state, company)
+    offshore_company.companies[company.id] = company
+    company.offshore = True
+    company.offshore_id = offshore_company.id
+    refresh_company(state, company)
+    return company
+
+
+def add_companies_to_offshore(state, offshore_index, company_indexes):
+    """
+    This function adds many companies that are not part of any offshore company to one offshore
+    company. Everything is checked before anything changes, so either every company is added or the
+    game is left as it was.
+
+    :param state: the GameState to modify
+    :param offshore_index: the index of the offshore company in state.offshore_companies
+    :param company_indexes: a list of indexes of companies in state.companies
+    :return: the list of companies that were added.
+    """
+    offshore_company = get_offshore_company(state, offshore_index)
+    if not isinstance(company_indexes, (list, tuple)):
+        raise ActionError("The companies must be given as a list of company numbers.")
+    seen = set()
+    for company_index in company_indexes:
+        company = get_company(state, company_index)
+        if company.offshore:
+            raise ActionError(f"{company.name} is already part of an offshore company. Please remove it from the current offshore company before adding it to a new one.")
+        if company_index in seen:
+            raise ActionError(f"Company number {company_index + 1} is listed more than once.")
+        seen.add(company_index)
+
+    offshore_company = _writable_offshore(state, offshore_company)
+    companies = []
+    for company_index in company_indexes:
+        company = _writable_company(state, state.companies[company_index])
+        offshore_company.companies[company.id] = company
+        company.offshore = True
+        company.offshore_id = offshore_company.id
+        refresh_company(state, company)
+        companies.append(company)
+    return companies
+
+
+def remove_company_from_offshore(state, offshore_index, company_index):
+    """
+    This function removes a company from the offshore company it belongs to.
+
+    :param state: the GameState to modify
+    :param offshore_index: the index of the offshore company in state.offshore_companies
+    :param company_index: the index of the company in state.companies
+    :return: the company that was removed.
+    """
+    offshore_company = get_offshore_company(state, offshore_index)
+    company = get_company(state, company_index)
+    if company.offshore_id != offshore_company.id:
+        raise ActionError(f"{company.name} is not part of {offshore_company.name}.")
+    offshore_company = _writable_offshore(state, offshore_company)
+    company = _writable_company(state, company)
+    del offshore_company.companies[company.id]
+    company.offshore = False
+    company.offshore_id = None
+    refresh_company(state, company)
+    return company
+
+
+def reassign_offshore(state, new_offshore_companies, assignments):
+    """
+    This function applies a whole offshore plan at once: it sets up new offshore companies and moves
+    companies between offshore companies, or out of them. Everything is checked before anything
+    changes, so either the whole plan is applied or the game is left as it was.
+
+    :param state: the GameState to modify
+    :param new_offshore_companies: a list of (location index, name) pairs of the offshore companies to
+    set up; they get the indexes that follow the existing offshore companies, in order
+    :param assignments: a list of (company index, offshore index) pairs. The offshore index may refer
+    to an existing or a new offshore company, or be None to take the company out of its offshore
+    company.
+    :return: the list of OffshoreEntity objects that were created.
+    """
+    _entries(new_offshore_companies, 2, "Every new offshore company needs a location and a name.")
+    _entries(assignments, 2, "Every assignment needs a company number and an offshore company number.")
+    locations = [_lookup(state.offshore_locations, location_index, "Invalid offshore location. Please try again.")
+                 for location_index, _ in new_offshore_companies]
+    if state.cash_balance < sum(location['setup_cost'] for location in locations):
+        raise ActionError("You don't have enough cash to set up these offshore companies. Please try again.")
+    offshore_count = len(state.offshore_companies) + len(locations)
+    moved = set()
+    for company_index, offshore_index in assignments:
+        get_company(state, company_index)
+        if company_index in moved:
+            raise ActionError(f"Company number {company_index + 1} is assigned more than once.")
+        moved.add(company_index)
+        if offshore_index is not None and not (_is_index(offshore_index) and 0 <= offshore_index < offshore_count):
+            raise ActionError("Invalid offshore company number. Please try again.")
+
+    created = [create_offshore_company(state, location_index, offshore_name) for location_index, offshore_name in new_offshore_companies]
+    for company_index, offshore_index in assignments:
+        company = state.companies[company_index]
+        if company.offshore_id == offshore_index:
+            continue
+        company = _writable_company(state, company)
+        if company.offshore:
+            del _writable_offshore(state, state.offshore_companies[company.offshore_id]).companies[company.id]
+        if offshore_index is None:
+            company.offshore = False
+            company.offshore_id = None
+        else:
+            _writable_offshore(state, state.offshore_companies[offshore_index]).companies[company.id] = company
+            company.offshore = True
+            company.offshore_id = offshore_index
+        refresh_company(state, company)
+    return created
+
+
+def add_product(state, company_index, product_name, investment):
+    """
+    This function adds a new product to a company. The investment is paid from the cash balance, adds
+    10% of the investment to the company's revenue and raises its profit margin accordingly.
+
+    :param state: the GameState to modify
+    :param company_index: the index of the company in state.companies
+    :param product_name: the name of the new product
+    :param investment: the amount of money to invest in the product
+    :return: a tuple containing the new product and the profit it added.
+    """
+    company = get_company(state, company_index)
+    _check_amount(investment, "The investment must be a positive amount. Please try again.")
+    if state.cash_balance < investment:
+        raise ActionError("You don't have enough cash to invest in this Product(s). Please try again.")
+    state.cash_balance -= investment
+    company = _writable_company(state, company)
+    product, added_profit = _invest(company, product_name, investment)
+    refresh_company(state, company)
+    if state.ledger is not None:
+        state.ledger.record_added(company.id, product)
+    return product, added_profit
+
+
+def _invest(company, product_name, investment):
+    """
+    This function adds a product to a company whose investment has been paid, without refreshing the
+    company's cached figures.
+
+    :return: a tuple containing the new product and the profit it added.
+    """
+    added_revenue = investment * PRODUCT_REVENUE_RATE
+    added_profit = added_revenue * company.profit_margin
+    company.revenue += added_revenue
+    company.profit_margin += (company.profit_margin * added_profit) / company.revenue
+    # The revenue the product adds without the current manager's boost.
+    product = Product(product_name, investment, added_revenue / _revenue_multiplier(company))
+    company.products.append(product)
+    return product, added_profit
+
+
+def add_products(state, specs):
+    """
+    This function adds many products at once, with the same rules and arithmetic as add_product applied
+    to each of them in order. Every company's cached figures are refreshed once, after all of its new
+    products. Everything is checked before anything changes, so either every product is added or the
+    game is left as it was.
+
+    :param state: the GameState to modify
+    :param specs: a list of (company index, product name, investment) triples
+    :return: the list of products that were added.
+    """
+    _entries(specs, 3, "Every product needs a company number, a name and an investment.")
+    cash_balance = state.cash_balance
+    for position, (company_index, _, investment) in enumerate(specs):
+        get_company(state, company_index)
+        _check_amount(investment, f"The investment in product number {position + 1} must be a positive amount. Please try again.")
+        if cash_balance < investment:
+            raise ActionError(f"You don't have enough cash to invest in product number {position + 1}. Please try again.")
+        cash_balance -= investment
+
+    state.cash_balance = cash_balance
+    products = []
+    changed = {}
+    for company_index, product_name, investment in specs:
+        company = _writable_company(state, state.companies[company_index])
+        product = _invest(company, product_name, investment)[0]
+        products.append(product)
+        changed[company_index] = company
+        if state.ledger is not None:
+            state.ledger.record_added(company_index, product)
+    for company in changed.values():
+        refresh_company(state, company)
+    return products
+
+
+def remove_product(state, company_index, product_index):
+    """
+    This function removes a product from a company and takes the revenue the product adds off the
+    company's revenue, scaled by the current manager's revenue boost. The profit margin it raised stays
+    as it is.
+
+    :param state: the GameState to modify
+    :param company_index: the index of the company in state.companies
+    :param product_index: the index of the product in the company's 'products' list
+    :return: the product that was removed.
+    """
+    company = get_company(state, company_index)
+    if len(company.products) == 0:
+        raise ActionError(f"{company.name} has no Product(s) to remove.")
+    _lookup(company.products, product_index, "Invalid product number. Please try again.")
+    company = _writable_company(state, company)
+    product = company.products.pop(product_index)
+    company.revenue -= product.revenue * _revenue_multiplier(company)
+    refresh_company(state, company)
+    if state.ledger is not None:
+        state.ledger.record_removed(company.id, product_index)
+    return product
+
+
+def update_cash_balance(cash_balance, companies, offshore_companies, difficulty_level):
+    """
+    The function updates the cash balance by calculating the taxed profit of each company, taking into
+    account the operating cost and tax rate, and adding it to the current cash balance.
+
+    :param cash_balance: The current balance of cash available
+    :param companies: a list of Company records, with each record containing information about a
+    single company such as revenue, capital, and profit margin
+    :param offshore_companies: a list of OffshoreEntity records, where each record contains the
+    following fields: 'id' (int), 'name' (string), 'tax_rate' (float), and 'companies' (dictionary
+    mapping company ids to companies)
+    :param difficulty_level: a numerical value representing the difficulty level of the game
+    :return: the updated cash balance after calculating the taxed profit for each company in the list of
+    companies.
+    """
+    offshore_tax_rates = {offshore_company.id: offshore_company.tax_rate for offshore_company in offshore_companies}
+    for company in companies:
+        profit = company.revenue * company.capital * company.profit_margin
+        operating_cost = company.capital * OPERATING_COST_RATE
+        tax_rate = DEFAULT_TAX_RATE
+        if company.offshore:
+            tax_rate = offshore_tax_rates[company.offshore_id]
+        taxed_profit = ((profit * difficulty_level) - operating_cost) * (1 - tax_rate)  # Deduct operating_cost before taxes
+        cash_balance += taxed_profit
+    return cash_balance
+
+
+def advance_month(state):
+    """
+    This function advances the game by one month, adding every company's taxed profit to the cash
+    balance. It reads the maintained portfolio total, so it takes constant time.
+
+    :param state: the GameState to modify
+    :return: the updated cash balance.
+    """
+    if state.instrumentation is None:
+        # _accrue, inlined: the tick is the game's hottest path.
+        state.cash_balance += state.total_taxed_profit
+        state.months_passed += 1
+        if state.history is not None:
+            state.history.record(state)
+    else:
+        state.instrumentation.measure(state, 'update_cash_balance', _accrue, (1,))
+    return state.cash_balance
+
+
+def _accrue(state, months):
+    # The monthly tick's cash update, which update_cash_balance performs in the original loop: the cash
+    # balance plus `months` times the monthly cash flow, the months it took and their history row. An
+    # instrumentation measures all of it as 'update_cash_balance'.
+    state.cash_balance = state.cash_balance + months * state.total_taxed_profit
+    state.months_passed += months
+    if state.history is not None:
+        state.history.record(state, months)
+
+
+def monthly_cash_flow(state):
+    """
+    This function returns how much one month adds to the cash balance: the sum of every company's
+    taxed profit. It only changes when an action changes a company or an offshore company.
+
+    :param state: the GameState to read
+    :return: the change in cash balance for one month.
+    """
+    return state.total_taxed_profit
+
+
+def advance_months(state, months, min_cash=None, target_cash=None):
+    """
+    This function advances the game by up to `months` months at once. The monthly cash flow is constant
+    between actions, so the accrual is computed in closed form (cash balance plus months times the
+    monthly cash flow) in constant time instead of running the monthly tick `months` times.
+
+    Because the months are multiplied rather than added one by one, the cash balance can differ from
+    calling advance_month repeatedly in the last few bits.
+
+    :param state: the GameState to modify
+    :param months: the maximum number of months to advance
+    :param min_cash: if given, stop at the end of the first month whose cash balance is below this
+    value (use 0 to stop as soon as the cash balance goes negative)
+    :param target_cash: if given, stop at the end of the first month whose cash balance reaches this
+    value
+    :return: the number of months actually advanced.
+    """
+    _check_months(months, min_cash, target_cash)
+    if months <= 0:
+        return 0
+    cash_flow = monthly_cash_flow(state)
+    start = state.cash_balance
+
+    def stopped(month):
+        cash = start + month * cash_flow
+        return (min_cash is not None and cash < min_cash) or (target_cash is not None and cash >= target_cash)
+
+    if stopped(1):
+        month = 1
+    else:
+        # The cash balance moves in a straight line, so each threshold is crossed at most once.
+        month = months
+        if min_cash is not None and cash_flow < 0:
+            month = min(month, max(1, math.floor((start - min_cash) / -cash_flow) + 1))
+        if target_cash is not None and cash_flow > 0:
+            month = min(month, max(1, math.ceil((target_cash - start) / cash_flow)))
+        # The divisions can be off by one month through rounding; settle on the first month that
+        # actually meets a threshold.
+        while month > 1 and stopped(month - 1):
+            month -= 1
+        while month < months and not stopped(month) and stopped(month + 1):
+            month += 1
+
+    if state.instrumentation is None:
+        _accrue(state, month)
+    else:
+        state.instrumentation.measure(state, 'update_cash_balance', _accrue, (month,))
+    return month
+
+
+def advance_market_months(state, settings, months, min_cash=None, target_cash=None):
+    """
+    This function advances the game by up to `months` months under a random market model, like
+    advance_months. See market.play_months; the model needs NumPy, so it is only imported here.
+
+    :param state: the GameState to modify
+    :param settings: the MarketModel.settings() of the model, its seed and parameters
+    :param months: the maximum number of months to advance
+    :return: the number of months actually advanced.
+    """
+    import market
+    return market.play_months(state, settings, months, min_cash, target_cash)
+
+
+# The actions a player can take, by name. apply_action dispatches through this table so that scripted
+# drivers can run the game from (name, arguments) pairs.
+ACTIONS = {
+    'create_company': create_company,
+    'create_companies': create_companies,
+    'hire_management': hire_management,
+    'fire_management': fire_management,
+    'reassign_management': reassign_management,
+    'company_action': company_action,
+    'create_offshore_company': create_offshore_company,
+    'add_company_to_offshore': add_company_to_offshore,
+    'add_companies_to_offshore': add_companies_to_offshore,
+    'remove_company_from_offshore': remove_company_from_offshore,
+    'reassign_offshore': reassign_offshore,
+    'add_product': add_product,
+    'add_products': add_products,
+    'remove_product': remove_product,
+    'advance_month': advance_month,
+    'advance_months': advance_months,
+    'advance_market_months': advance_market_months,
+}
+
+
+def apply_action(state, action, *args):
+    """
+    This function performs the action called `action` with the given arguments. If the state has a
+    journal, the action is appended to it once it has succeeded. If it has an instrumentation, the
+    action is measured.
+
+    :param state: the GameState to modify
+    :param action: the name of the action, one of the keys of ACTIONS
+    :param args: the arguments of the action after `state`
+    :return: whatever the action returns.
+    """
+    try:
+        function = ACTIONS[action]
+    except KeyError:
+        raise ActionError(f"Unknown action: {action}") from None
+    if state.instrumentation is None:
+        result = function(state, *args)
+    else:
+        result = state.instrumentation.measure(state, action, function, args)
+    if state.journal is not None:
+        state.journal.record(state, action, args)
+    return result
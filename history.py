@@ -0,0 +1,355 @@
+#Per-month history of a game: portfolio and per-company figures after every month, kept within a
+#memory budget.
+#
+#Attach a HistoryRecorder to a GameState (state.history = HistoryRecorder()) and the engine records a
+#row after every advance_month, and one row covering all of the months of an advance_months call.
+#Months played under a market model (see market.py) record what each month actually produced rather
+#than the game's deterministic figures.
+#
+#Rows are kept in preallocated array buffers arranged in tiers. New rows go into the first tier. When a
+#tier is full its oldest rows are merged, `factor` at a time, into one row of the next tier, so with
+#the default factors (3, 4) monthly rows become quarterly rows and quarterly rows become yearly rows.
+#The last tier is a ring: when it is full its oldest row is dropped. Merging keeps the last value of
+#stocks (the cash balance) and the mean per month of flows (revenue and profit), weighted by the
+#months every row covers.
+#
+#The per-company series has three columns per company, so its rows grow with the portfolio. When they
+#do, the tiers hold fewer rows to stay within the budget and older history is merged right away.
+#Figures of companies that did not exist yet are NaN.
+#
+#Every tier holds at least max(factors) rows, so a budget too small for that many rows is exceeded.
+#Rows are merged with NumPy when it is installed.
+#
+#write_csv and write_binary stream the history, oldest row first, straight from the buffers.
+
+import csv
+import math
+import struct
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PORTFOLIO_FIELDS = ('cash_balance', 'monthly_revenue', 'monthly_profit', 'taxed_profit')
+PORTFOLIO_STOCKS = (True, False, False, False)
+COMPANY_FIELDS = ('monthly_revenue', 'monthly_profit', 'taxed_profit')
+
+DEFAULT_MEMORY_BUDGET = 8 * 1024 * 1024
+DEFAULT_FACTORS = (3, 4)
+# The share of the memory budget given to the portfolio series when per-company figures are recorded.
+PORTFOLIO_SHARE = 1 / 16
+
+NAN = float('nan')
+BINARY_MAGIC = b'BTHIST01'
+
+
+class Series:
+    """
+    A tiered history of rows of `width` numbers, each covering `span` months from month `start`.
+    """
+
+    def __init__(self, width, stocks, factors=DEFAULT_FACTORS, memory_budget=DEFAULT_MEMORY_BUDGET):
+        """
+        :param width: the number of numbers in a row
+        :param stocks: a function that tells from a column number whether the column is a stock, whose
+        merged value is the last one, or a flow, whose merged value is the mean per month
+        :param factors: how many rows of every tier are merged into one row of the next tier
+        :param memory_budget: the number of bytes the buffers may use together
+        """
+        self.stocks = stocks
+        self.factors = tuple(factors)
+        self.memory_budget = memory_budget
+        self.width = 0
+        self.capacity = 0
+        self.tiers = [_Tier() for _ in range(len(self.factors) + 1)]
+        self.resize(width)
+
+    def resize(self, width):
+        """
+        This function changes the width of the rows, padding existing rows with NaN, and resizes the
+        tiers to the memory budget, merging older rows as needed.
+        """
+        row_bytes = 16 + 8 * max(width, 1)
+        # Every tier holds at least as many rows as are merged out of it at once.
+        minimum = max(self.factors) if self.factors else 1
+        capacity = max(minimum, self.memory_budget // (row_bytes * len(self.tiers)))
+        for level in range(len(self.tiers) - 1, -1, -1):
+            while self.tiers[level].count > capacity:
+                self._make_room(level, capacity)
+        for tier in self.tiers:
+            tier.reallocate(capacity, self.width, width)
+        self.width = width
+        self.capacity = capacity
+
+    def _make_room(self, level, capacity=None):
+        capacity = self.capacity if capacity is None else capacity
+        tier = self.tiers[level]
+        if level == len(self.factors):
+            tier.drop_oldest()
+            return
+        merged = self._merge(tier, self.factors[level])
+        if self.tiers[level + 1].count >= capacity:
+            self._make_room(level + 1, capacity)
+        self.tiers[level + 1].push(*merged)
+
+    def _merge(self, tier, count):
+        """
+        This function removes the `count` oldest rows of a tier and returns them merged into one, as
+        (start, span, values).
+        """
+        width = self.width
+        rows = [tier.oldest(i) for i in range(count)]
+        spans = [tier.spans[position] for position in rows]
+        start = tier.starts[rows[0]]
+        values = tier.values
+        merged = array('d', bytes(8 * width))
+        if np is not None:
+            self._merge_numpy(values, rows, spans, merged)
+            for _ in range(count):
+                tier.drop_oldest()
+            return start, sum(spans), merged
+        for column in range(width):
+            if self.stocks(column):
+                merged[column] = values[rows[-1] * width + column]
+            else:
+                total = 0.0
+                months = 0
+                for position, span in zip(rows, spans):
+                    value = values[position * width + column]
+                    if value == value:  # skips NaN
+                        total += value * span
+                        months += span
+                merged[column] = total / months if months else NAN
+        for _ in range(count):
+            tier.drop_oldest()
+        return start, sum(spans), merged
+
+    def _merge_numpy(self, values, rows, spans, merged):
+        width = self.width
+        table = np.frombuffer(values, dtype=np.float64).reshape(-1, width)[rows]
+        weights = np.array(spans, dtype=np.float64)[:, None]
+        present = ~np.isnan(table)
+        months = (present * weights).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(present, table * weights, 0.0).sum(axis=0) / months
+        stocks = np.array([self.stocks(column) for column in range(width)], dtype=bool)
+        result = np.where(stocks, table[-1], means)
+        np.frombuffer(merged, dtype=np.float64)[:] = result
+
+    def append(self, start, span, values):
+        """
+        This function adds the newest row.
+
+        :param start: the first month the row covers
+        :param span: the number of months it covers
+        :param values: an array('d') of `width` numbers
+        """
+        if self.tiers[0].count >= self.capacity:
+            self._make_room(0)
+        self.tiers[0].push(start, span, values)
+
+    def __len__(self):
+        return sum(tier.count for tier in self.tiers)
+
+    def nbytes(self):
+        """
+        This function returns the number of bytes the buffers use.
+        """
+        return sum(tier.nbytes() for tier in self.tiers)
+
+    def segments(self):
+        """
+        This function yields the rows, oldest first, as (starts, spans, values) memoryview slices of the
+        buffers: at most two per tier, since a tier is a ring.
+        """
+        for tier in reversed(self.tiers):
+            for first, last in tier.ranges():
+                yield (memoryview(tier.starts)[first:last], memoryview(tier.spans)[first:last],
+                       memoryview(tier.values)[first * self.width:last * self.width])
+
+    def rows(self):
+        """
+        This function yields every row, oldest first, as (start, span, values) with the values as a
+        memoryview of the buffer.
+        """
+        width = self.width
+        for starts, spans, values in self.segments():
+            for i in range(len(starts)):
+                yield starts[i], spans[i], values[i * width:(i + 1) * width]
+
+
+class _Tier:
+    """
+    A ring of rows: parallel arrays of start months, spans and values.
+    """
+
+    __slots__ = ('starts', 'spans', 'values', 'head', 'count', 'capacity', 'width')
+
+    def __init__(self):
+        self.starts = array('q')
+        self.spans = array('q')
+        self.values = array('d')
+        self.head = 0
+        self.count = 0
+        self.capacity = 0
+        self.width = 0
+
+    def oldest(self, i):
+        return (self.head + i) % self.capacity
+
+    def ranges(self):
+        end = self.head + self.count
+        if end <= self.capacity:
+            return [(self.head, end)] if self.count else []
+        return [(self.head, self.capacity), (0, end - self.capacity)]
+
+    def push(self, start, span, values):
+        position = (self.head + self.count) % self.capacity
+        self.starts[position] = start
+        self.spans[position] = span
+        self.values[position * self.width:(position + 1) * self.width] = values
+        self.count += 1
+
+    def drop_oldest(self):
+        self.head = (self.head + 1) % self.capacity
+        self.count -= 1
+
+    def reallocate(self, capacity, old_width, width):
+        # Copies the rows, oldest first, into new buffers starting at position 0.
+        starts = array('q', bytes(8 * capacity))
+        spans = array('q', bytes(8 * capacity))
+        values = array('d', [NAN]) * (capacity * width)
+        copy = min(old_width, width)
+        for i in range(self.count):
+            position = self.oldest(i)
+            starts[i] = self.starts[position]
+            spans[i] = self.spans[position]
+            values[i * width:i * width + copy] = self.values[position * old_width:position * old_width + copy]
+        self.starts, self.spans, self.values = starts, spans, values
+        self.head = 0
+        self.capacity = capacity
+        self.width = width
+
+    def nbytes(self):
+        return (len(self.starts) + len(self.spans) + len(self.values)) * 8
+
+
+class HistoryRecorder:
+    """
+    Records the portfolio figures, and optionally every company's figures, after every month. Attach
+    it with state.history = HistoryRecorder().
+
+    'portfolio' is a Series with the columns of PORTFOLIO_FIELDS. 'companies' is a Series with the
+    columns of COMPANY_FIELDS for every company id in turn, or None.
+    """
+
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET, companies=True, factors=DEFAULT_FACTORS):
+        """
+        :param memory_budget: the number of bytes the history may use
+        :param companies: whether to record the figures of every company
+        :param factors: how many rows of every tier are merged into one row of the next tier
+        """
+        portfolio_budget = int(memory_budget * PORTFOLIO_SHARE) if companies else memory_budget
+        self.portfolio = Series(len(PORTFOLIO_FIELDS), lambda column: PORTFOLIO_STOCKS[column], factors, portfolio_budget)
+        self.companies = Series(0, lambda column: False, factors, memory_budget - portfolio_budget) if companies else None
+        self._company_slots = 0
+
+    def record(self, state, months=1, totals=None, figures=None):
+        """
+        This function records the figures of the game at the end of a month. The engine calls it.
+
+        :param state: the GameState that advanced
+        :param months: the number of months the advance covered; their figures were the same
+        :param totals: the (monthly revenue, monthly profit, taxed profit) of the portfolio, when the
+        month produced something else than the game's cached figures, e.g. under a market model
+        :param figures: with totals, the same three figures of every company, as three sequences in
+        company order
+        """
+        start = state.months_passed - months + 1
+        if totals is None:
+            totals = (state.total_monthly_revenue, state.total_monthly_profit, state.total_taxed_profit)
+        self.portfolio.append(start, months, array('d', (state.cash_balance, *totals)))
+        if self.companies is None:
+            return
+        companies = state.companies
+        if len(companies) > self._company_slots:
+            # Columns grow by a quarter at a time, so the buffers are reallocated a logarithmic number
+            # of times.
+            self._company_slots = max(len(companies), self._company_slots + self._company_slots // 4, 16)
+            self.companies.resize(len(COMPANY_FIELDS) * self._company_slots)
+        row = array('d', [NAN]) * self.companies.width
+        if figures is None:
+            row[:3 * len(companies)] = array('d', [figure for company in companies
+                                                   for figure in (company.monthly_revenue, company.monthly_profit, company.taxed_profit)])
+        else:
+            for column, values in enumerate(figures):
+                row[column:3 * len(companies):3] = array('d', values)
+        self.companies.append(start, months, row)
+
+    def nbytes(self):
+        """
+        This function returns the number of bytes the history buffers use.
+        """
+        return self.portfolio.nbytes() + (self.companies.nbytes() if self.companies is not None else 0)
+
+    def write_csv(self, file, series='portfolio'):
+        """
+        This function writes a series as CSV, oldest row first, one row at a time.
+
+        :param file: a text file opened for writing, with newline=''
+        :param series: 'portfolio' for one line per row, or 'companies' for one line per company and row
+        """
+        writer = csv.writer(file)
+        if series == 'portfolio':
+            writer.writerow(('start_month', 'months') + PORTFOLIO_FIELDS)
+            for start, span, values in self.portfolio.rows():
+                writer.writerow((start, span, *values))
+            return
+        if self.companies is None:
+            raise ValueError("This history does not record company figures.")
+        writer.writerow(('start_month', 'months', 'company_id') + COMPANY_FIELDS)
+        fields = len(COMPANY_FIELDS)
+        for start, span, values in self.companies.rows():
+            for company_id in range(len(values) // fields):
+                figures = values[company_id * fields:(company_id + 1) * fields]
+                if not math.isnan(figures[0]):
+                    writer.writerow((start, span, company_id, *figures))
+
+    def write_binary(self, file, series='portfolio'):
+        """
+        This function writes a series in a binary layout, straight from the buffers: the magic bytes,
+        the row count and width as two little-endian 64-bit integers, then the start months and spans
+        (int64) and the values (float64, row after row) of all rows, oldest first, in native byte order.
+        read_binary reads it back.
+
+        :param file: a binary file opened for writing
+        :param series: 'portfolio' or 'companies'
+        """
+        data = self.portfolio if series == 'portfolio' else self.companies
+        if data is None:
+            raise ValueError("This history does not record company figures.")
+        file.write(BINARY_MAGIC + struct.pack('<qq', len(data), data.width))
+        segments = list(data.segments())
+        for column in range(3):
+            for segment in segments:
+                file.write(segment[column])
+
+
+def read_binary(file):
+    """
+    This function reads a series written by HistoryRecorder.write_binary.
+
+    :param file: a binary file opened for reading
+    :return: a tuple of (starts, spans, values, width), where starts and spans are array('q') and
+    values is an array('d') of row after row of `width` numbers.
+    """
+    if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError("Not a history file.")
+    count, width = struct.unpack('<qq', file.read(16))
+    starts, spans, values = array('q'), array('q'), array('d')
+    starts.fromfile(file, count)
+    spans.fromfile(file, count)
+    values.fromfile(file, count * width)
+    return starts, spans, values, width
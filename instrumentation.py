@@ -0,0 +1,277 @@
+#Opt-in instrumentation of the engine: call counts, wall time and memory blocks per action.
+#
+#Attach an Instrumentation to a GameState (state.instrumentation = Instrumentation()) and
+#engine.apply_action measures every action it dispatches, which covers every choice of main_game_loop
+#and the monthly tick (advance_month). The tick's cash update, which update_cash_balance performs in
+#the original loop, is also measured on its own as 'update_cash_balance' (see engine._accrue): the
+#whole update, from reading the cash balance and the monthly cash flow to recording the month in the
+#history, once per advance_month or advance_months. Functions called outside apply_action, such as
+#engine.update_cash_balance itself, can be measured with wrap(). Without an Instrumentation the engine
+#only pays for one attribute check per action.
+#
+#For every action it keeps the number of calls and of calls that raised, the total and the largest
+#wall time, the net change in allocated memory blocks ('net_blocks', from sys.getallocatedblocks:
+#blocks allocated minus blocks freed, so it is negative for calls that free more than they allocate)
+#and a histogram of the wall times with buckets about 9% wide, from
+#which p50 and p99 are read without keeping every sample.
+#Calls slower than the p99 of their action so far are kept, with the size of the portfolio and the
+#number of offshore members at the time, in a ring of the last SLOW_CALLS such calls.
+#
+#'net_blocks' is not a count of allocations. CPython only reports the blocks alive at a given moment
+#(sys.getallocatedblocks, and tracemalloc's statistics, whose 'count' is the live blocks per traceback
+#too), so a call that allocates and frees a thousand temporaries shows up as 0. Counting every allocation
+#would take a hook on the allocator; tracemalloc is the closest, and it slows every allocation of the
+#process several times over, so it is left to the benchmarks rather than kept on here. The net figure
+#is what can be measured cheaply, and it still shows the calls that make a game grow.
+#
+#snapshot() returns all of it as a dictionary. With a dump path, the snapshot is also written there as
+#JSON every `dump_interval` seconds (checked after each measured call), replacing the previous dump.
+#
+#The interactive game enables it when the BT_PROFILE environment variable names the dump file; the
+#server shares one Instrumentation between all of its sessions with --profile, including the actions
+#it runs on worker threads: record() and snapshot() take a lock, so measurements from several threads
+#add up.
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+DEFAULT_DUMP_INTERVAL = 60.0
+# The number of slow calls kept for snapshots.
+SLOW_CALLS = 100
+# Slow calls are only recorded once an action has been measured this often, so its p99 means something.
+SLOW_AFTER = 100
+# Every power of two of nanoseconds is split into 2 ** SUB_BUCKET_BITS histogram buckets.
+SUB_BUCKET_BITS = 3
+_SHIFT = SUB_BUCKET_BITS
+_MASK = (1 << SUB_BUCKET_BITS) - 1
+
+
+def time_bucket(nanoseconds):
+    """
+    This function returns the histogram bucket of a duration: the position of its highest bit and the
+    SUB_BUCKET_BITS bits after it.
+    """
+    bits = nanoseconds.bit_length()
+    if bits <= SUB_BUCKET_BITS + 1:
+        return nanoseconds
+    return (bits << SUB_BUCKET_BITS) | ((nanoseconds >> (bits - SUB_BUCKET_BITS - 1)) & ((1 << SUB_BUCKET_BITS) - 1))
+
+
+def bucket_floor(bucket):
+    """
+    This function returns the shortest duration, in nanoseconds, that falls in a bucket from time_bucket.
+    """
+    if bucket < (SUB_BUCKET_BITS + 2) << SUB_BUCKET_BITS:
+        return bucket
+    bits = bucket >> SUB_BUCKET_BITS
+    fraction = bucket & ((1 << SUB_BUCKET_BITS) - 1)
+    return ((1 << SUB_BUCKET_BITS) | fraction) << (bits - SUB_BUCKET_BITS - 1)
+
+
+class ActionStats:
+    """
+    The measurements of one action.
+    """
+
+    __slots__ = ('calls', 'errors', 'total_ns', 'max_ns', 'net_blocks', 'histogram', 'slow_bucket')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.net_blocks = 0
+        self.histogram = {}
+        # The bucket of the p99 as of the last slow-call check; calls in a higher bucket are slow.
+        self.slow_bucket = None
+
+    def percentile(self, percent):
+        """
+        This function estimates a percentile of the wall time, in seconds, from the histogram.
+
+        :param percent: the percentile to estimate, between 0 and 100
+        :return: the lower edge of the bucket holding that percentile, or None without calls.
+        """
+        if self.calls == 0:
+            return None
+        rank = percent / 100 * (self.calls - 1)
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen > rank:
+                return bucket_floor(bucket) / 1e9
+        return self.max_ns / 1e9
+
+    def summary(self):
+        return {'calls': self.calls, 'errors': self.errors, 'total_seconds': self.total_ns / 1e9,
+                'mean_seconds': self.total_ns / self.calls / 1e9 if self.calls else None,
+                'p50_seconds': self.percentile(50), 'p99_seconds': self.percentile(99), 'max_seconds': self.max_ns / 1e9,
+                'net_blocks': self.net_blocks}
+
+
+def portfolio_size(state):
+    """
+    This function returns what slow calls are correlated with: the months passed, the number of
+    companies, offshore companies and offshore members of a game.
+    """
+    return {'months_passed': state.months_passed, 'companies': len(state.companies),
+            'offshore_companies': len(state.offshore_companies),
+            'offshore_members': sum(len(entity.companies) for entity in state.offshore_companies)}
+
+
+def _nothing():
+    pass
+
+
+class Instrumentation:
+    """
+    Measurements of the actions of one or more games.
+    """
+
+    def __init__(self, dump_path=None, dump_interval=DEFAULT_DUMP_INTERVAL, net_blocks=True):
+        """
+        :param dump_path: the file the snapshot is written to periodically, or None
+        :param dump_interval: the seconds between two dumps
+        :param net_blocks: whether to track the net change in allocated blocks, which costs two
+        sys.getallocatedblocks calls per action
+        """
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self.net_blocks = net_blocks
+        self.actions = {}
+        self.slow_calls = deque(maxlen=SLOW_CALLS)
+        self.started = time.time()
+        # The server measures actions on its worker threads too; record() and snapshot() hold this lock.
+        self._lock = threading.Lock()
+        # Dumps are scheduled on the perf_counter_ns clock, which every measurement reads anyway.
+        self._next_dump = time.perf_counter_ns() + int(dump_interval * 1e9)
+        # Measuring holds a few blocks of its own (the clock readings), which are subtracted from every
+        # call. They are found by measuring a function that does nothing.
+        self._own_blocks = 0
+        if net_blocks:
+            totals = [0]
+            for _ in range(16):
+                self.measure(None, '', _nothing, ())
+                totals.append(self.actions[''].net_blocks)
+            del self.actions['']
+            self._own_blocks = min(after - before for before, after in zip(totals, totals[1:]))
+
+    def measure(self, state, name, function, args):
+        """
+        This function calls function(state, *args) and records the call under `name`.
+
+        :param state: the GameState the action is applied to, or None for a function that takes none
+        :return: whatever the function returns; exceptions are recorded and raised again.
+        """
+        net_blocks = self.net_blocks
+        blocks = sys.getallocatedblocks() if net_blocks else 0
+        start = time.perf_counter_ns()
+        failed = False
+        try:
+            return function(state, *args) if state is not None else function(*args)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            end = time.perf_counter_ns()
+            blocks = sys.getallocatedblocks() - blocks - self._own_blocks if net_blocks else 0
+            self.record(name, end - start, blocks, failed, state, end)
+
+    def record(self, name, elapsed_ns, net_blocks=0, failed=False, state=None, now=None):
+        """
+        This function records one call that took `elapsed_ns` nanoseconds.
+
+        :param net_blocks: the memory blocks the call allocated minus the ones it freed
+        :param failed: whether the call raised
+        :param state: the GameState the call was made on, for the portfolio size of slow calls
+        :param now: the time.perf_counter_ns() reading at the end of the call, if the caller has one
+        """
+        with self._lock:
+            stats = self.actions.get(name)
+            if stats is None:
+                stats = self.actions[name] = ActionStats()
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_ns += elapsed_ns
+            if elapsed_ns > stats.max_ns:
+                stats.max_ns = elapsed_ns
+            stats.net_blocks += net_blocks
+            # time_bucket(elapsed_ns), inlined.
+            bits = elapsed_ns.bit_length()
+            bucket = elapsed_ns if bits <= _SHIFT + 1 else (bits << _SHIFT) | ((elapsed_ns >> (bits - _SHIFT - 1)) & _MASK)
+            stats.histogram[bucket] = stats.histogram.get(bucket, 0) + 1
+            if stats.calls >= SLOW_AFTER:
+                # The p99 bucket is refreshed every SLOW_AFTER calls rather than on every call.
+                if stats.slow_bucket is None or stats.calls % SLOW_AFTER == 0:
+                    stats.slow_bucket = time_bucket(int(stats.percentile(99) * 1e9))
+                if bucket > stats.slow_bucket:
+                    call = {'action': name, 'seconds': elapsed_ns / 1e9, 'at': time.time()}
+                    if state is not None:
+                        call.update(portfolio_size(state))
+                    self.slow_calls.append(call)
+        if self.dump_path is not None and (time.perf_counter_ns() if now is None else now) >= self._next_dump:
+            self.dump()
+
+    def wrap(self, name, function):
+        """
+        This function returns a wrapper of `function` that records every call under `name`, for
+        functions that are not dispatched through engine.apply_action, e.g.
+        engine.update_cash_balance = instrumentation.wrap('update_cash_balance', engine.update_cash_balance)
+        """
+        def measured(*args):
+            return self.measure(None, name, function, args)
+        measured.__wrapped__ = function
+        return measured
+
+    def snapshot(self, state=None):
+        """
+        This function returns the measurements so far.
+
+        :param state: if given, the current size of this game is included
+        :return: a dictionary with the per-action summaries, the recent slow calls and, with a state,
+        the portfolio size.
+        """
+        with self._lock:
+            snapshot = {'started': self.started, 'taken': time.time(),
+                        'actions': {name: stats.summary() for name, stats in sorted(self.actions.items())},
+                        'slow_calls': list(self.slow_calls)}
+        if state is not None:
+            snapshot['portfolio'] = portfolio_size(state)
+        return snapshot
+
+    def dump(self, path=None):
+        """
+        This function writes the snapshot as JSON, replacing the file atomically.
+
+        :param path: the file to write; defaults to the dump path
+        """
+        path = self.dump_path if path is None else path
+        self._next_dump = time.perf_counter_ns() + int(self.dump_interval * 1e9)
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, indent=1)
+        os.replace(temporary, path)
+
+    def reset(self):
+        """
+        This function forgets every measurement.
+        """
+        self.actions = {}
+        self.slow_calls.clear()
+        self.started = time.time()
+
+
+def format_snapshot(snapshot):
+    """
+    This function formats a snapshot as a table, one line per action, slowest total first.
+    """
+    lines = [f"{'action':<30} {'calls':>9} {'errors':>7} {'total s':>10} {'mean us':>10} {'p50 us':>10} {'p99 us':>10} {'max us':>10} {'net blocks':>10}"]
+    for name, stats in sorted(snapshot['actions'].items(), key=lambda item: -item[1]['total_seconds']):
+        lines.append(f"{name:<30} {stats['calls']:>9} {stats['errors']:>7} {stats['total_seconds']:>10.4f} {stats['mean_seconds'] * 1e6:>10.2f} "
+                     f"{stats['p50_seconds'] * 1e6:>10.2f} {stats['p99_seconds'] * 1e6:>10.2f} {stats['max_seconds'] * 1e6:>10.2f} "
+                     f"{stats['net_blocks']:>10}")
+    return "\n".join(lines)
@@ -0,0 +1,218 @@
+#Append-only action journal with deterministic replay and checkpoints.
+#
+#A journal is a JSON Lines file. The first line records how the game was started (the arguments of
+#engine.new_game); every following line is either an action that succeeded, with its resolved
+#arguments, or a checkpoint:
+#
+#    {"type": "start", "version": 1, "player_name": "...", "difficulty_level": 0.75, "cash_balance": 10000, ...}
+#    {"seq": 1, "action": "create_company", "args": [2, "Shop", 2000]}
+#    {"type": "checkpoint", "seq": 500, "path": "game.journal.500.bts"}
+#
+#Every `checkpoint_interval` actions the whole GameState is written next to the journal with
+#savegame.save_game, so replay() loads the latest checkpoint and only re-applies the actions recorded
+#after it. Lines are flushed as they are written; a line cut short by a crash is ignored on replay.
+#
+#Replay stops at the first line that cannot be read, whether cut short or corrupt. resume() truncates
+#the file there before appending, so the new actions continue the sequence numbers of the replayed
+#ones, and it takes over the checkpoint files the kept lines refer to so the oldest are deleted as new
+#ones are written. Checkpoint files named only by the dropped lines are deleted.
+
+import json
+import os
+
+import engine
+import savegame
+
+JOURNAL_VERSION = 1
+DEFAULT_CHECKPOINT_INTERVAL = 500
+# The number of checkpoint files kept next to a journal; older ones are deleted.
+KEEP_CHECKPOINTS = 2
+
+
+class JournalError(ValueError):
+    """
+    Raised when a journal cannot be replayed.
+    """
+
+
+class Journal:
+    """
+    An open journal file that engine.apply_action appends actions to. Attach it to a GameState by
+    setting state.journal.
+    """
+
+    def __init__(self, path, seq=0, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, fsync=False):
+        self.path = path
+        self.seq = seq
+        self.checkpoint_interval = checkpoint_interval
+        self.fsync = fsync
+        self._checkpoints = []
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def close(self):
+        """
+        This function closes the journal file.
+        """
+        self._file.close()
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def record(self, state, action, args):
+        """
+        This function appends one action and writes a checkpoint when one is due.
+
+        :param state: the GameState the action was applied to
+        :param action: the name of the action in engine.ACTIONS
+        :param args: the arguments the action was called with after the state
+        """
+        self.seq += 1
+        self._write({'seq': self.seq, 'action': action, 'args': list(args)})
+        if self.checkpoint_interval and self.seq % self.checkpoint_interval == 0:
+            self.checkpoint(state)
+
+    def checkpoint(self, state):
+        """
+        This function saves the whole GameState next to the journal and records where it is. Only the
+        last KEEP_CHECKPOINTS checkpoint files are kept.
+        """
+        filename = f"{os.path.basename(self.path)}.{self.seq}.bts"
+        path = os.path.join(os.path.dirname(os.path.abspath(self.path)), filename)
+        savegame.save_game(state, path)
+        self._write({'type': 'checkpoint', 'seq': self.seq, 'path': filename})
+        self._checkpoints.append(path)
+        while len(self._checkpoints) > KEEP_CHECKPOINTS:
+            try:
+                os.remove(self._checkpoints.pop(0))
+            except OSError:
+                pass
+
+
+def start_game(path, player_name, difficulty_level, business_types, management_personnel, offshore_locations,
+               cash_balance=engine.STARTING_CASH_BALANCE, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, fsync=False):
+    """
+    This function starts a new game with engine.new_game and a new journal that records it.
+
+    :param path: the path of the journal file to create; it must not exist yet
+    :param checkpoint_interval: the number of actions between checkpoints, or 0 for none
+    :param fsync: whether to fsync the journal after every line
+    :return: the new GameState, with the journal attached as state.journal.
+    """
+    if os.path.exists(path):
+        raise JournalError(f"{path} already exists")
+    state = engine.new_game(player_name, difficulty_level, business_types, management_personnel, offshore_locations, cash_balance)
+    journal = Journal(path, 0, checkpoint_interval, fsync)
+    journal._write({'type': 'start', 'version': JOURNAL_VERSION, 'player_name': player_name, 'difficulty_level': difficulty_level,
+                    'cash_balance': cash_balance, 'business_types': list(business_types),
+                    'management_personnel': list(management_personnel), 'offshore_locations': list(offshore_locations)})
+    state.journal = journal
+    return state
+
+
+def read_entries(path):
+    """
+    This function reads the entries of a journal, stopping at a line that was cut short by a crash or
+    cannot be decoded.
+
+    :param path: the path of the journal file
+    :return: a list of the decoded entries.
+    """
+    return _read_entries(path)[0]
+
+
+def _read_entries(path):
+    """
+    This function reads the entries of a journal like read_entries.
+
+    :return: a tuple of (the decoded entries, the length in bytes of the lines they were read from,
+    the undecoded lines after them).
+    """
+    entries = []
+    end = 0
+    with open(path, 'rb') as file:
+        lines = file.readlines()
+    for position, line in enumerate(lines):
+        if not line.endswith(b'\n'):
+            return entries, end, lines[position:]
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            return entries, end, lines[position:]
+        end += len(line)
+    return entries, end, []
+
+
+def replay(path, use_checkpoints=True):
+    """
+    This function rebuilds the GameState recorded in a journal. It starts from the latest checkpoint
+    whose file is readable and re-applies the actions recorded after it.
+
+    :param path: the path of the journal file
+    :param use_checkpoints: set to False to replay every action from the start of the game
+    :return: a tuple of (GameState, number of actions in the journal).
+    """
+    entries = read_entries(path)
+    if not entries or entries[0].get('type') != 'start':
+        raise JournalError(f"{path} does not start with a start entry")
+    start = entries[0]
+    state = None
+    seq = 0
+    if use_checkpoints:
+        directory = os.path.dirname(os.path.abspath(path))
+        for entry in reversed(entries):
+            if entry.get('type') == 'checkpoint':
+                try:
+                    state = savegame.load_game(os.path.join(directory, entry['path']))
+                except (OSError, savegame.SaveError):
+                    continue
+                seq = entry['seq']
+                break
+    if state is None:
+        state = engine.new_game(start['player_name'], start['difficulty_level'], start['business_types'],
+                                start['management_personnel'], start['offshore_locations'], start['cash_balance'])
+    for entry in entries:
+        if 'action' in entry and entry['seq'] > seq:
+            engine.apply_action(state, entry['action'], *entry['args'])
+            seq = entry['seq']
+    return state, seq
+
+
+def resume(path, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, fsync=False):
+    """
+    This function recovers a game from its journal and keeps journaling to the same file.
+
+    :param path: the path of the journal file
+    :return: the recovered GameState, with the journal attached as state.journal.
+    """
+    state, seq = replay(path)
+    entries, end, dropped = _read_entries(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    if dropped:
+        with open(path, 'rb+') as file:
+            file.truncate(end)
+        _remove_dropped_checkpoints(directory, entries, dropped)
+    journal = Journal(path, seq, checkpoint_interval, fsync)
+    journal._checkpoints = [os.path.join(directory, entry['path']) for entry in entries
+                            if entry.get('type') == 'checkpoint' and os.path.exists(os.path.join(directory, entry['path']))]
+    state.journal = journal
+    return state
+
+
+def _remove_dropped_checkpoints(directory, entries, dropped):
+    """
+    This function deletes the checkpoint files that only lines dropped from a journal referred to.
+    """
+    kept = {entry['path'] for entry in entries if entry.get('type') == 'checkpoint'}
+    for line in dropped:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(entry, dict) and entry.get('type') == 'checkpoint' and entry.get('path') not in kept:
+            try:
+                os.remove(os.path.join(directory, os.path.basename(entry['path'])))
+            except (OSError, TypeError):
+                pass
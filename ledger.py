@@ -0,0 +1,233 @@
+#Columnar ledger of every product in a game, with per-company and portfolio aggregates.
+#
+#Each company keeps its products as a list of Product records, which is what the game screens, the
+#save files and the planner read. Answering "how much has been invested in products, and what revenue
+#do they add" from those lists means walking every product of every company. A ProductLedger keeps the
+#numbers of the same products as columns shared by the whole game instead:
+#
+#- one row per product ever added: the id of its company (array 'q', -1 once removed), its investment
+#  and its revenue (arrays 'd', the revenue before manager boosts, as Product.revenue holds it) and its
+#  name;
+#- an index per company of its rows, in the order of company.products, so the product at a company's
+#  product index is found without a search;
+#- the number of products, their investment and their revenue per company (arrays indexed by company
+#  id) and for the whole portfolio, kept up to date as products are added and removed.
+#
+#The columns repeat what the Product records hold, about 24 bytes and a name reference per product, so
+#that the questions that cross companies are answered from flat arrays: the portfolio and per-company
+#aggregates in constant time, a product by its company and index through the offset index, and the
+#products that add the most revenue (top()) without visiting a Product record.
+#
+#Attach one to a game with state.ledger = ProductLedger.from_state(state); the engine then records
+#every product it adds or removes. Removed rows are only marked; compact() drops them once they are
+#more than half of the rows. Like the portfolio totals, the sums are updated with differences and can
+#drift from an exact sum in the last bits after a very long game; rebuild() recomputes them.
+#
+#A fork (branching.fork) gets no ledger. Undoing or redoing an action with branching.Timeline puts
+#earlier records of some companies back; refresh() then reads the products of just those companies again.
+
+import array
+import heapq
+import math
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+
+class ProductLedger:
+    """
+    The products of one game, stored column by column.
+    """
+
+    def __init__(self):
+        self.company = array.array('q')
+        self.investment = array.array('d')
+        self.revenue = array.array('d')
+        self.names = []
+        # The rows of each company's products, by company id, in product order.
+        self.rows = []
+        self.company_count = array.array('q')
+        self.company_investment = array.array('d')
+        self.company_revenue = array.array('d')
+        self.product_count = 0
+        self.total_investment = 0.0
+        self.total_revenue = 0.0
+        self.removed_rows = 0
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        This function builds the ledger of a game's products.
+
+        :param state: the GameState to read
+        :return: a new ProductLedger.
+        """
+        ledger = cls()
+        ledger.rebuild(state)
+        return ledger
+
+    def rebuild(self, state):
+        """
+        This function forgets every row and reads the products of a game again, computing every sum
+        exactly.
+        """
+        self.__init__()
+        companies = state.companies
+        self._grow(len(companies))
+        for company in companies:
+            rows = self.rows[company.id]
+            for product in company.products:
+                rows.append(len(self.names))
+                self.company.append(company.id)
+                self.investment.append(product.investment)
+                self.revenue.append(product.revenue)
+                self.names.append(product.name)
+            self.company_count[company.id] = len(rows)
+            self.company_investment[company.id] = math.fsum(product.investment for product in company.products)
+            self.company_revenue[company.id] = math.fsum(product.revenue for product in company.products)
+        self.product_count = len(self.names)
+        self.total_investment = math.fsum(self.investment)
+        self.total_revenue = math.fsum(self.revenue)
+
+    def _grow(self, company_count):
+        missing = company_count - len(self.rows)
+        if missing > 0:
+            self.rows.extend(array.array('q') for _ in range(missing))
+            self.company_count.extend(array.array('q', bytes(8 * missing)))
+            self.company_investment.extend(array.array('d', bytes(8 * missing)))
+            self.company_revenue.extend(array.array('d', bytes(8 * missing)))
+
+    def record_added(self, company_id, product):
+        """
+        This function records a product that was appended to a company's products.
+        """
+        self._grow(company_id + 1)
+        self.rows[company_id].append(len(self.names))
+        self.company.append(company_id)
+        self.investment.append(product.investment)
+        self.revenue.append(product.revenue)
+        self.names.append(product.name)
+        self.company_count[company_id] += 1
+        self.company_investment[company_id] += product.investment
+        self.company_revenue[company_id] += product.revenue
+        self.product_count += 1
+        self.total_investment += product.investment
+        self.total_revenue += product.revenue
+
+    def record_removed(self, company_id, product_index):
+        """
+        This function records that the product at `product_index` was removed from a company's products,
+        taking its investment and revenue off the sums.
+        """
+        rows = self.rows[company_id]
+        row = rows.pop(product_index)
+        investment = self.investment[row]
+        revenue = self.revenue[row]
+        self.company[row] = -1
+        self.company_count[company_id] -= 1
+        self.company_investment[company_id] -= investment
+        self.company_revenue[company_id] -= revenue
+        self.product_count -= 1
+        self.total_investment -= investment
+        self.total_revenue -= revenue
+        self.removed_rows += 1
+        if self.removed_rows > len(self.names) // 2:
+            self.compact()
+
+    def refresh(self, state, company_ids):
+        """
+        This function reads the products of some companies again, after their records were replaced
+        (see branching.Timeline). It takes time in proportion to their products, not to the portfolio.
+
+        :param state: the GameState the ledger belongs to
+        :param company_ids: the ids of the companies to read again; ids past the last company are left
+        without products
+        """
+        companies = state.companies
+        self._grow(max(len(companies), max(company_ids, default=-1) + 1))
+        for company_id in company_ids:
+            for row in self.rows[company_id]:
+                self.company[row] = -1
+            self.removed_rows += len(self.rows[company_id])
+            self.product_count -= self.company_count[company_id]
+            self.total_investment -= self.company_investment[company_id]
+            self.total_revenue -= self.company_revenue[company_id]
+            products = companies[company_id].products if company_id < len(companies) else []
+            rows = self.rows[company_id] = array.array('q')
+            for product in products:
+                rows.append(len(self.names))
+                self.company.append(company_id)
+                self.investment.append(product.investment)
+                self.revenue.append(product.revenue)
+                self.names.append(product.name)
+            self.company_count[company_id] = len(products)
+            self.company_investment[company_id] = math.fsum(product.investment for product in products)
+            self.company_revenue[company_id] = math.fsum(product.revenue for product in products)
+            self.product_count += len(products)
+            self.total_investment += self.company_investment[company_id]
+            self.total_revenue += self.company_revenue[company_id]
+        if self.removed_rows > len(self.names) // 2:
+            self.compact()
+
+    def compact(self):
+        """
+        This function drops the rows of removed products and renumbers the others.
+        """
+        keep = [row for row, company_id in enumerate(self.company) if company_id >= 0]
+        renumbered = array.array('q', bytes(8 * len(self.names)))
+        for new_row, row in enumerate(keep):
+            renumbered[row] = new_row
+        self.company = array.array('q', [self.company[row] for row in keep])
+        self.investment = array.array('d', [self.investment[row] for row in keep])
+        self.revenue = array.array('d', [self.revenue[row] for row in keep])
+        self.names = [self.names[row] for row in keep]
+        self.rows = [array.array('q', [renumbered[row] for row in rows]) for rows in self.rows]
+        self.removed_rows = 0
+
+    def company_summary(self, company_id):
+        """
+        This function returns the number of products of a company, the money invested in them and the
+        revenue they added.
+        """
+        if company_id >= len(self.rows):
+            return 0, 0.0, 0.0
+        return self.company_count[company_id], self.company_investment[company_id], self.company_revenue[company_id]
+
+    def summary(self):
+        """
+        This function returns the number of products in the portfolio, the money invested in them and the
+        revenue they added.
+        """
+        return self.product_count, self.total_investment, self.total_revenue
+
+    def product(self, company_id, product_index):
+        """
+        This function returns the (name, investment, revenue) of the product at `product_index` of a
+        company.
+        """
+        row = self.rows[company_id][product_index]
+        return self.names[row], self.investment[row], self.revenue[row]
+
+    def top(self, count, by='revenue'):
+        """
+        This function returns the products that added the most revenue (or that cost the most, with
+        by='investment').
+
+        :param count: the number of products to return
+        :param by: 'revenue' or 'investment'
+        :return: a list of (company id, product name, value) triples, largest first.
+        """
+        column = self.revenue if by == 'revenue' else self.investment
+        if np is not None and len(column) > count:
+            values = np.frombuffer(column, dtype=np.float64)
+            live = np.frombuffer(self.company, dtype=np.int64) >= 0
+            candidates = np.flatnonzero(live)
+            if len(candidates) > count:
+                candidates = candidates[np.argpartition(-values[candidates], count - 1)[:count]]
+            best = sorted(candidates.tolist(), key=lambda row: (-column[row], row))
+        else:
+            best = heapq.nsmallest(count, (row for row, company_id in enumerate(self.company) if company_id >= 0),
+                                   key=lambda row: (-column[row], row))
+        return [(self.company[row], self.names[row], column[row]) for row in best]
@@ -18,38 +18,63 @@
 #
 #5. get_player_name(): This function gets the player's name from user input.
 #
-#6. display_company_products(companies): This function displays the products of a selected company.
+#6. display_company_products(state): This function displays the products of a selected company, with their number, investment and revenue from the game's product ledger.
 #
-#7. add_new_product_to_company(companies, cash_balance): This function adds a new product to a selected company and adjusts the cash balance accordingly.
+#7. add_new_product_to_company(state): This function adds a new product to a selected company and adjusts the cash balance accordingly.
 #
-#8. remove_product_from_company(companies): This function removes a product from a selected company.
+#8. remove_product_from_company(state): This function removes a product from a selected company.
 #
-#9. display_player_info(player_name, cash_balance, companies, offshore_companies, months_passed): This function displays information about the player, including their name, cash balance, companies, offshore companies, and the number of months passed in the game.
+#9. display_player_info(state): This function displays information about the player, including their name, cash balance, companies, offshore companies, and the number of months passed in the game.
 #
-#10. create_company(player_cash_balance, business_types): This function creates a new company and adjusts the player's cash balance.
+#10. create_company(state): This function creates a new company and adjusts the player's cash balance.
 #
-#11. hire_management(companies, management_personnel): This function allows the player to hire management for a selected company.
+#11. hire_management(state): This function allows the player to hire management for a selected company.
 #
-#12. fire_management(companies): This function allows the player to fire management from a selected company.
+#12. fire_management(state): This function allows the player to fire management from a selected company.
 #
 #13. display_companies_list(companies): This function displays the list of companies owned by the player.
 #
-#14. company_action(companies, cash_balance, business_types): This function allows the player to perform an action on a selected company and adjusts the cash balance accordingly.
+#14. company_action(state): This function allows the player to perform an action on a selected company and adjusts the cash balance accordingly.
 #
-#15. create_offshore_company(cash_balance, offshore_locations): This function creates a new offshore company and adjusts the player's cash balance.
+#15. create_offshore_company(state): This function creates a new offshore company and adjusts the player's cash balance.
 #
-#16. add_company_to_offshore(offshore_companies, companies): This function adds a company to an offshore company.
+#16. add_company_to_offshore(state): This function adds a company to an offshore company.
 #
-#17. remove_company_from_offshore(offshore_companies, companies): This function removes a company from an offshore company.
+#17. remove_company_from_offshore(state): This function removes a company from an offshore company.
 #
-#18. advance_month(cash_balance, companies, offshore_companies, difficulty_level): This function advances the game by one month and updates the player's cash balance.
+#18. engine.advance_month(state): This function advances the game by one month and updates the player's cash balance.
 #
-#19. update_cash_balance(cash_balance, companies, offshore_companies, difficulty_level): This function updates the player's cash balance based on company revenues and offshore company tax rates.
+#19. engine.update_cash_balance(cash_balance, companies, offshore_companies, difficulty_level): This function updates the player's cash balance based on company revenues and offshore company tax rates.
 #
-#20. main_game_loop(player_name, cash_balance, companies, business_types, management_personnel, offshore_locations, difficulty_level): This function contains the main game loop, where the player can perform various actions to manage their companies and offshore companies.
+#20. main_game_loop(state): This function contains the main game loop, where the player can perform various actions to manage their companies and offshore companies.
+#
+#21. main(argv=None): This function is the entry point of the game. It shows the introduction, starts or resumes a game and runs the main game loop.
+#
+#All state changes are made by the headless engine in engine.py (engine.create_company, engine.hire_management, and so on). The functions above only prompt for the arguments, call the engine and print the outcome.
+#
+#Companies, products and offshore companies are the compact record types from models.py. They also accept dictionary-style access (company['name'], 'management' in company), which is what the functions above use.
+#
+#Screens are built by render.py and written in one go. Lists that grow with the portfolio are shown a page at a time (choose_from_pages, browse_pages), and the player information screen summarizes large portfolios by industry and lists the companies with the highest monthly profit.
+#
+#The catalogs are loaded by catalog.py, which validates them, indexes them by name and caches a compiled copy; a <name>.jsonl catalog is read lazily, entry by entry.
+#
+#The game starts in main(); importing this module only defines the functions. The journal module (and the savegame module it uses) and json are imported when they are first needed, so the import stays fast.
+#
+#Every action goes through engine.apply_action, so it can be recorded. Start the game as `python main.py game.journal` to keep an action journal (see journal.py): if the file exists, the game is rebuilt from it and continues where it stopped.
+#
+#Set the BT_PROFILE environment variable to a file name to measure every action (see instrumentation.py); the measurements are written there every minute and when the game ends.
+#
+#Set the BT_RESULTS environment variable to a database file to keep the result of every game (see results.py): when the player quits, the final cash, months and portfolio are added to it and the game's place on the leaderboard of its difficulty level is shown.
 
 
-import json
+import os
+import sys
+
+import catalog
+import engine
+import ledger
+import render
+from engine import ActionError
 
 def load_data(filename):
     """
@@ -60,6 +85,7 @@ def load_data(filename):
     :return: The function `load_data` returns the data loaded from a JSON file specified by the
     `filename` parameter.
     """
+    import json
     with open(filename, 'r') as file:
         data = json.load(file)
     return data
@@ -127,520 +153,417 @@ def get_player_name():
     player_name = input("Please enter your name: ")
     return player_name
 
-def display_company_products(companies):
+def choose_from_pages(items, format_item, title, prompt_message):
+    """
+    This function shows a numbered list one page at a time and asks the player to pick an item. Lists
+    that fit on one page are chosen from exactly like with get_valid_input; on longer lists the player
+    can also enter 'n' or 'p' to turn to the next or previous page.
+
+    :param items: a sequence of the items to choose from
+    :param format_item: a function that turns an item into the text of its row
+    :param title: the line shown above the list
+    :param prompt_message: the message displayed when asking for the item number
+    :return: the 0-based index of the chosen item.
+    """
+    pages = render.page_count(len(items))
+    page = 0
+    while True:
+        render.write_screen([title] + render.page_lines(items, page, format_item))
+        if pages == 1:
+            return get_valid_input(1, len(items), prompt_message) - 1
+        while True:
+            answer = input(f"{prompt_message}(n/p for the next/previous page) ").strip().lower()
+            if answer in ('n', 'p'):
+                page = (page + (1 if answer == 'n' else -1)) % pages
+                break
+            try:
+                choice = int(answer)
+            except ValueError:
+                print("Invalid input. Please try again.")
+                continue
+            if 1 <= choice <= len(items):
+                return choice - 1
+            print(f"Please enter a number between 1 and {len(items)}.")
+
+def browse_pages(items, format_item, title):
+    """
+    This function shows a numbered list one page at a time until the player stops turning pages.
+
+    :param items: a sequence of the items to show
+    :param format_item: a function that turns an item into the text of its row
+    :param title: the line shown above the list
+    """
+    pages = render.page_count(len(items))
+    for page in range(pages):
+        render.write_screen([title] + render.page_lines(items, page, format_item))
+        if page + 1 < pages and input("Press Enter for the next page or enter q to stop: ").strip().lower() == 'q':
+            break
+
+def choose_company(companies, prompt_message):
+    """
+    This function lists the companies, a page at a time, and asks the player to pick one.
+
+    :param companies: a list of dictionaries representing companies
+    :param prompt_message: the message displayed when asking for the company number
+    :return: the 0-based index of the chosen company.
     """
-    This function displays the products of a selected company from a list of companies.
+    return choose_from_pages(companies, render.company_row, "Companies:", prompt_message)
+
+def choose_offshore_company(offshore_companies, prompt_message):
+    """
+    This function lists the offshore companies, a page at a time, and asks the player to pick one.
+
+    :param offshore_companies: a list of dictionaries representing offshore companies
+    :param prompt_message: the message displayed when asking for the offshore company number
+    :return: the 0-based index of the chosen offshore company.
+    """
+    return choose_from_pages(offshore_companies, render.offshore_row, "Offshore Companies:", prompt_message)
+
+def display_company_products(state):
+    """
+    This function displays the products of a selected company, followed by their number, the money
+    invested in them and the revenue they add, as the game's product ledger keeps them.
     
-    :param companies: a list of dictionaries, where each dictionary represents a company and contains
-    the following keys: 'name' (string), 'products' (list of dictionaries), where each dictionary
-    represents a product and contains the following keys: 'name' (string) and 'investment' (float)
+    :param state: the engine.GameState of the current game, with a ledger.ProductLedger attached
     """
+    companies = state.companies
     if len(companies) > 0:
-        display_companies_list(companies)
-        company_choice = get_valid_input(1, len(companies), "Enter the number of the company you want to view Product(s) for: ")
-        company = companies[company_choice - 1]
+        company = companies[choose_company(companies, "Enter the number of the company you want to view Product(s) for: ")]
         if len(company['products']) == 0:
             print(f"{company['name']} has no Product(s).")
         else:
-            print("\nProduct(s):")
-            for i, product in enumerate(company['products'], 1):
-                print(f"{i}. {product['name']} - Investment: ${product['investment']}")
+            browse_pages(company['products'], render.product_row, "\nProduct(s):")
+            count, investment, revenue = state.ledger.company_summary(company['id'])
+            print(f"{count} Product(s), ${investment} invested, adding ${revenue} to the revenue before manager boosts.")
     else:
         print("You don't have any companies to view Product(s) for. Create a company first.")
         
-def add_new_product_to_company(companies, cash_balance):
+def add_new_product_to_company(state):
     """
     This function allows the user to add a new product to a chosen company, with an investment amount
     and updates the company's revenue and profit accordingly.
     
-    :param companies: A list of dictionaries representing companies, where each dictionary contains
-    information about a company such as its name, revenue, profit margin, and products
-    :param cash_balance: The amount of money available to invest in the new product
-    :return: a tuple containing the updated list of companies and the updated cash balance.
+    :param state: the engine.GameState of the current game. The investment is paid from its cash
+    balance.
     """
-    if len(companies) > 0:
-        display_companies_list(companies)
-        company_choice = get_valid_input(1, len(companies), "Enter the number of the company you want to add a product to: ")
-        company = companies[company_choice - 1]
-
+    if len(state.companies) > 0:
+        company_index = choose_company(state.companies, "Enter the number of the company you want to add a product to: ")
         product_name = input("Enter a name for your new product: ")
         investment = get_valid_input(0, float('inf'), "Enter the amount of money you want to invest in this product: ")
-
-# The code is a Python script that takes an investment amount and a product name as input and
-# adds the product to a company's product list. It then calculates the added revenue and profit from
-# the investment and updates the company's revenue and profit margin accordingly. If the user's cash
-# balance is not enough to make the investment, it prints an error message.
-        if cash_balance >= investment:
-            cash_balance -= investment
-            profit_margin = 0.1
-            added_revenue = investment * profit_margin
-            added_profit = added_revenue * company['profit_margin']
-            company['revenue'] += added_revenue
-            company['profit_margin'] += (company['profit_margin'] * added_profit) / company['revenue']
-            company['products'].append({'name': product_name, 'investment': investment, 'revenue': added_revenue})
-            print(f"You have successfully added {product_name} to {company['name']} with an investment of ${investment}.")
-            print(f"Company's revenue increased by ${added_revenue} and profit increased by ${added_profit}.")
-        else:
-            print("You don't have enough cash to invest in this Product(s). Please try again.")
+        revenue = state.companies[company_index]['revenue']
+        try:
+            product, added_profit = engine.apply_action(state, 'add_product', company_index, product_name, investment)
+        except ActionError as error:
+            print(error)
+            return
+        company = state.companies[company_index]
+        print(f"You have successfully added {product_name} to {company['name']} with an investment of ${investment}.")
+        print(f"Company's revenue increased by ${company['revenue'] - revenue} and profit increased by ${added_profit}.")
     else:
         print("You don't have any companies to add a Product(s) to. Create a company first.")
-    return companies, cash_balance
 
-def remove_product_from_company(companies):
+def remove_product_from_company(state):
     """
-    This function removes a product from a company and returns the updated list of companies.
+    This function removes a product from a chosen company.
     
-    :param companies: a list of dictionaries representing companies, where each dictionary has keys
-    'name' (string) and 'products' (list of dictionaries representing products, where each dictionary
-    has keys 'name' (string) and 'investment' (float))
-    :return: the updated list of companies after removing a product from a chosen company.
+    :param state: the engine.GameState of the current game
     """
-    if len(companies) > 0:
-        display_companies_list(companies)
-        company_choice = get_valid_input(1, len(companies), "Enter the number of the company you want to remove a Product(s) from: ")
-        company = companies[company_choice - 1]
+    if len(state.companies) > 0:
+        company_index = choose_company(state.companies, "Enter the number of the company you want to remove a Product(s) from: ")
+        company = state.companies[company_index]
 
         if len(company['products']) == 0:
             print(f"{company['name']} has no Product(s) to remove.")
         else:
-            print("Product(s):")
-            for i, product in enumerate(company['products'], 1):
-                print(f"{i}. {product['name']} - Investment: ${product['investment']}")
-            product_choice = get_valid_input(1, len(company['products']), "Enter the number of the Product(s) you want to remove: ")
+            product_index = choose_from_pages(company['products'], render.product_row, "Product(s):",
+                                              "Enter the number of the Product(s) you want to remove: ")
 
-            removed_product = company['products'].pop(product_choice - 1)
+            revenue = company['revenue']
+            removed_product = engine.apply_action(state, 'remove_product', company_index, product_index)
             print(f"{removed_product['name']} has been removed from {company['name']}.")
+            print(f"Company's revenue decreased by ${revenue - state.companies[company_index]['revenue']}.")
     else:
         print("You don't have any companies to remove a Product(s) from. Create a company first.")
-    return companies
 
-def display_player_info(player_name, cash_balance, companies, offshore_companies, months_passed):
+def display_player_info(state):
     """
     This function displays the player's information, including their name, cash balance, companies,
-    offshore companies, and months passed.
+    offshore companies, and months passed. Large portfolios are summarized by render.player_info_lines
+    instead of being listed company by company.
     
-    :param player_name: The name of the player (string)
-    :param cash_balance: The amount of money the player currently has in their account
-    :param companies: A list of dictionaries representing the companies owned by the player. Each
-    dictionary contains information about the company such as its name, industry, revenue, capital,
-    profit margin, and management (if any)
-    :param offshore_companies: A list of dictionaries representing the offshore companies owned by the
-    player. Each dictionary contains information about the company such as its name and location
-    :param months_passed: The number of months that have passed in the game
-    """
-    print(f"\nMonths passed: {months_passed}")
-    print("\nPlayer Information:")
-    print(f"Name: {player_name}")
-    print(f"Cash Balance: ${cash_balance}")
-    print("Companies:")
-    if len(companies) == 0:
-        print("None")
-    else:
-        for i, company in enumerate(companies, 1):
-            monthly_revenue = company['revenue'] * company['capital']
-            monthly_profit = monthly_revenue * company['profit_margin'] * difficulty_level
-            print(f"{i}. {company['name']} ({company['industry']}) - Management: {company['management']['name'] if 'management' in company else 'None'}, Monthly Revenue: ${monthly_revenue}, Monthly Profit: ${monthly_profit}")
-
-    print("Offshore Companies:")
-    if len(offshore_companies) == 0:
-        print("None")
-    else:
-        for i, offshore_company in enumerate(offshore_companies, 1):
-            print(f"{i}. {offshore_company['name']} ({offshore_company['location']})")
+    :param state: the engine.GameState of the current game
+    """
+    render.write_screen(render.player_info_lines(state))
 
-def create_company(player_cash_balance, business_types):
+def create_company(state):
     """
     This function creates a new company with a chosen business type, name, and initial capital, and
     subtracts the capital from the player's cash balance if they have enough funds.
     
-    :param player_cash_balance: The amount of cash the player has available to start a new business
-    :param business_types: a list of dictionaries, where each dictionary represents a type of business
-    and contains the following keys: 'name' (string), 'startup_capital' (float), 'revenue' (float), and
-    'profit_margin' (float)
-    :return: a tuple containing a dictionary representing the newly created company and the updated
-    player cash balance. If the player does not have enough cash or capital to start the business, the
-    function returns None for the company and the original player cash balance.
+    :param state: the engine.GameState of the current game. Its business types are offered to the
+    player and the new company is added to its companies.
     """
     print("Available business types:")
-    for i, business in enumerate(business_types, 1):
+    for i, business in enumerate(state.business_types, 1):
         print(f"{i}. {business['name']} (Startup Capital: ${business['startup_capital']})")
-    business_choice = get_valid_input(1, len(business_types), "Choose a business type by entering the corresponding number: ")
+    business_choice = get_valid_input(1, len(state.business_types), "Choose a business type by entering the corresponding number: ")
 
-    business = business_types[business_choice - 1]
     company_name = input("Enter a name for your new company: ")
     capital = get_valid_input(0, float('inf'), "Enter the initial capital for your company (in dollars): ")
 
-    if capital >= business['startup_capital']:
-        if player_cash_balance >= capital:
-            player_cash_balance -= capital
-            return {'name': company_name, 'industry': business['name'], 'capital': capital, 'offshore': False, 'revenue': business['revenue'], 'profit_margin': business['profit_margin'], 'products': []}, player_cash_balance
-        else:
-            print("You don't have enough cash to start this business. Please try again.")
-            return None, player_cash_balance
-    else:
-        print("You don't have enough capital to start this business. Please try again.")
-        return None, player_cash_balance
+    try:
+        engine.apply_action(state, 'create_company', business_choice - 1, company_name, capital)
+    except ActionError as error:
+        print(error)
         
-def hire_management(companies, management_personnel):
+def hire_management(state):
     """
     This function allows the user to hire a manager for a chosen company from a list of available
     managers, given that the company has no current manager and has enough monthly profit to pay the
     manager's salary.
     
-    :param companies: a list of dictionaries representing companies, where each dictionary contains
-    information about a single company such as its name, revenue, profit margin, and management (if any)
-    :param management_personnel: A list of dictionaries representing potential managers for a company.
-    Each dictionary contains the following keys:
-    :return: either the updated company dictionary if a manager was successfully hired, or None if a
-    manager was not hired.
+    :param state: the engine.GameState of the current game. Its management personnel are offered to
+    the player.
     """
-    if len(companies) > 0:
-        display_companies_list(companies)
-        company_choice = get_valid_input(1, len(companies), "Enter the number of the company you want to hire management for: ")
-        company = companies[company_choice - 1]
+    if len(state.companies) > 0:
+        company_index = choose_company(state.companies, "Enter the number of the company you want to hire management for: ")
+        company = state.companies[company_index]
         if 'management' in company:
             print(f"{company['name']} already has a manager: {company['management']['name']}. Please fire the current manager before hiring a new one.")
             return
     else:
         print("You don't have any companies to hire management for. Create a company first.")
-        return None
-
-    print("Available managers:")
-    for i, manager in enumerate(management_personnel, 1):
-        print(f"{i}. {manager['name']} (Salary: ${manager['salary']}/month, Revenue Boost: {manager['revenue_boost'] * 100}%, Profit Margin Boost: {manager['profit_margin_boost'] * 100}%)")
-    manager_choice = get_valid_input(1, len(management_personnel), "Choose a manager to hire by entering the corresponding number: ")
-
-    manager = management_personnel[manager_choice - 1]
-    monthly_revenue = company['revenue'] * company['capital']
-    monthly_profit = monthly_revenue * company['profit_margin']
-    if manager['salary'] <= monthly_profit:
-        company['revenue'] *= (1 + manager['revenue_boost'])
-        company['profit_margin'] += manager['profit_margin_boost']
-        company['management'] = manager
-        print(f"{manager['name']} has been hired as a manager for {company['name']} at a salary of ${manager['salary']}/month.")
-        return company
-    else:
-        print("You don't have enough monthly profit to hire this manager. Please try again.")
-        return None
+        return
+
+    manager_index = choose_from_pages(state.management_personnel, render.manager_row, "Available managers:",
+                                      "Choose a manager to hire by entering the corresponding number: ")
 
-def fire_management(companies):
+    try:
+        engine.apply_action(state, 'hire_management', company_index, manager_index)
+    except ActionError as error:
+        print(error)
+        return
+    manager = company['management']
+    print(f"{manager['name']} has been hired as a manager for {company['name']} at a salary of ${manager['salary']}/month.")
+
+def fire_management(state):
     """
     The function allows the user to fire the management of a company and adjust the company's revenue
     and profit margin accordingly.
     
-    :param companies: a list of dictionaries representing different companies, where each dictionary
-    contains information about the company such as its name, revenue, profit margin, and management (if
-    any)
+    :param state: the engine.GameState of the current game
     """
-    if len(companies) > 0:
-        display_companies_list(companies)
-        company_choice = get_valid_input(1, len(companies), "Enter the number of the company you want to fire management for: ")
-        company = companies[company_choice - 1]
-        if 'management' in company:
-            print(f"{company['management']['name']} has been fired from {company['name']}.")
-            company['revenue'] /= (1 + company['management']['revenue_boost'])
-            company['profit_margin'] -= company['management']['profit_margin_boost']
-            del company['management']
-        else:
-            print(f"{company['name']} does not have a manager to fire.")
+    if len(state.companies) > 0:
+        company_index = choose_company(state.companies, "Enter the number of the company you want to fire management for: ")
+        company = state.companies[company_index]
+        try:
+            manager = engine.apply_action(state, 'fire_management', company_index)
+        except ActionError as error:
+            print(error)
+            return
+        print(f"{manager['name']} has been fired from {company['name']}.")
     else:
         print("You don't have any companies to fire management for. Create a company first.")
 
 def display_companies_list(companies):
     """
     The function takes a list of dictionaries representing companies and prints their names and
-    industries in a numbered list format.
+    industries in a numbered list format, one page at a time.
     
     :param companies: a list of dictionaries, where each dictionary represents a company and contains
     the keys 'name' and 'industry'
     """
-    print("Companies:")
-    for i, comp in enumerate(companies, 1):
-        print(f"{i}. {comp['name']} ({comp['industry']})")
+    browse_pages(companies, render.company_row, "Companies:")
 
-def company_action(companies, cash_balance, business_types):
+def company_action(state):
     """
     The function allows the user to perform an action on a selected company, such as launching a new
     product or starting a building project, and updates the company's revenue and the user's cash
     balance accordingly.
     
-    :param companies: a list of dictionaries representing the companies the user has created, with each
-    dictionary containing information such as the company name, industry, and revenue
-    :param cash_balance: The amount of cash available for the user to spend on company actions
-    :param business_types: a list of dictionaries containing information about different types of
-    businesses, including their name and profit margin
-    :return: a tuple containing the updated list of companies and the updated cash balance.
-    """
-    if len(companies) == 0:
+    :param state: the engine.GameState of the current game
+    """
+    if len(state.companies) == 0:
         print("You have no companies to perform an action on. Create a company first.")
+        return
+    company_index = choose_company(state.companies, "Enter the number of the company you want to perform an action on: ")
+    company = state.companies[company_index]
+    if company['industry'] == "Dropshipping":
+        cost = get_valid_input(0, float('inf'), "Enter the cost of the product you want to launch (in dollars): ")
+        success_message = "You have successfully launched a new product in your Dropshipping company. Your company's revenue has increased."
+    elif company['industry'] == "Construction":
+        cost = get_valid_input(0, float('inf'), "Enter the cost of the building project you want to start (in dollars): ")
+        success_message = "You have successfully started a new building project in your Construction company. Your company's revenue has increased."
     else:
-        display_companies_list(companies)
-        company_index = int(input("Enter the number of the company you want to perform an action on: "))
-        if 0 < company_index <= len(companies):
-            company = companies[company_index - 1]
-            business_type = next((biz_type for biz_type in business_types if biz_type['name'] == company['industry']), None)
-            
-            if business_type is not None:
-                if company['industry'] == "Dropshipping":
-                    product_cost = get_valid_input(0, float('inf'), "Enter the cost of the product you want to launch (in dollars): ")
-                    if cash_balance >= product_cost:
-                        cash_balance -= product_cost
-                        company['revenue'] += product_cost * business_type['profit_margin']
-                        print(f"You have successfully launched a new product in your Dropshipping company. Your company's revenue has increased.")
-                    else:
-                        print("You don't have enough cash to launch this product. Please try again.")
-                elif company['industry'] == "Construction":
-                    project_cost = get_valid_input(0, float('inf'), "Enter the cost of the building project you want to start (in dollars): ")
-                    if cash_balance >= project_cost:
-                        cash_balance -= project_cost
-                        company['revenue'] += project_cost * business_type['profit_margin']
-                        print(f"You have successfully started a new building project in your Construction company. Your company's revenue has increased.")
-                    else:
-                        print("You don't have enough cash to start this project. Please try again.")
-            else:
-                print("Error: Business type not found.")
-        else:
-            print("Invalid company number. Please try again.")
-    return companies, cash_balance
-
-def create_offshore_company(cash_balance, offshore_locations):
-    """
-    This function creates an offshore company by taking in a cash balance and a list of offshore
-    locations, allowing the user to choose a location and name for the company, and deducting the setup
-    cost from the cash balance if there is enough money.
+        return
+    try:
+        engine.apply_action(state, 'company_action', company_index, cost)
+    except ActionError as error:
+        print(error)
+        return
+    print(success_message)
+
+def create_offshore_company(state):
+    """
+    This function creates an offshore company by letting the user choose a location and name for the
+    company, and deducting the setup cost from the cash balance if there is enough money.
     
-    :param cash_balance: The amount of cash available to set up the offshore company
-    :param offshore_locations: a list of dictionaries containing information about different offshore
-    locations, including their name, setup cost, and tax rate
-    :return: A tuple containing a dictionary representing the newly created offshore company and the
-    updated cash balance. If the creation of the offshore company is not successful, None is returned
-    instead of the dictionary.
-    """
-    print("Offshore locations:")
-    for i, location in enumerate(offshore_locations, 1):
-        print(f"{i}. {location['name']} (Setup Cost: ${location['setup_cost']},Tax Rate: {location['tax_rate'] * 100}%)")
-    location_choice = get_valid_input(1, len(offshore_locations), "Choose an offshore location by entering the corresponding number: ")
-
-    if 0 < location_choice <= len(offshore_locations):
-        location = offshore_locations[location_choice - 1]
-        if cash_balance >= location['setup_cost']:
-            cash_balance -= location['setup_cost']
-            offshore_name = input("Enter a name for your new offshore company: ")
-            return {'name': offshore_name, 'location': location['name'], 'tax_rate': location['tax_rate'], 'companies': []}, cash_balance
-        else:
-            print("You don't have enough cash to set up an offshore company in this location. Please try again.")
-            return None, cash_balance
-    else:
-        print("Invalid offshore location. Please try again.")
-        return None, cash_balance
+    :param state: the engine.GameState of the current game. Its offshore locations are offered to the
+    player and the new offshore company is added to its offshore companies.
+    """
+    location_index = choose_from_pages(state.offshore_locations, render.location_row, "Offshore locations:",
+                                       "Choose an offshore location by entering the corresponding number: ")
+
+    location = state.offshore_locations[location_index]
+    if state.cash_balance < location['setup_cost']:
+        print("You don't have enough cash to set up an offshore company in this location. Please try again.")
+        return
+    offshore_name = input("Enter a name for your new offshore company: ")
+    try:
+        engine.apply_action(state, 'create_offshore_company', location_index, offshore_name)
+    except ActionError as error:
+        print(error)
 
-def add_company_to_offshore(offshore_companies, companies):
+def add_company_to_offshore(state):
     """
-    This function adds a company to an offshore company and updates the lists of offshore companies and
-    regular companies.
+    This function adds a company to an offshore company.
     
-    :param offshore_companies: A list of dictionaries representing offshore companies. Each dictionary
-    contains the keys 'name', 'location', and 'companies'. The 'companies' key has a value of a list of
-    dictionaries representing companies that are part of the offshore company
-    :param companies: A list of dictionaries representing regular companies, where each dictionary
-    contains information about a single company such as its name, location, and whether it is part of an
-    offshore company or not
-    :return: a tuple containing the updated lists of offshore companies and regular companies.
-    """
-    if len(offshore_companies) > 0 and len(companies) > 0:
-        print("Offshore Companies:")
-        for i, offshore_company in enumerate(offshore_companies, 1):
-            print(f"{i}. {offshore_company['name']} ({offshore_company['location']})")
-        offshore_choice = get_valid_input(1, len(offshore_companies), "Enter the number of the offshore company you want to add a company to: ")
-        offshore_company = offshore_companies[offshore_choice - 1]
-
-        display_companies_list(companies)
-        company_choice = get_valid_input(1, len(companies), "Enter the number of the company you want to add to the offshore company: ")
-        company = companies[company_choice - 1]
-        if company['offshore']:
-            print(f"{company['name']} is already part of an offshore company. Please remove it from the current offshore company before adding it to a new one.")
-            return offshore_companies, companies
-        else:
-            offshore_company['companies'].append(company)
-            company['offshore'] = True
-            print(f"{company['name']} has been added to {offshore_company['name']}.")
-            return offshore_companies, companies
+    :param state: the engine.GameState of the current game. Offshore companies keep their members in
+    a dictionary keyed by company id, and each company stores the id of its offshore company in
+    'offshore_id'.
+    """
+    if len(state.offshore_companies) > 0 and len(state.companies) > 0:
+        offshore_index = choose_offshore_company(state.offshore_companies, "Enter the number of the offshore company you want to add a company to: ")
+        company_index = choose_company(state.companies, "Enter the number of the company you want to add to the offshore company: ")
+        try:
+            company = engine.apply_action(state, 'add_company_to_offshore', offshore_index, company_index)
+        except ActionError as error:
+            print(error)
+            return
+        print(f"{company['name']} has been added to {state.offshore_companies[offshore_index]['name']}.")
     else:
         print("You don't have any offshore companies or regular companies. Create them first.")
-        return offshore_companies, companies
 
-def remove_company_from_offshore(offshore_companies, companies):
+def remove_company_from_offshore(state):
     """
     This function removes a company from an offshore company and updates the company's offshore status.
     
-    :param offshore_companies: A list of dictionaries representing offshore companies, where each
-    dictionary has keys 'name', 'location', and 'companies'. 'companies' is a list of dictionaries
-    representing companies that are part of the offshore company, where each dictionary has keys 'name',
-    'industry', and 'offshore' (a boolean
-    :param companies: A list of dictionaries representing regular companies, where each dictionary
-    contains the keys 'name' (string), 'industry' (string), and 'offshore' (boolean)
-    :return: a tuple containing the updated lists of offshore_companies and companies.
-    """
-    if len(offshore_companies) > 0 and len(companies) > 0:
-        print("Offshore Companies:")
-        for i, offshore_company in enumerate(offshore_companies, 1):
-            print(f"{i}. {offshore_company['name']} ({offshore_company['location']})")
-        offshore_choice = get_valid_input(1, len(offshore_companies), "Enter the number of the offshore company you want to remove a company from: ")
-        offshore_company = offshore_companies[offshore_choice - 1]
-
-        print("Companies in the offshore company:")
-        for i, comp in enumerate(offshore_company['companies'], 1):
-            print(f"{i}. {comp['name']} ({comp['industry']})")
-        company_choice = get_valid_input(1, len(offshore_company['companies']), "Enter the number of the company you want to remove from the offshore company: ")
-        company = offshore_company['companies'][company_choice - 1]
-        offshore_company['companies'].remove(company)
-        company['offshore'] = False
+    :param state: the engine.GameState of the current game
+    """
+    if len(state.offshore_companies) > 0 and len(state.companies) > 0:
+        offshore_index = choose_offshore_company(state.offshore_companies, "Enter the number of the offshore company you want to remove a company from: ")
+        offshore_company = state.offshore_companies[offshore_index]
+
+        members = list(offshore_company['companies'].values())
+        if len(members) == 0:
+            print(f"{offshore_company['name']} has no companies to remove.")
+            return
+        member_index = choose_from_pages(members, render.company_row, "Companies in the offshore company:",
+                                         "Enter the number of the company you want to remove from the offshore company: ")
+        company = engine.apply_action(state, 'remove_company_from_offshore', offshore_index, members[member_index]['id'])
         print(f"{company['name']} has been removed from {offshore_company['name']}.")
-        return offshore_companies, companies
     else:
         print("You don't have any offshore companies or regular companies. Create them first.")
-        return offshore_companies, companies
 
-def advance_month(cash_balance, companies, offshore_companies, difficulty_level):
-    """
-    The function advances the month by updating the cash balance based on the given parameters and
-    returns the updated cash balance.
-    
-    :param cash_balance: The current amount of cash the player has in the game
-    :param companies: a list of dictionaries representing the companies the player owns. Each dictionary
-    contains the following keys: "name" (string), "revenue" (float), "expenses" (float), "price"
-    (float), "shares" (int), "growth" (float)
-    :param offshore_companies: A list of companies that the player can invest in outside of their home
-    country. These companies may have different risks and rewards compared to the local companies
-    :param difficulty_level: a variable that determines the level of difficulty in the game. It can
-    affect the amount of money earned or lost during the game
-    :return: the updated cash balance after calling the `update_cash_balance` function with the given
-    parameters.
-    """
-    cash_balance = update_cash_balance(cash_balance, companies, offshore_companies, difficulty_level)
-    return cash_balance
-
-def update_cash_balance(cash_balance, companies, offshore_companies, difficulty_level):
-    """
-    The function updates the cash balance by calculating the taxed profit of each company, taking into
-    account the operating cost and tax rate, and adding it to the current cash balance.
-    
-    :param cash_balance: The current balance of cash available
-    :param companies: a list of dictionaries representing companies, with each dictionary containing
-    information about a single company such as revenue, capital, and profit margin
-    :param offshore_companies: a list of dictionaries representing offshore companies, where each
-    dictionary contains the following keys: 'name' (string), 'tax_rate' (float), and 'companies' (list
-    of dictionaries representing companies)
-    :param difficulty_level: a numerical value representing the difficulty level of the game
-    :return: the updated cash balance after calculating the taxed profit for each company in the list of
-    companies.
-    """
-    for company in companies:
-        profit = company['revenue'] * company['capital'] * company['profit_margin']
-        operating_cost = company['capital'] * 0.05  # Added operating_cost (5% of capital)
-        tax_rate = 0.15  # Updated default tax rate
-        if company['offshore']:
-            for offshore_company in offshore_companies:
-                if company in offshore_company['companies']:
-                    tax_rate = offshore_company['tax_rate']
-                    break
-        taxed_profit = ((profit * difficulty_level) - operating_cost) * (1 - tax_rate)  # Deduct operating_cost before taxes
-        cash_balance += taxed_profit
-    return cash_balance
-
-def main_game_loop(player_name, cash_balance, companies, business_types, management_personnel, offshore_locations, difficulty_level):
+MENU_LINES = ["\n1. Start a new business",
+              "2. Hire management",
+              "3. Fire management",
+              "4. Create an offshore company",
+              "5. Add a company to an offshore company",
+              "6. Remove a company from an offshore company",
+              "7. Advance month",
+              "8. View Product(s)",
+              "9. Add a Product(s) to a company",
+              "10. Remove a Product(s) from a company",
+              "11. Quit game"]
+
+def main_game_loop(state):
     """
     This function contains the main game loop for a business tycoon game, allowing the player to make
     choices such as starting a new business, hiring and firing management, creating offshore companies,
     and advancing months.
     
-    :param player_name: The name of the player who is playing the game
-    :param cash_balance: The amount of money the player has to start with and use throughout the game
-    :param companies: A list of dictionaries representing the player's owned companies, with each
-    dictionary containing information such as the company name, type of business, revenue, and expenses
-    :param business_types: A list of dictionaries containing information about different types of
-    businesses that can be created in the game, such as their name, revenue, and profit margin
-    :param management_personnel: A list of dictionaries representing the available management personnel
-    that can be hired for the player's companies. Each dictionary contains information such as the name,
-    salary, and skills of the management personnel
-    :param offshore_locations: offshore_locations is a list of possible locations where the player can
-    create an offshore company. These locations may have different tax laws or regulations that can
-    affect the player's profits and cash balance
-    :param difficulty_level: The difficulty level of the game, which affects the starting cash balance
-    and the revenue and profit margin of the business types
-    """
-    months_passed = 0
-    offshore_companies = []
-
-    cash_balance *= 0.5  # Reduce the starting cash balance
-    for business_type in business_types:
-        business_type['revenue'] *= 0.5  # Reduce the revenue
-        business_type['profit_margin'] *= 0.5  # Reduce the profit margin
-                
+    :param state: the engine.GameState of the game to play, as returned by engine.new_game
+    """
     while True:
-        display_player_info(player_name, cash_balance, companies, offshore_companies, months_passed)
+        display_player_info(state)
         
-        print("\n1. Start a new business")
-        print("2. Hire management")
-        print("3. Fire management")
-        print("4. Create an offshore company")
-        print("5. Add a company to an offshore company")
-        print("6. Remove a company from an offshore company")
-        print("7. Advance month")
-        print("8. View Product(s)")
-        print("9. Add a Product(s) to a company")
-        print("10. Remove a Product(s) from a company")
-        print("11. Quit game")
+        render.write_screen(MENU_LINES)
         
         choice = get_valid_input(1, 11, "Enter the number corresponding to your choice: ")
                         
         if choice == 1:
-            new_company, cash_balance = create_company(cash_balance, business_types)
-            if new_company is not None:
-                companies.append(new_company)
+            create_company(state)
         elif choice == 2:
-            company = hire_management(companies, management_personnel)
+            hire_management(state)
         elif choice == 3:
-            fire_management(companies)
+            fire_management(state)
         elif choice == 4:
-            new_offshore_company, cash_balance = create_offshore_company(cash_balance, offshore_locations)
-            if new_offshore_company is not None:
-                offshore_companies.append(new_offshore_company)
+            create_offshore_company(state)
         elif choice == 5:
-            offshore_companies, companies = add_company_to_offshore(offshore_companies, companies)
+            add_company_to_offshore(state)
         elif choice == 6:
-            offshore_companies, companies = remove_company_from_offshore(offshore_companies, companies)
+            remove_company_from_offshore(state)
         elif choice == 7:
-            cash_balance = advance_month(cash_balance, companies, offshore_companies, difficulty_level)
-            months_passed += 1
+            engine.apply_action(state, 'advance_month')
         elif choice == 8:
-            display_company_products(companies)
+            display_company_products(state)
         elif choice == 9:
-            companies, cash_balance = add_new_product_to_company(companies, cash_balance)
+            add_new_product_to_company(state)
         elif choice == 10:
-            companies = remove_product_from_company(companies)
+            remove_product_from_company(state)
         elif choice == 11:
             print("Thank you for playing Business Tycoon! Goodbye.")
             break
         else:
             print("Invalid input. Please try again.")
         
-# The code is initializing variables and loading data for a business simulation game. It
-# displays an introduction, gets the player's name, sets a starting cash balance, loads data for
-# business types, management personnel, and offshore locations, and gets the difficulty level from the
-# player.
-display_intro()
-player_name = get_player_name()
-cash_balance = 10000  # Starting cash balance
-companies = []
-business_types = load_data('business_types.json')
-management_personnel = load_data('management.json')
-offshore_locations = load_data('offshore_locations.json')
-difficulty_level = get_difficulty_level()
-
-# The code is defining a function called `main_game_loop` that takes in several parameters
-# including `player_name`, `cash_balance`, `companies`, `business_types`, `management_personnel`,
-# `offshore_locations`, and `difficulty_level`. The purpose of the function is not clear without
-# additional context, but it likely contains the main logic for a game or simulation involving
-# managing companies and making financial decisions.
-main_game_loop(player_name, cash_balance, companies, business_types, management_personnel, offshore_locations, difficulty_level)
\ No newline at end of file
+def main(argv=None):
+    """
+    This function runs the game: it displays the introduction, then either resumes the game recorded in
+    a journal or gets the player's name and difficulty level, loads the catalogs and starts a new game
+    with the starting cash balance. Nothing is loaded or prompted for until it is called, so importing
+    this module (for tooling, tests or worker processes) has no side effects.
+
+    :param argv: the command-line arguments after the program name; the optional first argument is
+    the path of the action journal to keep. Defaults to sys.argv[1:]. When the BT_PROFILE environment
+    variable is set, the actions are measured and the measurements written to the file it names. When
+    the BT_RESULTS environment variable is set, the finished game is recorded in the results database
+    it names.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    journal_path = argv[0] if argv else None
+    display_intro()
+    if journal_path is not None and os.path.exists(journal_path):
+        import journal
+        state = journal.resume(journal_path)
+        print(f"Resumed {state.player_name}'s game after {state.months_passed} months.")
+    else:
+        player_name = get_player_name()
+        difficulty_level = get_difficulty_level()
+        business_types, management_personnel, offshore_locations = catalog.load_catalogs()
+        if journal_path is not None:
+            import journal
+            state = journal.start_game(journal_path, player_name, difficulty_level, business_types, management_personnel, offshore_locations)
+        else:
+            state = engine.new_game(player_name, difficulty_level, business_types, management_personnel, offshore_locations)
+
+    state.ledger = ledger.ProductLedger.from_state(state)
+    profile_path = os.environ.get('BT_PROFILE')
+    if profile_path:
+        import instrumentation
+        state.instrumentation = instrumentation.Instrumentation(profile_path)
+    main_game_loop(state)
+    if profile_path:
+        state.instrumentation.dump()
+    results_path = os.environ.get('BT_RESULTS')
+    if results_path:
+        import results
+        with results.ResultsStore(results_path) as store:
+            store.record(state, 'quit')
+            store.flush()
+            rank = store.rank(state.cash_balance, state.difficulty_level)
+        print(f"Your result was recorded: #{rank} at this difficulty level.")
+
+if __name__ == '__main__':
+    main()
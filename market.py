@@ -0,0 +1,339 @@
+#Optional stochastic market model for risk analyses.
+#
+#The engine's economics are deterministic: every month each company earns revenue times capital times
+#profit margin, pays 5% of its capital in operating cost and a fixed tax rate. A MarketModel adds three
+#sources of risk to the monthly tick, without changing any company:
+#
+#- demand shocks per industry: every business type has a demand factor that follows a mean-reverting
+#  log-normal process (an AR(1) in logs) and scales the revenue of all its companies that month;
+#- revenue noise per company: an independent log-normal factor with mean 1 for every company and month;
+#- events: each month every offshore location's tax rate changes with a small probability, by a normal
+#  amount, and keeps the new rate (never below 0) until the next change. The rates are used as the
+#  engine uses them, including the catalog's 12.5 for Ireland and Cyprus.
+#
+#market.advance_month and market.advance_months play months under the model; they stand in for the
+#engine functions of the same name and leave the game's records and cached figures as they are. All
+#the draws of a month are made in vectorized batches for the whole portfolio.
+#
+#The months are an engine action, 'advance_market_months', dispatched through engine.apply_action like
+#any other: its arguments are the model's settings() (its seed and parameters) and the months, so a
+#journal replays them exactly and an instrumentation measures them. The engine rebuilds the model from
+#its settings; the models played most recently are kept (MODEL_CACHE), so the demand and tax-rate
+#paths already drawn are not drawn again. A history records what every month produced under the model.
+#
+#Reproducibility: every month has its own independent random streams, NumPy PCG64 generators seeded
+#with SeedSequence(seed, spawn_key=(kind, month)). Company i's revenue noise is made (Box-Muller) from
+#the numbers 2i and 2i + 1 of its month's stream, which always takes one number per draw, so it depends
+#only on the seed, the month and i: not on how many companies there are, how many months are played per
+#call, or how the companies are split between processes (revenue_noise can start at any company by
+#advancing the stream). The demand and tax-rate paths only depend on the seed and the month, so they
+#are shared by every game (and fork) played with the same model.
+#
+#NumPy is optional: the game keeps working without it, only this module needs it.
+
+import math
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+import engine
+
+DEFAULT_DEMAND_VOLATILITY = 0.05
+DEFAULT_DEMAND_PERSISTENCE = 0.9
+DEFAULT_REVENUE_VOLATILITY = 0.1
+DEFAULT_EVENT_PROBABILITY = 0.02
+DEFAULT_TAX_SHOCK = 0.03
+
+# The first element of every stream's spawn key, so the streams of different kinds never coincide.
+DEMAND_STREAM = 0
+COMPANY_STREAM = 1
+EVENT_STREAM = 2
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+# What each of the settings a model is built from (MarketModel.settings()) must be, as a check and its
+# description. The model would fail on other values only once months are being played.
+SETTING_CHECKS = {
+    'seed': (lambda value: isinstance(value, int) and not isinstance(value, bool) and value >= 0, "a whole number of at least 0"),
+    'demand_volatility': (lambda value: _number(value) and value >= 0, "a number of at least 0"),
+    'demand_persistence': (lambda value: _number(value) and -1 < value < 1, "a number between -1 and 1"),
+    'revenue_volatility': (lambda value: _number(value) and value >= 0, "a number of at least 0"),
+    'event_probability': (lambda value: _number(value) and 0 <= value <= 1, "a number between 0 and 1"),
+    'tax_shock': (lambda value: _number(value) and value >= 0, "a number of at least 0"),
+}
+
+# The number of models kept for the games that play months under them; the oldest is dropped first.
+MODEL_CACHE = 16
+
+# The models months were last played with, by settings and catalog names (see _model). The server
+# plays months on worker threads, so the cache is changed under a lock.
+_models = {}
+_models_lock = threading.Lock()
+
+
+def require_numpy():
+    """
+    This function raises an error if NumPy is not installed.
+    """
+    if np is None:
+        raise ImportError("The market model requires NumPy. Install it with 'pip install numpy'.")
+
+
+class MarketModel:
+    """
+    The random market a game is played in, determined by its seed and parameters.
+    """
+
+    def __init__(self, business_types, offshore_locations, seed=0, demand_volatility=DEFAULT_DEMAND_VOLATILITY,
+                 demand_persistence=DEFAULT_DEMAND_PERSISTENCE, revenue_volatility=DEFAULT_REVENUE_VOLATILITY,
+                 event_probability=DEFAULT_EVENT_PROBABILITY, tax_shock=DEFAULT_TAX_SHOCK):
+        """
+        :param business_types: the business types of the games the model is used with; each one gets a
+        demand factor
+        :param offshore_locations: the offshore locations of those games; each one gets tax-rate events
+        :param seed: the seed every random stream is derived from
+        :param demand_volatility: the standard deviation of a month's change in log demand
+        :param demand_persistence: how much of the log demand carries over to the next month, below 1
+        :param revenue_volatility: the standard deviation of a company's log revenue factor
+        :param event_probability: the chance that a location's tax rate changes in a given month
+        :param tax_shock: the standard deviation of a tax-rate change
+        """
+        require_numpy()
+        self.seed = seed
+        self.names = (tuple(business_type['name'] for business_type in business_types),
+                      tuple(location['name'] for location in offshore_locations))
+        self.industries = {business_type['name']: index for index, business_type in enumerate(business_types)}
+        self.locations = {location['name']: index for index, location in enumerate(offshore_locations)}
+        self.demand_volatility = demand_volatility
+        self.demand_persistence = demand_persistence
+        self.revenue_volatility = revenue_volatility
+        self.event_probability = event_probability
+        self.tax_shock = tax_shock
+        # Log demand has mean 0; subtracting half its long-run variance gives demand factors with mean 1.
+        self._demand_correction = demand_volatility ** 2 / (1 - demand_persistence ** 2) / 2
+        # The demand factors and tax-rate changes of months 0, 1, ..., computed in month order on demand.
+        self._log_demand = [np.zeros(len(self.industries))]
+        self._demand = []
+        self._tax_changes = []
+        # Games on different threads can share the model; the months are extended under this lock.
+        self._lock = threading.Lock()
+
+    def settings(self):
+        """
+        This function returns the seed and parameters of the model, as keyword arguments for
+        MarketModel. They are what the journal records for the months played under the model.
+        """
+        return {'seed': self.seed, 'demand_volatility': self.demand_volatility, 'demand_persistence': self.demand_persistence,
+                'revenue_volatility': self.revenue_volatility, 'event_probability': self.event_probability,
+                'tax_shock': self.tax_shock}
+
+    def _stream(self, *key):
+        return np.random.PCG64(np.random.SeedSequence(self.seed, spawn_key=key))
+
+    def _extend(self, month):
+        # Each month's log demand follows from the previous one, so the months are computed in order.
+        if len(self._demand) > month:
+            return
+        with self._lock:
+            while len(self._demand) <= month:
+                current = len(self._demand)
+                shocks = np.random.Generator(self._stream(DEMAND_STREAM, current)).standard_normal(len(self.industries))
+                log_demand = self._log_demand[-1] * self.demand_persistence + shocks * self.demand_volatility
+                events = np.random.Generator(self._stream(EVENT_STREAM, current))
+                happens = events.random(len(self.locations)) < self.event_probability
+                amounts = events.standard_normal(len(self.locations)) * self.tax_shock
+                previous = self._tax_changes[-1] if self._tax_changes else np.zeros(len(self.locations))
+                self._log_demand.append(log_demand)
+                self._tax_changes.append(previous + np.where(happens, amounts, 0.0))
+                # The demand goes last: a month is complete once its demand is there, which is what the
+                # check above reads without the lock.
+                self._demand.append(np.exp(log_demand - self._demand_correction))
+
+    def demand(self, month):
+        """
+        This function returns the demand factor of every business type in a month, in catalog order.
+        """
+        self._extend(month)
+        return self._demand[month]
+
+    def tax_changes(self, month):
+        """
+        This function returns how far every offshore location's tax rate has moved by a month, in
+        catalog order.
+        """
+        self._extend(month)
+        return self._tax_changes[month]
+
+    def revenue_noise(self, month, count, first=0):
+        """
+        This function returns the revenue factors of `count` companies in a month.
+
+        :param month: the month, counted from the start of the game
+        :param count: the number of companies
+        :param first: the id of the first company
+        :return: a float64 array with the factors of companies first to first + count - 1.
+        """
+        stream = self._stream(COMPANY_STREAM, month)
+        if first:
+            stream.advance(2 * first)
+        uniforms = np.random.Generator(stream).random(2 * count)
+        normals = np.sqrt(-2 * np.log1p(-uniforms[0::2])) * np.cos(2 * np.pi * uniforms[1::2])
+        volatility = self.revenue_volatility
+        return np.exp(normals * volatility - volatility * volatility / 2)
+
+    def portfolio(self, state):
+        """
+        This function reads the figures of a game's companies that the monthly tick uses.
+
+        :return: a MarketPortfolio.
+        """
+        return MarketPortfolio(self, state)
+
+    def figures(self, portfolio, month, difficulty_level):
+        """
+        This function computes the figures of every company in a month under the model, like
+        engine.company_figures.
+
+        :param portfolio: the MarketPortfolio of the game
+        :param month: the month, counted from the start of the game
+        :param difficulty_level: the difficulty multiplier of the game
+        :return: a tuple of (monthly revenue, monthly profit, taxed profit) float64 arrays, one value per
+        company.
+        """
+        if portfolio.count == 0:
+            empty = np.zeros(0)
+            return empty, empty, empty
+        revenue = portfolio.revenue * self.demand(month)[portfolio.industry] * self.revenue_noise(month, portfolio.count)
+        profit = revenue * portfolio.profit_margin
+        tax_rate = portfolio.tax_rate
+        if len(self.locations):
+            tax_rate = np.maximum(tax_rate + np.where(portfolio.location >= 0, self.tax_changes(month)[portfolio.location], 0.0), 0.0)
+        operating_cost = portfolio.capital * engine.OPERATING_COST_RATE
+        return revenue, profit, ((profit * difficulty_level) - operating_cost) * (1 - tax_rate)
+
+    def cash_flow(self, portfolio, month, difficulty_level):
+        """
+        This function computes how much a month adds to the cash balance under the model.
+
+        :param portfolio: the MarketPortfolio of the game
+        :param month: the month, counted from the start of the game
+        :param difficulty_level: the difficulty multiplier of the game
+        :return: the sum of every company's taxed profit that month.
+        """
+        return float(np.sum(self.figures(portfolio, month, difficulty_level)[2]))
+
+
+class MarketPortfolio:
+    """
+    The companies of one game as arrays, one row per company in id order.
+    """
+
+    __slots__ = ('count', 'revenue', 'capital', 'profit_margin', 'industry', 'tax_rate', 'location')
+
+    def __init__(self, market, state):
+        companies = state.companies
+        self.count = count = len(companies)
+        # Revenue times capital, as engine.monthly_revenue computes it.
+        self.revenue = np.fromiter((company.revenue * company.capital for company in companies), dtype=np.float64, count=count)
+        self.capital = np.fromiter((company.capital for company in companies), dtype=np.float64, count=count)
+        self.profit_margin = np.fromiter((company.profit_margin for company in companies), dtype=np.float64, count=count)
+        self.industry = np.fromiter((market.industries[company.industry] for company in companies), dtype=np.intp, count=count)
+        self.tax_rate = np.fromiter((engine.company_tax_rate(state, company) for company in companies), dtype=np.float64, count=count)
+        # The catalog index of each company's offshore location, or -1 outside offshore companies.
+        locations = [market.locations.get(offshore_company.location, -1) for offshore_company in state.offshore_companies]
+        self.location = np.fromiter((locations[company.offshore_id] if company.offshore else -1 for company in companies), dtype=np.intp, count=count)
+
+
+def _keep(key, market):
+    with _models_lock:
+        _models.pop(key, None)
+        _models[key] = market
+        if len(_models) > MODEL_CACHE:
+            del _models[next(iter(_models))]
+
+
+def _model(state, settings):
+    """
+    This function returns the MarketModel described by `settings` for the catalogs of a game, reusing
+    the one months were last played with.
+    """
+    if not isinstance(settings, dict):
+        raise engine.ActionError("The market settings must be a dictionary of MarketModel parameters.")
+    for name, value in settings.items():
+        check = SETTING_CHECKS.get(name)
+        if check is None:
+            raise engine.ActionError(f"Unknown market setting: {name!r}.")
+        if not check[0](value):
+            raise engine.ActionError(f"The market setting {name!r} must be {check[1]}.")
+    key = (tuple(sorted(settings.items())), tuple(business_type['name'] for business_type in state.business_types),
+           tuple(location['name'] for location in state.offshore_locations))
+    market = _models.get(key)
+    if market is None:
+        market = MarketModel(state.business_types, state.offshore_locations, **settings)
+    _keep(key, market)
+    return market
+
+
+def play_months(state, settings, months, min_cash=None, target_cash=None):
+    """
+    This function is the engine action 'advance_market_months': it advances the game by up to `months`
+    months under the market model described by `settings`, one month at a time, like
+    engine.advance_months. Call it through engine.apply_action, or through advance_months below.
+
+    :param state: the GameState to modify
+    :param settings: the MarketModel.settings() of the model to draw the months from
+    :param months: the maximum number of months to advance
+    :param min_cash: if given, stop at the end of the first month whose cash balance is below this value
+    :param target_cash: if given, stop at the end of the first month whose cash balance reaches this value
+    :return: the number of months actually advanced.
+    """
+    engine._check_months(months, min_cash, target_cash)
+    market = _model(state, settings)
+    if months <= 0:
+        return 0
+    portfolio = market.portfolio(state)
+    for month in range(months):
+        revenue, profit, taxed_profit = market.figures(portfolio, state.months_passed, state.difficulty_level)
+        cash_flow = float(np.sum(taxed_profit))
+        state.cash_balance += cash_flow
+        state.months_passed += 1
+        if state.history is not None:
+            state.history.record(state, 1, (float(np.sum(revenue)), float(np.sum(profit)), cash_flow), (revenue, profit, taxed_profit))
+        if (min_cash is not None and state.cash_balance < min_cash) or (target_cash is not None and state.cash_balance >= target_cash):
+            return month + 1
+    return months
+
+
+def advance_month(state, market):
+    """
+    This function advances the game by one month under a market model, like engine.advance_month.
+
+    :param state: the GameState to modify
+    :param market: the MarketModel to draw the month from
+    :return: the updated cash balance.
+    """
+    advance_months(state, market, 1)
+    return state.cash_balance
+
+
+def advance_months(state, market, months, min_cash=None, target_cash=None):
+    """
+    This function advances the game by up to `months` months under a market model through
+    engine.apply_action, so the months are journaled and measured like the game's other actions (see
+    play_months). The companies are read once, so the game must not change in between.
+
+    :param state: the GameState to modify
+    :param market: the MarketModel to draw the months from
+    :param months: the maximum number of months to advance
+    :param min_cash: if given, stop at the end of the first month whose cash balance is below this value
+    :param target_cash: if given, stop at the end of the first month whose cash balance reaches this value
+    :return: the number of months actually advanced.
+    """
+    settings = market.settings()
+    _keep((tuple(sorted(settings.items())), *market.names), market)
+    return engine.apply_action(state, 'advance_market_months', settings, months, min_cash, target_cash)
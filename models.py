@@ -0,0 +1,171 @@
+#Compact record types for the game's entities.
+#
+#Companies, products and offshore companies used to be plain dictionaries, each carrying its own hash
+#table of repeated key strings. With hundreds of thousands of companies that overhead dominated memory.
+#The classes below store the same fields in __slots__ instead.
+#
+#During the migration they also behave like the dictionaries they replace: record['name'],
+#record['name'] = value, 'management' in record, record.get(...), record.pop(...), dict(record) and
+#iteration over the keys all work. Optional fields (a company's 'management') hold None when they are
+#absent and then behave like a missing key. New code should use attribute access, which is faster.
+#
+#copy() returns a shallow copy like dict.copy, except that the containers the engine modifies in place
+#(a company's products, an offshore company's members) are copied too, so that changing the copy never
+#changes the original. branching.py relies on this to copy records on their first write.
+
+
+class Record:
+    """
+    Base class that gives a __slots__ class dictionary-style access to its fields.
+    """
+
+    __slots__ = ()
+
+    # Fields that behave like a missing key while they hold None.
+    _optional = ()
+
+    def _check_key(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+
+    def __getitem__(self, key):
+        self._check_key(key)
+        value = getattr(self, key)
+        if value is None and key in self._optional:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._check_key(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        self.pop(key)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and not (key in self._optional and getattr(self, key) is None)
+
+    def get(self, key, default=None):
+        """
+        This function returns the value of a field, or `default` if the record does not have it.
+        """
+        return self[key] if key in self else default
+
+    _missing = object()
+
+    def pop(self, key, default=_missing):
+        """
+        This function removes an optional field and returns its value, like dict.pop.
+        """
+        if key not in self:
+            if default is Record._missing:
+                raise KeyError(key)
+            return default
+        if key not in self._optional:
+            raise TypeError(f"{type(self).__name__} field '{key}' cannot be removed")
+        value = getattr(self, key)
+        setattr(self, key, None)
+        return value
+
+    def keys(self):
+        """
+        This function returns the names of the fields the record has, like dict.keys.
+        """
+        return [key for key in self.__slots__ if key in self]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        """
+        This function returns (field name, value) pairs, like dict.items.
+        """
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def values(self):
+        """
+        This function returns the field values, like dict.values.
+        """
+        return [getattr(self, key) for key in self.keys()]
+
+    def copy(self):
+        """
+        This function returns a copy of the record that can be modified without changing this one.
+        """
+        copy = object.__new__(type(self))
+        for key in self.__slots__:
+            setattr(copy, key, getattr(self, key))
+        return copy
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{key}={value!r}' for key, value in self.items())})"
+
+
+class Product(Record):
+    """
+    A product of a company: its name, the money invested in it and the revenue it adds to the company,
+    before the revenue boost of the company's manager.
+    """
+
+    __slots__ = ('name', 'investment', 'revenue')
+
+    def __init__(self, name, investment, revenue):
+        self.name = name
+        self.investment = investment
+        self.revenue = revenue
+
+
+class Company(Record):
+    """
+    A company owned by the player. 'monthly_revenue', 'monthly_profit' and 'taxed_profit' are the
+    figures the engine caches for the monthly tick.
+    """
+
+    __slots__ = ('id', 'name', 'industry', 'capital', 'offshore', 'offshore_id', 'revenue', 'profit_margin',
+                 'products', 'management', 'monthly_revenue', 'monthly_profit', 'taxed_profit')
+
+    _optional = ('management',)
+
+    def __init__(self, id, name, industry, capital, revenue, profit_margin, offshore=False, offshore_id=None, products=None, management=None):
+        self.id = id
+        self.name = name
+        self.industry = industry
+        self.capital = capital
+        self.offshore = offshore
+        self.offshore_id = offshore_id
+        self.revenue = revenue
+        self.profit_margin = profit_margin
+        self.products = [] if products is None else products
+        self.management = management
+        self.monthly_revenue = 0.0
+        self.monthly_profit = 0.0
+        self.taxed_profit = 0.0
+
+    def copy(self):
+        copy = Record.copy(self)
+        copy.products = list(self.products)
+        return copy
+
+
+class OffshoreEntity(Record):
+    """
+    An offshore company owned by the player. 'companies' maps the ids of its member companies to the
+    companies.
+    """
+
+    __slots__ = ('id', 'name', 'location', 'tax_rate', 'companies')
+
+    def __init__(self, id, name, location, tax_rate, companies=None):
+        self.id = id
+        self.name = name
+        self.location = location
+        self.tax_rate = tax_rate
+        self.companies = {} if companies is None else companies
+
+    def copy(self):
+        copy = Record.copy(self)
+        copy.companies = dict(self.companies)
+        return copy
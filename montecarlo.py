@@ -0,0 +1,413 @@
+#Monte Carlo runner for scripted strategies.
+#
+#Runs thousands of independent games, each driven by a scripted strategy through the headless engine,
+#spread over a process pool. Every run gets its own seed derived from the base seed and the run index,
+#and runs are grouped into fixed-size chunks that are aggregated in chunk order, so the statistics are
+#identical whatever the number of workers. Workers return one small OutcomeStats per chunk instead of
+#one record per run, and the parent only keeps a bounded number of chunks in flight, so memory stays
+#flat however many runs are requested.
+#
+#With --market, every run is played under its own market.MarketModel (demand shocks, revenue noise and
+#tax-rate events), seeded from the run's seed, so the results still do not depend on the number of
+#workers.
+#
+#With --results, every run is also added to a results.ResultsStore (one row per run with its final
+#cash, months, outcome and portfolio). Workers return the rows of a chunk with its summary and the parent
+#writes them as it folds the chunks, so there is one writer, and the rows are stored in run order.
+#
+#Usage: python montecarlo.py --runs 10000 --workers 8 --strategy expansion --months 600 [--market] [--results runs.db]
+
+import argparse
+import math
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import catalog
+import engine
+import market as market_model
+import results as results_store
+
+DIFFICULTY_LEVELS = (1, 0.75, 0.5, 0.25)
+DEFAULT_TARGET_CASH = 10000000
+DEFAULT_MONTHS = 600
+DEFAULT_CHUNK_SIZE = 64
+
+# Histogram buckets for final cash: BUCKETS_PER_DECADE buckets per power of ten, mirrored for
+# negative values, so percentiles can be estimated without keeping every result.
+BUCKETS_PER_DECADE = 32
+
+
+def strategy_idle(state, rng):
+    """
+    This strategy never acts; it only lets the months pass.
+    """
+
+
+def strategy_dropshipping(state, rng):
+    """
+    This strategy opens a Dropshipping company at the minimum capital whenever it can afford one.
+    """
+    for index, business in enumerate(state.business_types):
+        if business['name'] == "Dropshipping":
+            while state.cash_balance >= business['startup_capital']:
+                engine.create_company(state, index, f"Shop {len(state.companies) + 1}", business['startup_capital'])
+            return
+
+
+def strategy_expansion(state, rng):
+    """
+    This strategy opens the most expensive business it can afford with a random amount of extra
+    capital, hires the best affordable manager for every unmanaged company, and once it has spare cash
+    sets up the cheapest offshore company with the lowest tax rate and moves every company there.
+    """
+    affordable = [index for index, business in enumerate(state.business_types) if business['startup_capital'] <= state.cash_balance]
+    if affordable:
+        index = max(affordable, key=lambda i: state.business_types[i]['startup_capital'])
+        capital = min(state.cash_balance, state.business_types[index]['startup_capital'] * rng.choice((1, 1.5, 2)))
+        engine.create_company(state, index, f"Company {len(state.companies) + 1}", capital)
+
+    for company in state.companies:
+        if company.management is None:
+            candidates = [index for index, manager in enumerate(state.management_personnel) if manager['salary'] <= company.monthly_profit]
+            if candidates:
+                best = max(candidates, key=lambda i: state.management_personnel[i]['profit_margin_boost'])
+                engine.hire_management(state, company.id, best)
+
+    if not state.offshore_companies and state.offshore_locations:
+        location_index = min(range(len(state.offshore_locations)),
+                             key=lambda i: (state.offshore_locations[i]['tax_rate'], state.offshore_locations[i]['setup_cost']))
+        if state.cash_balance >= 2 * state.offshore_locations[location_index]['setup_cost']:
+            engine.create_offshore_company(state, location_index, "Holding")
+    if state.offshore_companies and state.offshore_companies[0].tax_rate < engine.DEFAULT_TAX_RATE:
+        for company in state.companies:
+            if not company.offshore:
+                engine.add_company_to_offshore(state, 0, company.id)
+
+
+STRATEGIES = {
+    'idle': strategy_idle,
+    'dropshipping': strategy_dropshipping,
+    'expansion': strategy_expansion,
+}
+
+
+class OutcomeStats:
+    """
+    Streaming summary of many runs: counts by outcome, the mean, spread and histogram of the final cash,
+    and the months it took to go bankrupt or to reach the target.
+    """
+
+    __slots__ = ('runs', 'bankrupt', 'reached_target', 'cash_mean', 'cash_m2', 'cash_min', 'cash_max',
+                 'cash_histogram', 'months_to_bankruptcy', 'months_to_target')
+
+    def __init__(self):
+        self.runs = 0
+        self.bankrupt = 0
+        self.reached_target = 0
+        self.cash_mean = 0.0
+        self.cash_m2 = 0.0
+        self.cash_min = math.inf
+        self.cash_max = -math.inf
+        self.cash_histogram = {}
+        self.months_to_bankruptcy = {}
+        self.months_to_target = {}
+
+    def add(self, final_cash, months, outcome):
+        """
+        This function adds one run to the summary.
+
+        :param final_cash: the cash balance at the end of the run
+        :param months: the number of months the run lasted
+        :param outcome: 'bankrupt', 'target' or 'horizon'
+        """
+        self.runs += 1
+        delta = final_cash - self.cash_mean
+        self.cash_mean += delta / self.runs
+        self.cash_m2 += delta * (final_cash - self.cash_mean)
+        self.cash_min = min(self.cash_min, final_cash)
+        self.cash_max = max(self.cash_max, final_cash)
+        bucket = cash_bucket(final_cash)
+        self.cash_histogram[bucket] = self.cash_histogram.get(bucket, 0) + 1
+        if outcome == 'bankrupt':
+            self.bankrupt += 1
+            self.months_to_bankruptcy[months] = self.months_to_bankruptcy.get(months, 0) + 1
+        elif outcome == 'target':
+            self.reached_target += 1
+            self.months_to_target[months] = self.months_to_target.get(months, 0) + 1
+
+    def merge(self, other):
+        """
+        This function folds the summary of another batch of runs into this one.
+        """
+        if other.runs == 0:
+            return
+        runs = self.runs + other.runs
+        delta = other.cash_mean - self.cash_mean
+        self.cash_m2 += other.cash_m2 + delta * delta * self.runs * other.runs / runs
+        self.cash_mean += delta * other.runs / runs
+        self.runs = runs
+        self.bankrupt += other.bankrupt
+        self.reached_target += other.reached_target
+        self.cash_min = min(self.cash_min, other.cash_min)
+        self.cash_max = max(self.cash_max, other.cash_max)
+        for mine, theirs in ((self.cash_histogram, other.cash_histogram),
+                             (self.months_to_bankruptcy, other.months_to_bankruptcy),
+                             (self.months_to_target, other.months_to_target)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+
+    @staticmethod
+    def mean_months(histogram):
+        """
+        This function returns the mean of a months histogram (months_to_bankruptcy or months_to_target),
+        or None if it is empty.
+        """
+        count = sum(histogram.values())
+        return sum(months * runs for months, runs in histogram.items()) / count if count else None
+
+    @property
+    def cash_stdev(self):
+        return math.sqrt(self.cash_m2 / (self.runs - 1)) if self.runs > 1 else 0.0
+
+    def cash_percentile(self, percent):
+        """
+        This function estimates a percentile of the final cash from the histogram.
+
+        :param percent: the percentile to estimate, between 0 and 100
+        :return: the lower edge of the bucket holding that percentile, or None without runs.
+        """
+        if self.runs == 0:
+            return None
+        rank = percent / 100 * (self.runs - 1)
+        seen = 0
+        for bucket in sorted(self.cash_histogram):
+            seen += self.cash_histogram[bucket]
+            if seen > rank:
+                return max(self.cash_min, min(self.cash_max, bucket_floor(bucket)))
+        return self.cash_max
+
+
+def cash_bucket(cash):
+    """
+    This function returns the histogram bucket of a cash amount: 0 for amounts below $1 in size, and
+    otherwise a signed bucket number that grows with the logarithm of the amount.
+    """
+    if -1 < cash < 1:
+        return 0
+    bucket = int(math.log10(abs(cash)) * BUCKETS_PER_DECADE) + 1
+    return bucket if cash > 0 else -bucket
+
+
+def bucket_floor(bucket):
+    """
+    This function returns the lower edge of a histogram bucket from cash_bucket.
+    """
+    if bucket == 0:
+        return -1.0
+    if bucket > 0:
+        return 10 ** ((bucket - 1) / BUCKETS_PER_DECADE)
+    return -(10 ** (-bucket / BUCKETS_PER_DECADE))
+
+
+def run_seed(base_seed, run_index):
+    """
+    This function derives the seed of one run from the base seed and the run's index, so the same run
+    gets the same seed in whichever process it runs.
+    """
+    return base_seed * 1000003 + run_index
+
+
+def simulate_run(catalogs, strategy, difficulty_level, starting_cash, seed, months=DEFAULT_MONTHS, target_cash=DEFAULT_TARGET_CASH, market=None):
+    """
+    This function plays one game with a scripted strategy: every month the strategy acts, then the
+    month advances. The game ends when the cash balance goes negative, reaches the target, or after
+    `months` months. The arguments are those of play_run.
+
+    :return: a tuple of (final cash, months played, outcome) where the outcome is 'bankrupt',
+    'target' or 'horizon'.
+    """
+    state, outcome = play_run(catalogs, strategy, difficulty_level, starting_cash, seed, months, target_cash, market)
+    return state.cash_balance, state.months_passed, outcome
+
+
+def play_run(catalogs, strategy, difficulty_level, starting_cash, seed, months=DEFAULT_MONTHS, target_cash=DEFAULT_TARGET_CASH, market=None):
+    """
+    This function plays one game like simulate_run and returns the game itself.
+
+    :param catalogs: a tuple of (business_types, management_personnel, offshore_locations)
+    :param strategy: a function taking (state, rng) that performs engine actions
+    :param difficulty_level: the difficulty multiplier of the game
+    :param starting_cash: the starting cash balance, before the start-of-game reduction
+    :param seed: the seed of the random generator the strategy uses
+    :param months: the maximum number of months to play
+    :param target_cash: the cash balance that ends the game as a success
+    :param market: a market.MarketModel the months are played under, or None for the engine's
+    deterministic months
+    :return: a tuple of (the GameState at the end, outcome).
+    """
+    rng = random.Random(seed)
+    business_types, management_personnel, offshore_locations = catalogs
+    state = engine.new_game("Simulation", difficulty_level, business_types, management_personnel, offshore_locations, cash_balance=starting_cash)
+    while state.months_passed < months:
+        strategy(state, rng)
+        if market is None:
+            engine.advance_month(state)
+        else:
+            market_model.advance_month(state, market)
+        if state.cash_balance < 0:
+            return state, 'bankrupt'
+        if state.cash_balance >= target_cash:
+            return state, 'target'
+    return state, 'horizon'
+
+
+# Catalogs of the current worker process, loaded once by _init_worker.
+_worker_catalogs = None
+
+
+def _init_worker(catalogs):
+    global _worker_catalogs
+    _worker_catalogs = catalogs
+
+
+def run_chunk(config, first_run, last_run):
+    """
+    This function plays runs first_run to last_run - 1 and summarises them per difficulty level.
+
+    :param config: a dictionary with the keys 'strategy', 'base_seed', 'difficulty_levels',
+    'starting_cash' (a (low, high) range), 'months', 'target_cash', 'market' (whether runs are
+    played under a market model) and 'record' (whether to return a results row per run)
+    :param first_run: the index of the first run of the chunk
+    :param last_run: the index after the last run of the chunk
+    :return: a tuple of (a dictionary mapping each difficulty level to an OutcomeStats, the list of
+    results.run_row rows of the runs in run order, empty unless 'record' is set).
+    """
+    strategy = STRATEGIES[config['strategy']]
+    levels = config['difficulty_levels']
+    low, high = config['starting_cash']
+    stats = {level: OutcomeStats() for level in levels}
+    rows = []
+    source = 'montecarlo:' + config['strategy']
+    for run_index in range(first_run, last_run):
+        rng = random.Random(run_seed(config['base_seed'], run_index))
+        level = levels[run_index % len(levels)]
+        starting_cash = rng.uniform(low, high)
+        strategy_seed = rng.getrandbits(64)
+        market = None
+        if config['market']:
+            market = market_model.MarketModel(_worker_catalogs[0], _worker_catalogs[2], seed=rng.getrandbits(64))
+        state, outcome = play_run(_worker_catalogs, strategy, level, starting_cash, strategy_seed, config['months'], config['target_cash'], market)
+        stats[level].add(state.cash_balance, state.months_passed, outcome)
+        if config['record']:
+            rows.append(results_store.run_row(state, outcome, source))
+    return stats, rows
+
+
+def run_batch(catalogs, runs, strategy='expansion', workers=None, base_seed=0, difficulty_levels=DIFFICULTY_LEVELS,
+              starting_cash=(10000, 10000), months=DEFAULT_MONTHS, target_cash=DEFAULT_TARGET_CASH, chunk_size=DEFAULT_CHUNK_SIZE,
+              market=False, results=None):
+    """
+    This function plays `runs` independent games and returns their summary per difficulty level. Run i
+    is played at difficulty_levels[i % len(difficulty_levels)] with a starting cash drawn uniformly from
+    `starting_cash`, both derived from the run's own seed.
+
+    :param catalogs: a tuple of (business_types, management_personnel, offshore_locations)
+    :param runs: the number of games to play
+    :param strategy: the name of a strategy in STRATEGIES
+    :param workers: the number of worker processes; 1 plays every run in this process, None uses every
+    CPU
+    :param base_seed: the seed all run seeds are derived from
+    :param difficulty_levels: the difficulty multipliers to cycle through
+    :param starting_cash: a (low, high) range for the starting cash balance
+    :param months: the maximum number of months per game
+    :param target_cash: the cash balance that ends a game as a success
+    :param chunk_size: the number of runs per task; the result depends on it, not on `workers`
+    :param market: whether every run is played under its own market.MarketModel, which needs NumPy
+    :param results: a results.ResultsStore to add every run to, in run order; it is flushed at the end
+    but not closed
+    :return: a dictionary mapping each difficulty level to an OutcomeStats.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    config = {'strategy': strategy, 'base_seed': base_seed, 'difficulty_levels': tuple(difficulty_levels),
+              'starting_cash': tuple(starting_cash), 'months': months, 'target_cash': target_cash, 'market': market,
+              'record': results is not None}
+    if market:
+        market_model.require_numpy()
+    chunks = [(first, min(first + chunk_size, runs)) for first in range(0, runs, chunk_size)]
+    totals = {level: OutcomeStats() for level in config['difficulty_levels']}
+
+    def fold(chunk):
+        chunk_stats, rows = chunk
+        for level, stats in chunk_stats.items():
+            totals[level].merge(stats)
+        if results is not None:
+            results.add_many(rows)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(catalogs)
+        for first, last in chunks:
+            fold(run_chunk(config, first, last))
+        if results is not None:
+            results.flush()
+        return totals
+
+    # Keep a bounded window of chunks in flight and fold them strictly in chunk order.
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(catalogs,)) as executor:
+        pending = deque()
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < 4 * workers:
+                pending.append(executor.submit(run_chunk, config, *chunks[next_chunk]))
+                next_chunk += 1
+            fold(pending.popleft().result())
+    if results is not None:
+        results.flush()
+    return totals
+
+
+def format_stats(totals):
+    """
+    This function formats the summary returned by run_batch as a table, one line per difficulty level.
+    The two months columns are the mean months to bankruptcy and to the target.
+    """
+    lines = [f"{'difficulty':>10} {'runs':>8} {'bankrupt':>9} {'months':>7} {'target':>8} {'months':>7} "
+             f"{'mean cash':>16} {'p10 cash':>14} {'p50 cash':>14} {'p90 cash':>14}"]
+    for level, stats in totals.items():
+        p10, p50, p90 = (stats.cash_percentile(p) for p in (10, 50, 90))
+        to_bankruptcy = stats.mean_months(stats.months_to_bankruptcy)
+        to_target = stats.mean_months(stats.months_to_target)
+        lines.append(f"{level:>10} {stats.runs:>8} {stats.bankrupt:>9} {to_bankruptcy or 0:>7.1f} {stats.reached_target:>8} {to_target or 0:>7.1f} "
+                     f"{stats.cash_mean:>16.2f} {p10 or 0:>14.0f} {p50 or 0:>14.0f} {p90 or 0:>14.0f}")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play many scripted games in parallel and summarise the outcomes.")
+    parser.add_argument('--runs', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='expansion')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--months', type=int, default=DEFAULT_MONTHS)
+    parser.add_argument('--target', type=float, default=DEFAULT_TARGET_CASH)
+    parser.add_argument('--market', action='store_true', help="play every run under a random market model (needs NumPy)")
+    parser.add_argument('--results', metavar='DB', help="also record every run in this results database")
+    parser.add_argument('--cash', type=float, nargs=2, default=(10000, 10000), metavar=('LOW', 'HIGH'))
+    parser.add_argument('--business-types', default='business_types.json')
+    parser.add_argument('--management', default='management.json')
+    parser.add_argument('--offshore-locations', default='offshore_locations.json')
+    args = parser.parse_args()
+    # Worker processes receive the catalogs pickled, so a lazily read .jsonl catalog is loaded in full.
+    catalogs = tuple(list(catalog.load_catalog(path, kind)) for path, kind in
+                     ((args.business_types, 'business_types'), (args.management, 'management'), (args.offshore_locations, 'offshore_locations')))
+    store = results_store.ResultsStore(args.results) if args.results else None
+    try:
+        totals = run_batch(catalogs, args.runs, args.strategy, args.workers, args.seed, starting_cash=args.cash,
+                           months=args.months, target_cash=args.target, market=args.market, results=store)
+    finally:
+        if store is not None:
+            store.close()
+    print(format_stats(totals))
@@ -0,0 +1,151 @@
+#Offshore tax planning: which offshore companies to set up and which companies to move where so the
+#portfolio keeps the most money after tax over a chosen number of months.
+#
+#Each month a company adds (profit * difficulty level - operating cost) * (1 - tax rate) to the cash
+#balance, where the tax rate is the default rate or the rate of its offshore company. Any number of
+#companies can join an offshore company and moving a company is free, so every company simply wants
+#the best rate it can get:
+#
+#1. A company whose pre-tax figure is positive wants the lowest available rate.
+#2. A company that loses money wants the highest available rate, since the formula multiplies the loss
+#   by (1 - tax rate). The shipped catalog lists some rates as whole percentages (12.5), and the
+#   formula is followed as it is.
+#
+#The available rates are the default rate and the rates of the existing offshore companies. Setting
+#up a new one is only worth it if it lowers the lowest rate or raises the highest one, and its value
+#depends only on its rate, its setup cost and the summed pre-tax figures of the two groups. So the
+#best plan sets up at most two new offshore companies. Finding the best pair whose setup costs fit the
+#budget together takes a sort of the locations by setup cost, so planning is
+#O(companies + locations log locations).
+
+import bisect
+
+import engine
+
+
+class OffshorePlan:
+    """
+    A plan computed by plan_offshore. Apply it with apply().
+
+    'new_offshore_companies' lists the (location index, name) pairs of the offshore companies to set
+    up and 'assignments' the (company index, offshore index or None) pairs of the companies to move,
+    in the form engine.reassign_offshore takes. 'monthly_gain' is how much more the portfolio adds to
+    the cash balance each month once the plan is applied, 'setup_cost' what the new offshore companies
+    cost, and 'gain' the net gain over the planning horizon.
+    """
+
+    __slots__ = ('new_offshore_companies', 'assignments', 'monthly_gain', 'setup_cost', 'horizon', 'gain')
+
+    def __init__(self, new_offshore_companies, assignments, monthly_gain, setup_cost, horizon):
+        self.new_offshore_companies = new_offshore_companies
+        self.assignments = assignments
+        self.monthly_gain = monthly_gain
+        self.setup_cost = setup_cost
+        self.horizon = horizon
+        self.gain = monthly_gain * horizon - setup_cost
+
+    def apply(self, state):
+        """
+        This function applies the plan to the game it was computed for, in one engine action.
+
+        :param state: the GameState the plan was computed for
+        :return: the list of OffshoreEntity objects that were created.
+        """
+        return engine.apply_action(state, 'reassign_offshore', self.new_offshore_companies, self.assignments)
+
+
+def pre_tax_figure(state, company):
+    """
+    This function returns what a company would add to the cash balance each month without tax: its
+    profit scaled by the difficulty level minus its operating cost.
+    """
+    return company.monthly_profit * state.difficulty_level - company.capital * engine.OPERATING_COST_RATE
+
+
+def _best_pair(locations, lower_value, upper_value, budget):
+    """
+    This function picks one location to lower the lowest rate and one to raise the highest rate, with
+    setup costs that fit the budget together. Either may be None. It returns (net gain, lower index,
+    upper index).
+    """
+    lower = [(location['setup_cost'], lower_value(location['tax_rate']) - location['setup_cost'], index)
+             for index, location in enumerate(locations) if location['setup_cost'] <= budget]
+    upper = sorted((location['setup_cost'], upper_value(location['tax_rate']) - location['setup_cost'], index)
+                   for index, location in enumerate(locations) if location['setup_cost'] <= budget)
+    # prefix[i] is the best (net gain, index) among the i cheapest upper candidates.
+    prefix = [(0, None)]
+    for _, net, index in upper:
+        prefix.append(max(prefix[-1], (net, index), key=lambda candidate: candidate[0]))
+    costs = [cost for cost, _, _ in upper]
+    best = (prefix[-1][0], None, prefix[-1][1])
+    for cost, net, index in lower:
+        if net <= 0:
+            continue
+        partner_net, partner = prefix[bisect.bisect_right(costs, budget - cost)]
+        if net + partner_net > best[0]:
+            best = (net + partner_net, index, partner)
+    return best
+
+
+def plan_offshore(state, horizon, budget=None, names=("Tax Holding", "Loss Holding")):
+    """
+    This function computes the offshore plan that keeps the most money after tax over `horizon` months:
+    the offshore companies to set up (at most two) and the offshore company every company should be
+    in. Companies that are already where they should be are left alone.
+
+    :param state: the GameState to plan for
+    :param horizon: the number of months the plan should pay off over
+    :param budget: the most the new offshore companies may cost together; defaults to the cash balance
+    :param names: the names of the offshore companies set up for the companies that make money and
+    for the ones that lose money
+    :return: an OffshorePlan.
+    """
+    budget = state.cash_balance if budget is None else budget
+    offshore_companies = state.offshore_companies
+    # The available rates, as (rate, offshore index, or -1 for the default rate). Staying out of
+    # offshore companies wins ties, then existing offshore companies with lower indexes; new offshore
+    # companies are only set up for a strictly better rate.
+    lowest = min([(engine.DEFAULT_TAX_RATE, -1)] + [(entity.tax_rate, entity.id) for entity in offshore_companies])
+    highest = min([(-engine.DEFAULT_TAX_RATE, -1)] + [(-entity.tax_rate, entity.id) for entity in offshore_companies])
+    lowest_rate, highest_rate = lowest[0], -highest[0]
+
+    gains = 0.0
+    losses = 0.0
+    figures = []
+    for company in state.companies:
+        figure = pre_tax_figure(state, company)
+        figures.append(figure)
+        if figure > 0:
+            gains += figure
+        elif figure < 0:
+            losses -= figure
+
+    net, lower_index, upper_index = _best_pair(state.offshore_locations,
+                                               lambda rate: horizon * gains * (lowest_rate - rate) if rate < lowest_rate else 0,
+                                               lambda rate: horizon * losses * (rate - highest_rate) if rate > highest_rate else 0,
+                                               budget)
+    new_offshore_companies = []
+    lower_target = None if lowest[1] == -1 else lowest[1]
+    upper_target = None if highest[1] == -1 else highest[1]
+    if lower_index is not None:
+        lower_target = len(offshore_companies) + len(new_offshore_companies)
+        lowest_rate = state.offshore_locations[lower_index]['tax_rate']
+        new_offshore_companies.append((lower_index, names[0]))
+    if upper_index is not None:
+        upper_target = len(offshore_companies) + len(new_offshore_companies)
+        highest_rate = state.offshore_locations[upper_index]['tax_rate']
+        new_offshore_companies.append((upper_index, names[1]))
+
+    assignments = []
+    monthly_gain = 0.0
+    for company, figure in zip(state.companies, figures):
+        if figure == 0:
+            continue
+        target, rate = (lower_target, lowest_rate) if figure > 0 else (upper_target, highest_rate)
+        current_rate = engine.company_tax_rate(state, company)
+        if current_rate == rate:
+            continue
+        assignments.append((company.id, target))
+        monthly_gain += figure * (current_rate - rate)
+    setup_cost = sum(state.offshore_locations[index]['setup_cost'] for index, _ in new_offshore_companies)
+    return OffshorePlan(new_offshore_companies, assignments, monthly_gain, setup_cost, horizon)
@@ -0,0 +1,464 @@
+#Strategy search: the shortest sequence of actions it can find that takes a game to a cash target.
+#
+#The planner searches the game's own actions through the engine, so a plan replays exactly. Amounts are
+#discretized: capital is either the business type's startup capital or a fraction of the cash balance
+#(DEFAULT_FRACTIONS), and investments and company actions spend a fraction of the cash balance.
+#
+#The search is best-first branch and bound:
+#
+#1. Every node is a compact snapshot of the GameState (see snapshot()). Expanding a node restores it,
+#   applies one action, and snapshots the result. advance_month is one of the actions.
+#2. Every new node is also coasted: engine.advance_months runs it forward with no more actions until
+#   it reaches the target. That gives a complete plan, which becomes the incumbent when it is faster
+#   than the best one so far. Nodes are expanded in order of their coasting month, even past the
+#   horizon, so the nodes that grow the monthly cash flow most are tried first.
+#3. A node below the target needs at least one more month, so it is pruned once that cannot beat
+#   the incumbent.
+#4. Nodes are deduplicated by their structure: the companies and offshore companies without names or
+#   order. A node is dropped when a node with the same structure was already seen at the same or an
+#   earlier month with at least as much cash, since it can do no better.
+#5. Some moves are pruned outright. The engine never charges salaries, so only the manager that raises
+#   a company's profit most is hired. Only offshore locations that lower the best available tax rate
+#   are set up, and companies only join the offshore company with the lowest rate. A company gets at
+#   most one product and one company action a month: two investments in the same month add up to
+#   about what one of their sum adds, and without the limit the months would never run out of moves.
+#   What was invested this month is part of the node.
+#
+#The search stops when the frontier is exhausted, or when a budget runs out. An exhausted frontier
+#makes the plan the best among the generated moves, not an optimum of the game: the move pruning in 5.
+#can leave out moves that would have been faster. The memory budget is counted in estimated bytes of
+#stored nodes, once for every frontier push, and the expansion budget in nodes, so both stop at the
+#same point on every run. The time limit is a safety net: a search cut short by it depends on the
+#speed of the machine.
+#
+#For several cores, the first `split_expansions` nodes are expanded here and the frontier left is dealt
+#out to `tasks` tasks, each searched on its own with an equal share of the remaining budgets. The
+#tasks only share the incumbent found before the split, and their results are combined in task order,
+#so the plan is the same whatever the number of workers.
+#
+#Usage: python planner.py --target 10000000 --difficulty 1 --workers 4 --time-limit 60
+
+import argparse
+import heapq
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import catalog
+import engine
+from models import Company, OffshoreEntity
+
+DEFAULT_TARGET_CASH = 10000000
+DEFAULT_MAX_MONTHS = 120
+DEFAULT_FRACTIONS = (0.5, 1.0)
+DEFAULT_MAX_COMPANIES = 4
+DEFAULT_TIME_LIMIT = 60.0
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+DEFAULT_SPLIT_EXPANSIONS = 2000
+DEFAULT_TASKS = 32
+
+# Estimated bytes a stored node takes (its frontier entry, its snapshot and its dominance entry), and
+# what every company and product in it adds. Measured with tracemalloc by benchmarks/bench_planner.py.
+NODE_BYTES = 450
+COMPANY_BYTES = 250
+PRODUCT_BYTES = 16
+
+# The number of expansions between two looks at the clock.
+CLOCK_INTERVAL = 256
+
+
+class Plan:
+    """
+    The result of plan_cash_target.
+
+    'actions' lists the (action name, arguments) pairs to pass to engine.apply_action, in order, and
+    'months' and 'cash_balance' are the months they take and the cash balance they end with; 'actions'
+    is None when no plan reaching the target within the horizon was found. 'expansions' counts the
+    nodes expanded. 'complete' tells whether the search ran to the end, which makes the plan the best
+    among the generated moves (see the pruning at the top of this file), and 'stopped' names the
+    budget that cut it short otherwise ('time', 'memory' or 'expansions').
+    """
+
+    __slots__ = ('actions', 'months', 'cash_balance', 'expansions', 'complete', 'stopped')
+
+    def __init__(self, actions, months, cash_balance, expansions, complete, stopped):
+        self.actions = actions
+        self.months = months
+        self.cash_balance = cash_balance
+        self.expansions = expansions
+        self.complete = complete
+        self.stopped = stopped
+
+    def apply(self, state):
+        """
+        This function plays the plan on the game it was computed for.
+
+        :param state: the GameState the plan was computed for
+        """
+        for action, args in self.actions:
+            engine.apply_action(state, action, *args)
+
+
+def snapshot(state):
+    """
+    This function captures everything about a GameState that actions change, as nested tuples.
+
+    :param state: the GameState to capture
+    :return: a tuple of (cash balance, months passed, portfolio totals, companies, offshore companies).
+    The cached figures are captured as they are, so a restored game continues bit for bit like the
+    original one. Products are never changed once added, so the snapshot shares them with the game.
+    """
+    roster = {id(manager): index for index, manager in enumerate(state.management_personnel)}
+    companies = tuple((company.name, company.industry, company.capital, company.revenue, company.profit_margin,
+                       None if company.management is None else roster[id(company.management)], company.offshore_id,
+                       company.monthly_revenue, company.monthly_profit, company.taxed_profit,
+                       tuple(company.products))
+                      for company in state.companies)
+    offshore_companies = tuple((entity.name, entity.location, entity.tax_rate) for entity in state.offshore_companies)
+    totals = (state.total_monthly_revenue, state.total_monthly_profit, state.total_taxed_profit)
+    return state.cash_balance, state.months_passed, totals, companies, offshore_companies
+
+
+def restore(context, node):
+    """
+    This function builds a GameState from a snapshot.
+
+    :param context: a tuple of (player name, difficulty level, business types, management personnel,
+    offshore locations) of the game the snapshot was taken from
+    :param node: a snapshot from snapshot()
+    :return: a new GameState.
+    """
+    player_name, difficulty_level, business_types, management_personnel, offshore_locations = context
+    cash_balance, months_passed, totals, companies, offshore_companies = node
+    state = engine.GameState(player_name, cash_balance, difficulty_level, business_types, management_personnel, offshore_locations)
+    state.months_passed = months_passed
+    state.total_monthly_revenue, state.total_monthly_profit, state.total_taxed_profit = totals
+    state.offshore_companies = [OffshoreEntity(index, name, location, tax_rate)
+                                for index, (name, location, tax_rate) in enumerate(offshore_companies)]
+    for index, (name, industry, capital, revenue, profit_margin, manager_index, offshore_id,
+                company_revenue, company_profit, taxed_profit, products) in enumerate(companies):
+        company = Company(index, name, industry, capital, revenue, profit_margin, offshore_id is not None, offshore_id,
+                          list(products),
+                          None if manager_index is None else management_personnel[manager_index])
+        company.monthly_revenue, company.monthly_profit, company.taxed_profit = company_revenue, company_profit, taxed_profit
+        if offshore_id is not None:
+            state.offshore_companies[offshore_id].companies[index] = company
+        state.companies.append(company)
+    return state
+
+
+def _structure(node):
+    """
+    This function returns the dominance key of a snapshot: its companies and offshore companies
+    without names, ids or order.
+    """
+    _, _, _, companies, offshore_companies = node
+    rates = [tax_rate for _, _, tax_rate in offshore_companies]
+    return (tuple(sorted((industry, capital, revenue, profit_margin, -1 if manager_index is None else manager_index,
+                          offshore_id is not None, 0.0 if offshore_id is None else rates[offshore_id])
+                         for _, industry, capital, revenue, profit_margin, manager_index, offshore_id, _, _, _, _ in companies)),
+            tuple(sorted(rates)))
+
+
+def _node_bytes(node):
+    companies = node[3]
+    return NODE_BYTES + COMPANY_BYTES * len(companies) + PRODUCT_BYTES * sum(len(company[10]) for company in companies)
+
+
+def _moves(state, invested, fractions, max_companies):
+    """
+    This function lists the actions the search tries from a game, as (action name, arguments) pairs,
+    with the pruning described at the top of this file.
+
+    :param invested: the set of (company index, action name) pairs of the products and company actions
+    the plan already made this month
+    """
+    cash = state.cash_balance
+    amounts = sorted({cash * fraction for fraction in fractions if cash * fraction > 0})
+    moves = [('advance_month', ())]
+
+    if len(state.companies) < max_companies:
+        name = f"Company {len(state.companies) + 1}"
+        for business_index, business in enumerate(state.business_types):
+            startup_capital = business['startup_capital']
+            for capital in sorted({startup_capital} | {amount for amount in amounts if amount > startup_capital}):
+                if capital <= cash:
+                    moves.append(('create_company', (business_index, name, capital)))
+
+    lowest = min(state.offshore_companies, key=lambda entity: (entity.tax_rate, entity.id), default=None)
+    lowest_rate = engine.DEFAULT_TAX_RATE if lowest is None or lowest.tax_rate >= engine.DEFAULT_TAX_RATE else lowest.tax_rate
+    best_location = None
+    for location_index, location in enumerate(state.offshore_locations):
+        if location['tax_rate'] < lowest_rate and location['setup_cost'] <= cash:
+            if best_location is None or (location['tax_rate'], location['setup_cost']) < best_location[0]:
+                best_location = ((location['tax_rate'], location['setup_cost']), location_index)
+    if best_location is not None:
+        moves.append(('create_offshore_company', (best_location[1], f"Offshore {len(state.offshore_companies) + 1}")))
+
+    for company in state.companies:
+        if company.management is None:
+            best = None
+            for manager_index, manager in enumerate(state.management_personnel):
+                if manager['salary'] <= company.monthly_profit:
+                    boosted = (1 + manager['revenue_boost']) * (company.profit_margin + manager['profit_margin_boost'])
+                    if best is None or boosted > best[0]:
+                        best = (boosted, manager_index)
+            if best is not None:
+                moves.append(('hire_management', (company.id, best[1])))
+        if not company.offshore and company.taxed_profit > 0 and lowest is not None and lowest.tax_rate < engine.DEFAULT_TAX_RATE:
+            moves.append(('add_company_to_offshore', (lowest.id, company.id)))
+        for amount in amounts:
+            if (company.id, 'add_product') not in invested:
+                moves.append(('add_product', (company.id, f"Product {len(company.products) + 1}", amount)))
+            if company.industry in engine.COMPANY_ACTIONS and (company.id, 'company_action') not in invested:
+                moves.append(('company_action', (company.id, amount)))
+    return moves
+
+
+def _coast(state, target_cash, horizon):
+    """
+    This function advances a game with no more actions until it reaches the target or the horizon.
+
+    :return: the months it took, or None if the target is not reached by the horizon.
+    """
+    if state.cash_balance >= target_cash:
+        return 0
+    if state.total_taxed_profit <= 0 or state.months_passed >= horizon:
+        return None
+    months = engine.advance_months(state, horizon - state.months_passed, target_cash=target_cash)
+    return months if state.cash_balance >= target_cash else None
+
+
+def _path_actions(path):
+    actions = []
+    while path is not None:
+        path, move = path
+        actions.append(move)
+    actions.reverse()
+    return actions
+
+
+class _Search:
+    """
+    The state of one best-first search: its frontier, dominance table, incumbent and budgets.
+    """
+
+    def __init__(self, context, target_cash, horizon, fractions, max_companies, incumbent, deadline, memory_budget, max_expansions):
+        self.context = context
+        self.target_cash = target_cash
+        self.horizon = horizon
+        self.fractions = fractions
+        self.max_companies = max_companies
+        # The best plan so far as (months passed at the target, -cash balance, path), or None.
+        self.incumbent = incumbent
+        self.deadline = deadline
+        self.memory_budget = memory_budget
+        self.max_expansions = max_expansions
+        self.frontier = []
+        self.seen = {}
+        self.memory = 0
+        self.expansions = 0
+        self.pushes = 0
+
+    def _beaten(self, months):
+        # A node below the target at `months` reaches it one month later at the earliest.
+        return self.incumbent is not None and months + 1 >= self.incumbent[0]
+
+    def add(self, node, invested, path):
+        """
+        This function records a new node: it updates the incumbent with the node's coasting plan and
+        queues the node unless it is dominated or cannot beat the incumbent.
+
+        :return: True if the node was queued.
+        """
+        cash_balance, months_passed = node[0], node[1]
+        key = (_structure(node), invested)
+        previous = self.seen.get(key)
+        if previous is not None and previous[0] <= months_passed and previous[1] >= cash_balance:
+            return False
+        self.seen[key] = (months_passed, cash_balance)
+
+        state = restore(self.context, node)
+        coast = _coast(state, self.target_cash, self.horizon)
+        if coast is not None:
+            candidate = (state.months_passed, -state.cash_balance)
+            if self.incumbent is None or candidate < self.incumbent[:2]:
+                tail = (path, ('advance_months', (coast, None, self.target_cash))) if coast else path
+                self.incumbent = candidate + (tail,)
+        if cash_balance >= self.target_cash or months_passed >= self.horizon or self._beaten(months_passed):
+            return False
+        # The coasting month, not limited to the horizon, orders the frontier.
+        cash_flow = node[2][2]
+        estimate = months_passed + (self.target_cash - cash_balance) / cash_flow if cash_flow > 0 else math.inf
+        # Every push stores the node again, even when an earlier entry with the same structure is still
+        # queued.
+        self.memory += _node_bytes(node)
+        self.pushes += 1
+        heapq.heappush(self.frontier, (estimate, -cash_balance, self.pushes, node, invested, path))
+        return True
+
+    def expand(self, node, invested, path):
+        """
+        This function tries every move from a node and adds the resulting nodes.
+
+        :return: the list of (node, invested, path) tuples that were queued.
+        """
+        self.expansions += 1
+        state = restore(self.context, node)
+        children = []
+        for move in _moves(state, invested, self.fractions, self.max_companies):
+            action, args = move
+            child_state = restore(self.context, node)
+            engine.apply_action(child_state, action, *args)
+            child = snapshot(child_state)
+            if action == 'advance_month':
+                child_invested = frozenset()
+            elif action in ('add_product', 'company_action'):
+                child_invested = invested | {(args[0], action)}
+            else:
+                child_invested = invested
+            child_path = (path, move)
+            if self.add(child, child_invested, child_path):
+                children.append((child, child_invested, child_path))
+        return children
+
+    def run(self):
+        """
+        This function expands nodes best first until the frontier is empty or a budget runs out.
+
+        :return: the name of the budget that stopped the search, or None if it ran to the end.
+        """
+        while self.frontier:
+            if self.max_expansions is not None and self.expansions >= self.max_expansions:
+                return 'expansions'
+            if self.memory > self.memory_budget:
+                return 'memory'
+            if self.expansions % CLOCK_INTERVAL == 0 and time.time() > self.deadline:
+                return 'time'
+            _, _, _, node, invested, path = heapq.heappop(self.frontier)
+            if not self._beaten(node[1]):
+                self.expand(node, invested, path)
+        return None
+
+
+# The context of the current worker process, set once by _init_worker.
+_worker_context = None
+
+
+def _init_worker(context):
+    global _worker_context
+    _worker_context = context
+
+
+def _search_task(settings, incumbent, entries, deadline, memory_budget, max_expansions):
+    """
+    This function continues the search from a share of the frontier of the first expansions.
+
+    :param entries: the frontier entries of the task
+    :return: a tuple of (incumbent, expansions, stopped budget or None).
+    """
+    target_cash, horizon, fractions, max_companies = settings
+    search = _Search(_worker_context, target_cash, horizon, fractions, max_companies, incumbent,
+                     deadline, memory_budget, max_expansions)
+    for entry in entries:
+        node, invested = entry[3], entry[4]
+        search.seen[(_structure(node), invested)] = (node[1], node[0])
+        search.memory += _node_bytes(node)
+    search.frontier = list(entries)
+    heapq.heapify(search.frontier)
+    search.pushes = max(entry[2] for entry in entries)
+    stopped = search.run()
+    return search.incumbent, search.expansions, stopped
+
+
+def plan_cash_target(state, target_cash=DEFAULT_TARGET_CASH, max_months=DEFAULT_MAX_MONTHS, time_limit=DEFAULT_TIME_LIMIT,
+                     memory_budget=DEFAULT_MEMORY_BUDGET, max_expansions=None, workers=1, fractions=DEFAULT_FRACTIONS,
+                     max_companies=DEFAULT_MAX_COMPANIES, split_expansions=DEFAULT_SPLIT_EXPANSIONS, tasks=DEFAULT_TASKS):
+    """
+    This function searches for the sequence of actions that reaches a cash balance of `target_cash`
+    in the fewest months, and among those with the most cash, among the moves the search generates.
+    The game passed in is not modified.
+
+    :param state: the GameState to plan for
+    :param target_cash: the cash balance to reach
+    :param max_months: the horizon, in months from now; plans that need longer are not considered
+    :param time_limit: the most seconds the search may run
+    :param memory_budget: the most bytes of stored nodes the search may keep, over all tasks
+    :param max_expansions: if given, the most nodes the search may expand, over all tasks
+    :param workers: the number of worker processes; 1 searches in this process. The plan does not
+    depend on it.
+    :param fractions: the fractions of the cash balance that capital, investments and company actions
+    may spend
+    :param max_companies: the most companies the plan may own, counting the ones it starts with
+    :param split_expansions: the number of nodes expanded in this process before the search is split
+    :param tasks: the number of tasks the rest of the search is split into
+    :return: a Plan.
+    """
+    # The deadline is wall-clock time, so it means the same in every worker process.
+    deadline = time.time() + time_limit
+    context = (state.player_name, state.difficulty_level, state.business_types, state.management_personnel, state.offshore_locations)
+    horizon = state.months_passed + max_months
+    split_at = split_expansions if max_expansions is None else min(split_expansions, max_expansions)
+    search = _Search(context, target_cash, horizon, tuple(fractions), max_companies, None, deadline, memory_budget, split_at)
+    search.add(snapshot(state), frozenset(), None)
+    stopped = search.run()
+    expansions = search.expansions
+
+    if stopped == 'expansions' and (max_expansions is None or max_expansions > split_at):
+        # Deal the frontier out best first, so every task gets some of the most promising nodes.
+        entries = sorted(search.frontier)
+        groups = [entries[i::tasks] for i in range(min(tasks, len(entries)))]
+        settings = (target_cash, horizon, tuple(fractions), max_companies)
+        memory_share = max(0, memory_budget - search.memory) // len(groups)
+        expansion_share = None if max_expansions is None else max(1, (max_expansions - expansions) // len(groups))
+        arguments = [(settings, search.incumbent, group, deadline, memory_share, expansion_share) for group in groups]
+        if workers == 1:
+            _init_worker(context)
+            results = [_search_task(*task) for task in arguments]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(context,)) as executor:
+                results = list(executor.map(_search_task, *zip(*arguments)))
+        # Combine in task order; a task's incumbent is never worse than the one it started with.
+        stopped = None
+        for incumbent, task_expansions, task_stopped in results:
+            expansions += task_expansions
+            stopped = stopped or task_stopped
+            if incumbent is not None and (search.incumbent is None or incumbent[:2] < search.incumbent[:2]):
+                search.incumbent = incumbent
+
+    if search.incumbent is None:
+        return Plan(None, None, None, expansions, stopped is None, stopped)
+    months_passed, negative_cash, path = search.incumbent
+    return Plan(_path_actions(path), months_passed - state.months_passed, -negative_cash, expansions, stopped is None, stopped)
+
+
+def format_plan(plan):
+    """
+    This function formats a Plan as one line per action, followed by a summary line.
+    """
+    if plan.actions is None:
+        return f"No plan reaches the target ({plan.expansions} nodes expanded, {'complete' if plan.complete else 'stopped by ' + plan.stopped})."
+    lines = [f"{i}. {action}{args}" for i, (action, args) in enumerate(plan.actions, 1)]
+    lines.append(f"Reaches ${plan.cash_balance:,.2f} in {plan.months} months ({plan.expansions} nodes expanded, "
+                 f"{'best among the generated moves' if plan.complete else 'stopped by ' + plan.stopped})")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Search for the fastest way to reach a cash balance.")
+    parser.add_argument('--target', type=float, default=DEFAULT_TARGET_CASH)
+    parser.add_argument('--difficulty', type=float, default=1)
+    parser.add_argument('--cash', type=float, default=engine.STARTING_CASH_BALANCE)
+    parser.add_argument('--months', type=int, default=DEFAULT_MAX_MONTHS)
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT)
+    parser.add_argument('--memory-mb', type=float, default=DEFAULT_MEMORY_BUDGET / 2 ** 20)
+    parser.add_argument('--max-expansions', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--max-companies', type=int, default=DEFAULT_MAX_COMPANIES)
+    parser.add_argument('--fractions', type=float, nargs='+', default=DEFAULT_FRACTIONS)
+    args = parser.parse_args()
+    business_types, management_personnel, offshore_locations = catalog.load_catalogs()
+    game = engine.new_game("Planner", args.difficulty, business_types, management_personnel, offshore_locations, cash_balance=args.cash)
+    result = plan_cash_target(game, args.target, args.months, args.time_limit, int(args.memory_mb * 2 ** 20), args.max_expansions,
+                              args.workers, args.fractions, args.max_companies)
+    print(format_plan(result))
@@ -0,0 +1,130 @@
+#Screen rendering for the interactive game.
+#
+#Each screen is built as a list of lines and written to the terminal with a single sys.stdout.write,
+#instead of one print() per row. Lists that can grow with the portfolio (companies, products, the
+#members of an offshore company) are shown one page at a time, and the player information screen
+#summarizes the portfolio: counts per industry and the companies with the highest monthly profit.
+#
+#The row functions use dictionary-style access like main.py, so they work on the records from
+#models.py as well as on plain dictionaries.
+
+import heapq
+import sys
+
+PAGE_SIZE = 20
+TOP_COMPANIES = 10
+
+
+def write_screen(lines):
+    """
+    This function writes a screen to the terminal in one buffered write.
+
+    :param lines: a list of strings, one per line
+    """
+    sys.stdout.write('\n'.join(lines) + '\n')
+    sys.stdout.flush()
+
+
+def page_count(item_count, page_size=PAGE_SIZE):
+    """
+    This function returns the number of pages needed to show `item_count` items, at least 1.
+    """
+    return max(1, -(-item_count // page_size))
+
+
+def page_lines(items, page, format_item, page_size=PAGE_SIZE):
+    """
+    This function renders one page of a numbered list. The numbers continue across pages, so the
+    number shown is always the item's position in the whole list.
+
+    :param items: a sequence of the items to list
+    :param page: the 0-based number of the page to render
+    :param format_item: a function that turns an item into the text of its row
+    :param page_size: the number of items on a page
+    :return: a list of lines, ending with a page footer when the list has more than one page.
+    """
+    start = page * page_size
+    lines = [f"{i}. {format_item(items[i - 1])}" for i in range(start + 1, min(start + page_size, len(items)) + 1)]
+    pages = page_count(len(items), page_size)
+    if pages > 1:
+        lines.append(f"-- Page {page + 1} of {pages} ({len(items)} entries) --")
+    return lines
+
+
+def company_row(company):
+    return f"{company['name']} ({company['industry']})"
+
+
+def product_row(product):
+    return f"{product['name']} - Investment: ${product['investment']}"
+
+
+def offshore_row(offshore_company):
+    return f"{offshore_company['name']} ({offshore_company['location']})"
+
+
+def manager_row(manager):
+    return (f"{manager['name']} (Salary: ${manager['salary']}/month, Revenue Boost: {manager['revenue_boost'] * 100}%, "
+            f"Profit Margin Boost: {manager['profit_margin_boost'] * 100}%)")
+
+
+def location_row(location):
+    return f"{location['name']} (Setup Cost: ${location['setup_cost']},Tax Rate: {location['tax_rate'] * 100}%)"
+
+
+def top_companies(companies, count=TOP_COMPANIES):
+    """
+    This function returns the `count` companies with the highest cached monthly profit, highest first.
+    It keeps a heap of `count` companies instead of sorting the whole portfolio.
+
+    :return: a list of (1-based company number, company) tuples.
+    """
+    return heapq.nlargest(count, enumerate(companies, 1), key=lambda numbered: numbered[1]['monthly_profit'])
+
+
+def player_info_lines(state, top=TOP_COMPANIES):
+    """
+    This function renders the player information screen. Portfolios of up to `top` companies are
+    listed in full; larger ones are summarized by the number of companies per industry and the `top`
+    companies by monthly profit.
+
+    :param state: the engine.GameState of the current game. Monthly figures are read from the figures
+    the engine caches per company and for the whole portfolio, and profits are shown scaled by its
+    difficulty level.
+    :param top: the number of companies and offshore companies listed on the screen
+    :return: a list of lines.
+    """
+    lines = [f"\nMonths passed: {state.months_passed}",
+             "\nPlayer Information:",
+             f"Name: {state.player_name}",
+             f"Cash Balance: ${state.cash_balance}",
+             f"Total Monthly Revenue: ${state.total_monthly_revenue}, Total Monthly Profit: ${state.total_monthly_profit * state.difficulty_level}"]
+
+    companies = state.companies
+    if len(companies) == 0:
+        lines += ["Companies:", "None"]
+    else:
+        if len(companies) <= top:
+            lines.append("Companies:")
+            ranked = enumerate(companies, 1)
+        else:
+            counts = {}
+            for company in companies:
+                counts[company['industry']] = counts.get(company['industry'], 0) + 1
+            lines.append(f"Companies: {len(companies)} ({', '.join(f'{industry}: {count}' for industry, count in sorted(counts.items()))})")
+            lines.append(f"Top {top} by monthly profit:")
+            ranked = top_companies(companies, top)
+        for i, company in ranked:
+            management = company['management']['name'] if 'management' in company else 'None'
+            lines.append(f"{i}. {company_row(company)} - Management: {management}, Monthly Revenue: ${company['monthly_revenue']}, "
+                         f"Monthly Profit: ${company['monthly_profit'] * state.difficulty_level}")
+
+    offshore_companies = state.offshore_companies
+    if len(offshore_companies) == 0:
+        lines += ["Offshore Companies:", "None"]
+    else:
+        lines.append("Offshore Companies:" if len(offshore_companies) <= top else f"Offshore Companies: {len(offshore_companies)}, first {top}:")
+        for i in range(min(top, len(offshore_companies))):
+            offshore_company = offshore_companies[i]
+            lines.append(f"{i + 1}. {offshore_row(offshore_company)} - {len(offshore_company['companies'])} companies")
+    return lines
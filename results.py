@@ -0,0 +1,288 @@
+#Local store of finished games and simulation runs, for leaderboards and aggregates across runs.
+#
+#A ResultsStore is an SQLite database with one row per run: who played it ('player'), where it came
+#from ('source': 'game' for the interactive game, 'montecarlo:<strategy>' for scripted runs), the
+#difficulty level, the final cash balance, the months played, how it ended ('outcome'), the size of the
+#portfolio, its monthly cash flow and its composition (the number of companies per industry, as JSON).
+#
+#Rows are written in batches: record() and add() buffer them and flush() inserts the buffer with one
+#executemany in one transaction, so a batch costs one commit whatever its size. The database is in WAL
+#mode with synchronous=NORMAL, so readers never wait for the writer and a commit does not sync the disk.
+#Several processes can write to the same file; each transaction starts with BEGIN IMMEDIATE and waits
+#up to `timeout` seconds for the write lock. A transaction is one batch, so the lock is taken once per
+#batch_size runs and held only while the batch is written, never while a run is played.
+#
+#Indexes on (difficulty, final_cash), (player, final_cash), final_cash and months let the leaderboards
+#(top N by final cash, overall, per difficulty or per player), rank() and percentile() read a few
+#index entries instead of the table. The per-difficulty aggregates come from a second table,
+#run_totals, with one row per (source, difficulty, outcome) that every batch updates in the same
+#transaction as its inserts, so aggregates() reads a handful of rows however many runs are stored.
+#
+#Runs are only ever added; nothing in the game deletes or changes them.
+
+import json
+import math
+import sqlite3
+import time
+
+DEFAULT_BATCH_SIZE = 1000
+# How long a writer waits for another process's transaction before giving up, in seconds.
+DEFAULT_TIMEOUT = 60.0
+
+RUN_COLUMNS = ('recorded_at', 'source', 'player', 'difficulty', 'final_cash', 'months', 'outcome',
+               'companies', 'offshore_companies', 'products', 'monthly_cash_flow', 'composition')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    recorded_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    player TEXT NOT NULL,
+    difficulty REAL NOT NULL,
+    final_cash REAL NOT NULL,
+    months INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    companies INTEGER NOT NULL,
+    offshore_companies INTEGER NOT NULL,
+    products INTEGER NOT NULL,
+    monthly_cash_flow REAL NOT NULL,
+    composition TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_difficulty_cash ON runs (difficulty, final_cash DESC);
+CREATE INDEX IF NOT EXISTS runs_player_cash ON runs (player, final_cash DESC);
+CREATE INDEX IF NOT EXISTS runs_cash ON runs (final_cash DESC);
+CREATE INDEX IF NOT EXISTS runs_months ON runs (months);
+CREATE TABLE IF NOT EXISTS run_totals (
+    source TEXT NOT NULL,
+    difficulty REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    cash_sum REAL NOT NULL,
+    cash_min REAL NOT NULL,
+    cash_max REAL NOT NULL,
+    months_sum INTEGER NOT NULL,
+    PRIMARY KEY (source, difficulty, outcome)
+);
+"""
+
+_INSERT_RUN = f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})"
+_ADD_TOTALS = """
+INSERT INTO run_totals (source, difficulty, outcome, runs, cash_sum, cash_min, cash_max, months_sum)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (source, difficulty, outcome) DO UPDATE SET
+    runs = runs + excluded.runs,
+    cash_sum = cash_sum + excluded.cash_sum,
+    cash_min = min(cash_min, excluded.cash_min),
+    cash_max = max(cash_max, excluded.cash_max),
+    months_sum = months_sum + excluded.months_sum
+"""
+AGGREGATE_GROUPS = ('difficulty', 'source', 'outcome')
+
+
+def run_row(state, outcome, source='game', recorded_at=None):
+    """
+    This function describes a finished game as a row of the runs table.
+
+    :param state: the GameState at the end of the run
+    :param outcome: how the run ended, e.g. 'quit', 'bankrupt', 'target' or 'horizon'
+    :param source: where the run comes from, e.g. 'game' or 'montecarlo:expansion'
+    :param recorded_at: the time of the run as a Unix timestamp; defaults to now
+    :return: a tuple with one value per name in RUN_COLUMNS.
+    """
+    composition = {}
+    products = 0
+    for company in state.companies:
+        composition[company.industry] = composition.get(company.industry, 0) + 1
+        products += len(company.products)
+    return (time.time() if recorded_at is None else recorded_at, source, state.player_name, float(state.difficulty_level),
+            float(state.cash_balance), state.months_passed, outcome, len(state.companies), len(state.offshore_companies),
+            products, float(state.total_taxed_profit), json.dumps(composition, sort_keys=True, separators=(',', ':')))
+
+
+class ResultsStore:
+    """
+    An SQLite database of finished runs, written in batches.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, timeout=DEFAULT_TIMEOUT):
+        """
+        :param path: the database file; it is created with its tables and indexes if it does not exist
+        :param batch_size: the number of buffered rows that makes add() flush
+        :param timeout: how long to wait for another process's write transaction, in seconds
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+        # Autocommit mode: the transactions are opened and committed explicitly by _transaction().
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        def create(cursor):
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    cursor.execute(statement)
+
+        self._transaction(create)
+
+    def _transaction(self, body):
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            body(cursor)
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record(self, state, outcome, source='game'):
+        """
+        This function adds a finished game to the store (see run_row and add).
+        """
+        self.add(run_row(state, outcome, source))
+
+    def add(self, row):
+        """
+        This function buffers a row from run_row, and writes the buffer once it holds batch_size rows.
+        """
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, rows):
+        """
+        This function buffers rows from run_row, writing full batches as it goes.
+        """
+        for row in rows:
+            self.add(row)
+
+    def flush(self):
+        """
+        This function writes the buffered rows, and their contribution to run_totals, in one transaction.
+        """
+        if not self.pending:
+            return
+        totals = {}
+        for row in self.pending:
+            key = (row[1], row[3], row[6])
+            final_cash, months = row[4], row[5]
+            group = totals.get(key)
+            if group is None:
+                totals[key] = [1, final_cash, final_cash, final_cash, months]
+            else:
+                group[0] += 1
+                group[1] += final_cash
+                group[2] = min(group[2], final_cash)
+                group[3] = max(group[3], final_cash)
+                group[4] += months
+        rows = self.pending
+
+        def write(cursor):
+            cursor.executemany(_INSERT_RUN, rows)
+            cursor.executemany(_ADD_TOTALS, [key + tuple(group) for key, group in totals.items()])
+
+        self._transaction(write)
+        self.pending = []
+
+    def close(self):
+        """
+        This function writes the buffered rows and closes the database.
+        """
+        if self.connection is None:
+            return
+        try:
+            self.flush()
+            self.connection.execute("PRAGMA optimize")
+        finally:
+            self.connection.close()
+            self.connection = None
+
+    def __len__(self):
+        return self.connection.execute("SELECT coalesce(sum(runs), 0) FROM run_totals").fetchone()[0]
+
+    @staticmethod
+    def _where(difficulty=None, player=None):
+        conditions, values = [], []
+        if difficulty is not None:
+            conditions.append("difficulty = ?")
+            values.append(float(difficulty))
+        if player is not None:
+            conditions.append("player = ?")
+            values.append(player)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), values
+
+    def leaderboard(self, count=10, difficulty=None, player=None):
+        """
+        This function returns the runs with the highest final cash.
+
+        :param count: the number of runs to return
+        :param difficulty: only consider runs at this difficulty level
+        :param player: only consider this player's runs
+        :return: a list of (id, player, difficulty, final cash, months, outcome) tuples, best first.
+        """
+        where, values = self._where(difficulty, player)
+        return self.connection.execute(
+            f"SELECT id, player, difficulty, final_cash, months, outcome FROM runs{where} ORDER BY final_cash DESC, id LIMIT ?",
+            values + [count]).fetchall()
+
+    def rank(self, final_cash, difficulty=None):
+        """
+        This function returns the place a final cash balance takes on the leaderboard: 1 plus the number
+        of runs that ended with more.
+        """
+        where, values = self._where(difficulty)
+        where += (" AND " if where else " WHERE ") + "final_cash > ?"
+        return self.connection.execute(f"SELECT count(*) FROM runs{where}", values + [final_cash]).fetchone()[0] + 1
+
+    def percentile(self, percent, difficulty=None):
+        """
+        This function returns a percentile of the final cash (the value at that rank, without
+        interpolation), or None without runs.
+
+        :param percent: the percentile, between 0 and 100
+        :param difficulty: only consider runs at this difficulty level
+        """
+        where, values = self._where(difficulty)
+        runs = self.connection.execute(f"SELECT count(*) FROM runs{where}", values).fetchone()[0]
+        if runs == 0:
+            return None
+        # Ranks from the top, so the walk follows the descending indexes.
+        offset = runs - 1 - math.floor(percent / 100 * (runs - 1))
+        return self.connection.execute(f"SELECT final_cash FROM runs{where} ORDER BY final_cash DESC LIMIT 1 OFFSET ?",
+                                       values + [offset]).fetchone()[0]
+
+    def aggregates(self, group_by='difficulty'):
+        """
+        This function summarises every stored run per difficulty level, source or outcome.
+
+        :param group_by: 'difficulty', 'source' or 'outcome'
+        :return: a dictionary mapping each value of `group_by` to a dictionary with the keys 'runs',
+        'bankrupt', 'target', 'mean_cash', 'min_cash', 'max_cash' and 'mean_months'.
+        """
+        if group_by not in AGGREGATE_GROUPS:
+            raise ValueError(f"Cannot group runs by {group_by!r}; use one of {', '.join(AGGREGATE_GROUPS)}")
+        rows = self.connection.execute(
+            f"SELECT {group_by}, sum(runs), sum(CASE WHEN outcome = 'bankrupt' THEN runs ELSE 0 END), "
+            f"sum(CASE WHEN outcome = 'target' THEN runs ELSE 0 END), sum(cash_sum), min(cash_min), max(cash_max), "
+            f"sum(months_sum) FROM run_totals GROUP BY {group_by} ORDER BY {group_by}")
+        return {key: {'runs': runs, 'bankrupt': bankrupt, 'target': target, 'mean_cash': cash_sum / runs,
+                      'min_cash': cash_min, 'max_cash': cash_max, 'mean_months': months_sum / runs}
+                for key, runs, bankrupt, target, cash_sum, cash_min, cash_max, months_sum in rows}
+
+    def player_summary(self, player):
+        """
+        This function summarises one player's runs: the number of runs, their best, mean and worst final
+        cash and their mean number of months, or None if the player has no runs.
+        """
+        runs, best, mean, worst, months = self.connection.execute(
+            "SELECT count(*), max(final_cash), avg(final_cash), min(final_cash), avg(months) FROM runs WHERE player = ?",
+            (player,)).fetchone()
+        if runs == 0:
+            return None
+        return {'runs': runs, 'best_cash': best, 'mean_cash': mean, 'worst_cash': worst, 'mean_months': months}
@@ -0,0 +1,368 @@
+#Binary save games in a columnar, memory-mappable format.
+#
+#A save file is laid out as:
+#
+#    magic (8 bytes) | header length (8 bytes, little-endian) | header (UTF-8 JSON) | columns
+#
+#The header holds the scalar game state, the catalogs, the offshore companies and a directory of the
+#columns. Every column starts on an 8-byte boundary and is a flat native array (the `array` module's
+#typecodes), one entry per company, per product or per offshore member:
+#
+#  - company numbers (capital, revenue, profit_margin and the cached monthly figures), the offshore id
+#    and manager index (-1 for none), and the industry as an index into the header's industry table
+#  - company and product names as offsets into a UTF-8 blob
+#  - products as a per-company offset column into the product columns
+#  - offshore membership as a per-offshore-company offset column into a column of member ids, in the
+#    order the companies were added
+#
+#Numeric columns whose values are all ints are stored as int64 so they come back as ints. Mixed
+#columns are stored as float64 with a companion '<name>.is_int' byte column, so every value
+#round-trips exactly.
+#
+#open_save() maps the file and only parses the header, so opening even a million-company save is
+#near-instant; columns are zero-copy memoryviews (or NumPy arrays) over the mapping and companies are
+#materialised on demand. load_game() builds the full GameState.
+
+import array
+import json
+import mmap
+import sys
+
+import engine
+from models import Company, OffshoreEntity, Product
+
+MAGIC = b'BTSAVE01'
+ALIGNMENT = 8
+
+COMPANY_NUMBERS = ('capital', 'revenue', 'profit_margin', 'monthly_revenue', 'monthly_profit', 'taxed_profit')
+PRODUCT_NUMBERS = ('investment', 'revenue')
+
+
+class SaveError(ValueError):
+    """
+    Raised when a file is not a save game this module can read.
+    """
+
+
+def _numeric_columns(name, values):
+    """
+    This function encodes a list of numbers as one or two columns that decode to exactly the same
+    values and types.
+
+    :return: a list of (column name, array) pairs.
+    """
+    if all(type(value) is int for value in values):
+        try:
+            return [(name, array.array('q', values))]
+        except OverflowError:
+            pass
+    columns = [(name, array.array('d', values))]
+    if any(type(value) is not float for value in values):
+        columns.append((name + '.is_int', array.array('B', [type(value) is int for value in values])))
+    return columns
+
+
+def _string_columns(name, strings):
+    """
+    This function encodes a list of strings as an offsets column and a UTF-8 data column.
+    """
+    data = bytearray()
+    offsets = array.array('q', [0])
+    for string in strings:
+        data += string.encode('utf-8')
+        offsets.append(len(data))
+    return [(name + '.offsets', offsets), (name + '.data', array.array('B', bytes(data)))]
+
+
+def _index_of(item, items, positions):
+    """
+    This function returns the index of `item` in `items`, appending it if it is not there. `positions`
+    maps id() of the items already indexed to their index.
+    """
+    if item is None:
+        return -1
+    index = positions.get(id(item))
+    if index is None:
+        index = len(items)
+        items.append(item)
+        positions[id(item)] = index
+    return index
+
+
+def save_game(state, path):
+    """
+    This function writes a GameState to a binary save file.
+
+    :param state: the GameState to save
+    :param path: the path of the file to write
+    :return: the number of bytes written.
+    """
+    companies = state.companies
+    managers = list(state.management_personnel)
+    manager_positions = {id(manager): index for index, manager in enumerate(managers)}
+    industries = []
+    industry_positions = {}
+    products = [product for company in companies for product in company.products]
+
+    columns = []
+    columns += _string_columns('company.name', [company.name for company in companies])
+    industry_index = array.array('i')
+    for company in companies:
+        index = industry_positions.get(company.industry)
+        if index is None:
+            index = industry_positions[company.industry] = len(industries)
+            industries.append(company.industry)
+        industry_index.append(index)
+    columns.append(('company.industry', industry_index))
+    for field in COMPANY_NUMBERS:
+        columns += _numeric_columns('company.' + field, [getattr(company, field) for company in companies])
+    columns.append(('company.offshore_id', array.array('q', [-1 if company.offshore_id is None else company.offshore_id for company in companies])))
+    columns.append(('company.management', array.array('q', [_index_of(company.management, managers, manager_positions) for company in companies])))
+    product_offsets = array.array('q', [0])
+    for company in companies:
+        product_offsets.append(product_offsets[-1] + len(company.products))
+    columns.append(('company.products', product_offsets))
+    columns += _string_columns('product.name', [product.name for product in products])
+    for field in PRODUCT_NUMBERS:
+        columns += _numeric_columns('product.' + field, [getattr(product, field) for product in products])
+    member_offsets = array.array('q', [0])
+    member_ids = array.array('q')
+    for offshore_company in state.offshore_companies:
+        member_ids.extend(offshore_company.companies)
+        member_offsets.append(len(member_ids))
+    columns.append(('offshore.member_offsets', member_offsets))
+    columns.append(('offshore.member_ids', member_ids))
+
+    header = {
+        'version': 1,
+        'byteorder': sys.byteorder,
+        'player_name': state.player_name,
+        'cash_balance': state.cash_balance,
+        'difficulty_level': state.difficulty_level,
+        'months_passed': state.months_passed,
+        'totals': [state.total_monthly_revenue, state.total_monthly_profit, state.total_taxed_profit],
+        'business_types': list(state.business_types),
+        'management_personnel': managers[:len(state.management_personnel)],
+        'offshore_locations': list(state.offshore_locations),
+        'managers': managers[len(state.management_personnel):],
+        'industries': industries,
+        'offshore_companies': [{'name': offshore_company.name, 'location': offshore_company.location, 'tax_rate': offshore_company.tax_rate}
+                               for offshore_company in state.offshore_companies],
+        'company_count': len(companies),
+        'product_count': len(products),
+        'columns': {},
+    }
+    # Column offsets depend on the header length, and the header holds the offsets; lay the columns out
+    # relative to the start of the column area, then place that area after the padded header.
+    position = 0
+    for name, values in columns:
+        header['columns'][name] = [position, values.typecode, len(values)]
+        position += -(-len(values) * values.itemsize // ALIGNMENT) * ALIGNMENT
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    header_bytes += b' ' * (data_start - len(MAGIC) - 8 - len(header_bytes))
+
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(header_bytes).to_bytes(8, 'little'))
+        file.write(header_bytes)
+        for name, values in columns:
+            raw = values.tobytes()
+            file.write(raw)
+            file.write(b'\0' * (-len(raw) % ALIGNMENT))
+        return file.tell()
+
+
+class SaveFile:
+    """
+    A save file opened for lazy reading. Only the header is parsed; columns are views over a memory
+    mapping of the file. Release any views returned by column() before calling close().
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SaveError(f"{path} is empty") from None
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise SaveError(f"{path} is not a Business Tycoon save file")
+        header_length = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 8], 'little')
+        self._data_start = len(MAGIC) + 8 + header_length
+        self.header = json.loads(self._mmap[len(MAGIC) + 8:self._data_start])
+        if self.header['byteorder'] != sys.byteorder:
+            self.close()
+            raise SaveError(f"{path} was written on a {self.header['byteorder']}-endian machine")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        This function unmaps and closes the file.
+        """
+        self._mmap.close()
+        self._file.close()
+
+    def __len__(self):
+        return self.header['company_count']
+
+    def has_column(self, name):
+        return name in self.header['columns']
+
+    def column(self, name):
+        """
+        This function returns a column as a zero-copy memoryview over the file.
+
+        :param name: the name of the column, e.g. 'company.revenue'
+        :return: a memoryview with the column's typecode as its format.
+        """
+        offset, typecode, length = self.header['columns'][name]
+        start = self._data_start + offset
+        view = memoryview(self._mmap)[start:start + length * array.array(typecode).itemsize]
+        return view.cast(typecode)
+
+    def numpy_column(self, name):
+        """
+        This function returns a column as a read-only NumPy array over the file. Requires NumPy.
+        """
+        import numpy as np
+        offset, typecode, length = self.header['columns'][name]
+        return np.frombuffer(self._mmap, dtype=np.dtype(typecode), count=length, offset=self._data_start + offset)
+
+    def _numbers(self, name, start=0, stop=None):
+        """
+        This function decodes a numeric column (or part of it) to a list of ints and floats.
+        """
+        with self.column(name) as view:
+            values = view[start:stop].tolist()
+        if self.has_column(name + '.is_int'):
+            with self.column(name + '.is_int') as view:
+                flags = view[start:stop].tolist()
+            values = [int(value) if flag else value for value, flag in zip(values, flags)]
+        return values
+
+    def _strings(self, name, start=0, stop=None):
+        """
+        This function decodes a string column (or part of it) to a list of strings.
+        """
+        with self.column(name + '.offsets') as view:
+            offsets = view[start:(stop + 1 if stop is not None else None)].tolist()
+        with self.column(name + '.data') as view:
+            raw = view[offsets[0]:offsets[-1]].tobytes()
+        base = offsets[0]
+        return [raw[offsets[i] - base:offsets[i + 1] - base].decode('utf-8') for i in range(len(offsets) - 1)]
+
+    def _managers(self):
+        return self.header['management_personnel'] + self.header['managers']
+
+    def companies(self, start=0, stop=None):
+        """
+        This function materialises a range of companies with their products. Membership of offshore
+        companies is not filled in; use load_game for a complete GameState.
+
+        :param start: the index of the first company
+        :param stop: the index after the last company, or None for the end
+        :return: a list of Company records.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return []
+        names = self._strings('company.name', start, stop)
+        numbers = {field: self._numbers('company.' + field, start, stop) for field in COMPANY_NUMBERS}
+        with self.column('company.industry') as view:
+            industries = view[start:stop].tolist()
+        with self.column('company.offshore_id') as view:
+            offshore_ids = view[start:stop].tolist()
+        with self.column('company.management') as view:
+            management = view[start:stop].tolist()
+        with self.column('company.products') as view:
+            product_offsets = view[start:stop + 1].tolist()
+        first_product, last_product = product_offsets[0], product_offsets[-1]
+        product_names = self._strings('product.name', first_product, last_product)
+        product_numbers = {field: self._numbers('product.' + field, first_product, last_product) for field in PRODUCT_NUMBERS}
+        products = [Product(name, investment, revenue) for name, investment, revenue
+                    in zip(product_names, product_numbers['investment'], product_numbers['revenue'])]
+
+        industry_table = self.header['industries']
+        managers = self._managers()
+        result = []
+        for i in range(stop - start):
+            offshore_id = offshore_ids[i]
+            company = Company(start + i, names[i], industry_table[industries[i]], numbers['capital'][i], numbers['revenue'][i], numbers['profit_margin'][i],
+                              offshore=offshore_id >= 0, offshore_id=offshore_id if offshore_id >= 0 else None,
+                              products=products[product_offsets[i] - first_product:product_offsets[i + 1] - first_product],
+                              management=managers[management[i]] if management[i] >= 0 else None)
+            company.monthly_revenue = numbers['monthly_revenue'][i]
+            company.monthly_profit = numbers['monthly_profit'][i]
+            company.taxed_profit = numbers['taxed_profit'][i]
+            result.append(company)
+        return result
+
+    def company(self, index):
+        """
+        This function materialises a single company with its products.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.companies(index, index + 1)[0]
+
+    def portfolio_arrays(self):
+        """
+        This function builds a vectorized.PortfolioArrays straight from the memory-mapped columns,
+        without materialising any company. Requires NumPy.
+        """
+        import numpy as np
+        from vectorized import PortfolioArrays
+        offshore_rates = np.array([offshore['tax_rate'] for offshore in self.header['offshore_companies']] + [engine.DEFAULT_TAX_RATE], dtype=np.float64)
+        # Companies outside any offshore company have offshore id -1, which picks the default rate
+        # appended at the end.
+        tax_rate = offshore_rates[self.numpy_column('company.offshore_id')]
+        return PortfolioArrays(self.numpy_column('company.revenue'), self.numpy_column('company.capital'),
+                               self.numpy_column('company.profit_margin'), tax_rate,
+                               np.full(len(self), engine.OPERATING_COST_RATE, dtype=np.float64))
+
+    def to_state(self):
+        """
+        This function builds the complete GameState stored in the file.
+        """
+        header = self.header
+        state = engine.GameState(header['player_name'], header['cash_balance'], header['difficulty_level'],
+                                 header['business_types'], header['management_personnel'], header['offshore_locations'])
+        state.months_passed = header['months_passed']
+        state.total_monthly_revenue, state.total_monthly_profit, state.total_taxed_profit = header['totals']
+        state.companies = self.companies()
+        with self.column('offshore.member_offsets') as view:
+            member_offsets = view.tolist()
+        with self.column('offshore.member_ids') as view:
+            member_ids = view.tolist()
+        for index, offshore in enumerate(header['offshore_companies']):
+            members = {company_id: state.companies[company_id] for company_id in member_ids[member_offsets[index]:member_offsets[index + 1]]}
+            state.offshore_companies.append(OffshoreEntity(index, offshore['name'], offshore['location'], offshore['tax_rate'], members))
+        return state
+
+
+def open_save(path):
+    """
+    This function opens a save file for lazy, memory-mapped reading.
+
+    :param path: the path of the save file
+    :return: a SaveFile; use it as a context manager or call close() when done.
+    """
+    return SaveFile(path)
+
+
+def load_game(path):
+    """
+    This function loads the complete GameState from a save file.
+
+    :param path: the path of the save file
+    :return: the GameState that was saved.
+    """
+    with open_save(path) as save:
+        return save.to_state()
@@ -0,0 +1,194 @@
+#What-if sensitivity sweeps of a portfolio's monthly cash flow.
+#
+#The monthly cash flow is a sum over companies of ((profit * difficulty) - capital * operating cost
+#rate) * (1 - tax rate), where the profit (revenue times capital times profit margin) is fixed by the
+#portfolio and the other factors are parameters of the game: the difficulty multiplier, the operating
+#cost rate (5% of capital), the default tax rate (15%) and the tax rate of each offshore location. The
+#companies that pay the same tax rate can be summed first, so the cash flow is
+#
+#    sum over tax groups g of (profit_g * difficulty - capital_g * operating_cost_rate) * (1 - tax_rate_g)
+#
+#with one group for the companies outside offshore companies and one per offshore location in use.
+#sweep() computes the per-group sums once (np.bincount over the companies) and then evaluates every
+#combination of a parameter grid in one broadcast NumPy computation: one axis per parameter, one term
+#per tax group added into the result cube in place. A grid of 10^5 or 10^6 points is a few
+#milliseconds and one float64 array, with no Python object per point.
+#
+#The SweepResult holds the cube and its axes, and reduces it: argmax/argmin give the best and worst
+#combination, percentile and reduce summarise over some axes and keep the others.
+#
+#NumPy is optional: the game keeps working without it, only this module needs it.
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+import engine
+
+DIFFICULTY_AXIS = 'difficulty_level'
+DEFAULT_TAX_AXIS = 'default_tax_rate'
+OPERATING_COST_AXIS = 'operating_cost_rate'
+# The axis of an offshore location's tax rate is named 'tax_rate:' followed by the location's name.
+LOCATION_AXIS_PREFIX = 'tax_rate:'
+
+
+def require_numpy():
+    """
+    This function raises an error if NumPy is not installed.
+    """
+    if np is None:
+        raise ImportError("Sensitivity sweeps require NumPy. Install it with 'pip install numpy'.")
+
+
+class SweepResult:
+    """
+    The monthly cash flow of a portfolio at every point of a parameter grid.
+    """
+
+    __slots__ = ('axes', 'values', 'cash_flow')
+
+    def __init__(self, axes, values, cash_flow):
+        """
+        :param axes: the names of the parameters, one per dimension of the cube
+        :param values: the values of each parameter, as float64 arrays in the order of `axes`
+        :param cash_flow: the cube, a float64 array with one dimension per axis
+        """
+        self.axes = tuple(axes)
+        self.values = tuple(values)
+        self.cash_flow = cash_flow
+
+    def __len__(self):
+        return self.cash_flow.size
+
+    def parameters(self, index):
+        """
+        This function returns the parameters of one point of the grid.
+
+        :param index: a tuple with one position per axis
+        :return: a dictionary mapping each axis to its value at that point.
+        """
+        return {axis: float(values[position]) for axis, values, position in zip(self.axes, self.values, index)}
+
+    def _extreme(self, flat_index):
+        index = np.unravel_index(flat_index, self.cash_flow.shape)
+        parameters = self.parameters(index)
+        parameters['monthly_cash_flow'] = float(self.cash_flow[index])
+        return parameters
+
+    def argmax(self):
+        """
+        This function returns the parameters with the highest monthly cash flow, and that cash flow
+        under the key 'monthly_cash_flow'.
+        """
+        return self._extreme(int(np.argmax(self.cash_flow)))
+
+    def argmin(self):
+        """
+        This function returns the parameters with the lowest monthly cash flow, like argmax.
+        """
+        return self._extreme(int(np.argmin(self.cash_flow)))
+
+    def _other_axes(self, keep):
+        unknown = set(keep) - set(self.axes)
+        if unknown:
+            raise ValueError(f"Unknown axes: {', '.join(sorted(unknown))}")
+        return tuple(position for position, axis in enumerate(self.axes) if axis not in keep)
+
+    def reduce(self, function, keep=()):
+        """
+        This function summarises the cube over every axis not in `keep`.
+
+        :param function: a NumPy reduction that takes an `axis` argument, e.g. np.mean or np.min
+        :param keep: the names of the axes to keep
+        :return: an array with one dimension per kept axis, in the order of self.axes.
+        """
+        return function(self.cash_flow, axis=self._other_axes(keep))
+
+    def percentile(self, percent, keep=()):
+        """
+        This function returns a percentile of the monthly cash flow over every axis not in `keep`.
+
+        :param percent: the percentile, between 0 and 100
+        :param keep: the names of the axes to keep
+        :return: an array with one dimension per kept axis, or a float if none is kept.
+        """
+        result = np.percentile(self.cash_flow, percent, axis=self._other_axes(keep))
+        return float(result) if np.ndim(result) == 0 else result
+
+
+def tax_groups(state):
+    """
+    This function sums the portfolio per tax group: the companies outside offshore companies (group 0)
+    and the companies of each offshore location in use (groups 1, 2, ...).
+
+    :param state: the GameState to read
+    :return: a tuple of (location names of groups 1, 2, ..., their current tax rates, the unscaled
+    monthly profit per group, the capital per group).
+    """
+    require_numpy()
+    locations = []
+    location_groups = {}
+    location_rates = []
+    entity_groups = []
+    for offshore_company in state.offshore_companies:
+        group = location_groups.get(offshore_company.location)
+        if group is None:
+            group = location_groups[offshore_company.location] = len(locations) + 1
+            locations.append(offshore_company.location)
+            location_rates.append(offshore_company.tax_rate)
+        entity_groups.append(group)
+    companies = state.companies
+    count = len(companies)
+    groups = np.fromiter((entity_groups[company.offshore_id] if company.offshore else 0 for company in companies), dtype=np.intp, count=count)
+    profit = np.fromiter((company.monthly_profit for company in companies), dtype=np.float64, count=count)
+    capital = np.fromiter((company.capital for company in companies), dtype=np.float64, count=count)
+    group_count = len(locations) + 1
+    return (locations, location_rates, np.bincount(groups, weights=profit, minlength=group_count),
+            np.bincount(groups, weights=capital, minlength=group_count))
+
+
+def sweep(state, difficulty_levels=None, default_tax_rates=None, operating_cost_rates=None, location_tax_rates=None):
+    """
+    This function evaluates the monthly cash flow of a portfolio at every combination of the given
+    parameter values. A parameter that is not given stays at the game's current value, on an axis of
+    length 1.
+
+    :param state: the GameState whose portfolio is evaluated; it is not modified
+    :param difficulty_levels: the difficulty multipliers to try
+    :param default_tax_rates: the tax rates to try for companies outside offshore companies
+    :param operating_cost_rates: the operating costs to try, as a fraction of capital
+    :param location_tax_rates: a dictionary mapping offshore location names to the tax rates to try for
+    the companies there. Locations without offshore members do not change the cash flow.
+    :return: a SweepResult whose axes are the difficulty level, the default tax rate, the operating cost
+    rate and then the tax rate of every offshore location in use, in the order of the offshore companies.
+    """
+    locations, location_rates, profit, capital = tax_groups(state)
+    location_tax_rates = location_tax_rates or {}
+    unknown = set(location_tax_rates) - set(locations)
+    if unknown:
+        raise ValueError(f"No offshore company is in: {', '.join(sorted(unknown))}")
+
+    def axis(values, current):
+        return np.asarray([current] if values is None else values, dtype=np.float64).ravel()
+
+    axes = [DIFFICULTY_AXIS, DEFAULT_TAX_AXIS, OPERATING_COST_AXIS] + [LOCATION_AXIS_PREFIX + location for location in locations]
+    values = [axis(difficulty_levels, state.difficulty_level), axis(default_tax_rates, engine.DEFAULT_TAX_RATE),
+              axis(operating_cost_rates, engine.OPERATING_COST_RATE)]
+    values += [axis(location_tax_rates.get(location), rate) for location, rate in zip(locations, location_rates)]
+    dimensions = len(axes)
+
+    def along(position, array):
+        # The array as a view that broadcasts along dimension `position` of the cube.
+        shape = [1] * dimensions
+        shape[position] = len(array)
+        return array.reshape(shape)
+
+    difficulty = along(0, values[0])
+    operating_cost = along(2, values[2])
+    cash_flow = np.zeros(tuple(len(axis_values) for axis_values in values), dtype=np.float64)
+    for group in range(len(profit)):
+        # Group 0 pays the default tax rate (axis 1); group g > 0 pays its location's (axis g + 2).
+        tax_rate = along(1 if group == 0 else group + 2, values[1 if group == 0 else group + 2])
+        cash_flow += (profit[group] * difficulty - capital[group] * operating_cost) * (1 - tax_rate)
+    return SweepResult(axes, values, cash_flow)
@@ -0,0 +1,293 @@
+#Multi-session game server: many independent games in one process, over a line-based TCP protocol.
+#
+#Every connection is one session with its own GameState. The client sends one JSON object per line and
+#gets one JSON object per line back, in order:
+#
+#    {"action": "new_game", "args": ["Alice", 0.75]}
+#    {"ok": true, "result": null, "cash_balance": 5000.0, "months_passed": 0, "companies": 0, "monthly_cash_flow": 0.0}
+#    {"action": "create_company", "args": [2, "Shop", 1000]}
+#    {"ok": true, "result": {"id": 0, "name": "Shop"}, "cash_balance": 4000.0, ...}
+#    {"action": "hire_management", "args": [0, 9]}
+#    {"ok": false, "error": "Invalid manager. Please try again."}
+#
+#The actions are the ones in engine.ACTIONS, with the same arguments after the state, plus "new_game"
+#(player name, difficulty level), which starts or restarts the session's game, "status" and "quit".
+#Every reply carries the session's cash balance, months passed, number of companies and monthly cash
+#flow. Invalid actions, including arguments of the wrong type or shape, are answered with the engine's
+#message: the engine checks its arguments before it changes anything and raises ActionError, so a
+#refused action leaves the game as it was. A request with the wrong number of arguments is answered with
+#"Invalid arguments" before the engine is called.
+#
+#A request may advance at most MAX_MONTHS months and carry at most MAX_BATCH items in a bulk action's
+#list. The bulk actions and advance_market_months, whose cost grows with the portfolio, run on a worker
+#thread (loop.run_in_executor) so they do not hold up the other sessions; a session still waits for the
+#reply to one request before it reads the next, so its game is only ever touched by one thread at a time.
+#
+#The catalogs are loaded once and shared by every session; the engine never modifies them. With
+#--profile FILE, one instrumentation.Instrumentation measures the actions of every session and writes
+#its snapshot to FILE periodically.
+#
+#Backpressure: a session reads its next request only once the reply to the previous one has been
+#flushed to the socket (writer.drain()), so a client that stops reading stops being served instead of
+#piling up replies in memory. Request lines are limited to MAX_LINE bytes, and connections beyond
+#max_sessions are refused with an error line. Sessions that send nothing for idle_timeout seconds are
+#closed and their game is dropped.
+#
+#Usage: python server.py [--host 127.0.0.1] [--port 8765] [--idle-timeout 300] [--max-sessions 10000] [--profile FILE]
+#The server prints "Listening on HOST:PORT" once it accepts connections; --port 0 picks a free port.
+
+import argparse
+import asyncio
+import inspect
+import json
+
+import catalog
+import engine
+from models import Company, OffshoreEntity, Product
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_IDLE_TIMEOUT = 300.0
+DEFAULT_MAX_SESSIONS = 10000
+MAX_LINE = 64 * 1024
+# The most months one request may advance: 100 years.
+MAX_MONTHS = 1200
+# The most items one request may create, move or reassign at once.
+MAX_BATCH = 1000
+
+# The positions in 'args' of the months and of the bulk lists, per action.
+MONTHS_ARGUMENT = {'advance_months': 0, 'advance_market_months': 1}
+BATCH_ARGUMENTS = {'create_companies': (0,), 'add_products': (0,), 'reassign_management': (0,),
+                   'add_companies_to_offshore': (1,), 'reassign_offshore': (0, 1)}
+# The actions run on a worker thread.
+HEAVY_ACTIONS = frozenset(BATCH_ARGUMENTS) | {'advance_market_months'}
+# The signatures the arguments of a request are checked against, by action.
+SIGNATURES = {name: inspect.signature(function) for name, function in engine.ACTIONS.items()}
+
+DIFFICULTY_LEVELS = (1, 0.75, 0.5, 0.25)
+
+
+class Session:
+    """
+    One player's connection: the game they are playing, or None before their first new_game.
+    """
+
+    __slots__ = ('state', 'actions')
+
+    def __init__(self):
+        self.state = None
+        self.actions = 0
+
+
+def describe(result):
+    """
+    This function turns what an engine action returned into something JSON can encode: records become
+    short summaries, and tuples and lists are converted item by item.
+    """
+    if isinstance(result, (Company, OffshoreEntity)):
+        return {'id': result.id, 'name': result.name}
+    if isinstance(result, Product):
+        return {'name': result.name, 'investment': result.investment}
+    if isinstance(result, (tuple, list)):
+        return [describe(item) for item in result]
+    if isinstance(result, dict):
+        return {'name': result.get('name')}
+    return result
+
+
+def status(state):
+    """
+    This function returns the fields every reply carries about the session's game.
+    """
+    return {'cash_balance': state.cash_balance, 'months_passed': state.months_passed,
+            'companies': len(state.companies), 'monthly_cash_flow': engine.monthly_cash_flow(state)}
+
+
+def check_limits(action, args):
+    """
+    This function checks a request against MAX_MONTHS and MAX_BATCH.
+
+    :return: the error message for a request that asks for too much, or None.
+    """
+    position = MONTHS_ARGUMENT.get(action)
+    if position is not None and len(args) > position:
+        months = args[position]
+        if isinstance(months, int) and months > MAX_MONTHS:
+            return f"A request can advance at most {MAX_MONTHS} months."
+    for position in BATCH_ARGUMENTS.get(action, ()):
+        if len(args) > position and isinstance(args[position], list) and len(args[position]) > MAX_BATCH:
+            return f"A request can carry at most {MAX_BATCH} items."
+    return None
+
+
+def handle_request(session, request, catalogs, instrumentation=None):
+    """
+    This function performs one request of a session.
+
+    :param session: the Session the request came from
+    :param request: the decoded request, a dictionary with the keys 'action' and optionally 'args'
+    :param catalogs: a tuple of (business_types, management_personnel, offshore_locations)
+    :param instrumentation: the instrumentation.Instrumentation new games are measured with, or None
+    :return: the reply, as a dictionary.
+    """
+    if not isinstance(request, dict) or not isinstance(request.get('action'), str):
+        return {'ok': False, 'error': "A request needs an 'action'."}
+    action = request['action']
+    args = request.get('args', [])
+    if not isinstance(args, list):
+        return {'ok': False, 'error': "'args' must be a list."}
+
+    if action == 'new_game':
+        if len(args) != 2 or not isinstance(args[0], str) or args[1] not in DIFFICULTY_LEVELS:
+            return {'ok': False, 'error': f"new_game takes a player name and a difficulty level ({', '.join(map(str, DIFFICULTY_LEVELS))})."}
+        session.state = engine.new_game(args[0], args[1], *catalogs)
+        session.state.instrumentation = instrumentation
+        return dict(ok=True, result=None, **status(session.state))
+    if session.state is None:
+        return {'ok': False, 'error': "No game in progress. Start one with new_game."}
+    if action == 'status':
+        return dict(ok=True, result=None, **status(session.state))
+    signature = SIGNATURES.get(action)
+    if signature is not None:
+        try:
+            signature.bind(session.state, *args)
+        except TypeError:
+            return {'ok': False, 'error': f"Invalid arguments for {action}."}
+    error = check_limits(action, args)
+    if error is not None:
+        return {'ok': False, 'error': error}
+    try:
+        result = engine.apply_action(session.state, action, *args)
+    except engine.ActionError as error:
+        return {'ok': False, 'error': str(error)}
+    session.actions += 1
+    return dict(ok=True, result=describe(result), **status(session.state))
+
+
+class GameServer:
+    """
+    An asyncio TCP server running one Session per connection.
+    """
+
+    def __init__(self, catalogs, idle_timeout=DEFAULT_IDLE_TIMEOUT, max_sessions=DEFAULT_MAX_SESSIONS, instrumentation=None):
+        """
+        :param catalogs: a tuple of (business_types, management_personnel, offshore_locations) shared
+        by every session
+        :param idle_timeout: the seconds a session may stay silent before it is closed
+        :param max_sessions: the most sessions served at once; further connections are refused
+        :param instrumentation: an instrumentation.Instrumentation every session's actions are measured
+        with, or None
+        """
+        self.catalogs = catalogs
+        self.instrumentation = instrumentation
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sessions = 0
+        self.served = 0
+        self.evicted = 0
+        self.refused = 0
+        self.server = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        This function starts listening.
+
+        :return: the (host, port) pair the server listens on.
+        """
+        self.server = await asyncio.start_server(self.serve_session, host, port, limit=MAX_LINE)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        """
+        This function stops accepting connections and waits until the listening socket is closed.
+        """
+        self.server.close()
+        await self.server.wait_closed()
+
+    @staticmethod
+    async def _send(writer, reply):
+        writer.write(json.dumps(reply, separators=(',', ':')).encode() + b'\n')
+        await writer.drain()
+
+    async def serve_session(self, reader, writer):
+        """
+        This function runs one session until the client quits, disconnects, goes idle or breaks the
+        protocol.
+        """
+        if self.sessions >= self.max_sessions:
+            self.refused += 1
+            try:
+                await self._send(writer, {'ok': False, 'error': "The server is full. Please try again later."})
+            except ConnectionError:
+                pass
+            writer.close()
+            return
+        self.sessions += 1
+        self.served += 1
+        session = Session()
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    self.evicted += 1
+                    await self._send(writer, {'ok': False, 'error': "Session closed after being idle."})
+                    break
+                except ValueError:
+                    # The line is longer than MAX_LINE.
+                    await self._send(writer, {'ok': False, 'error': f"Requests are limited to {MAX_LINE} bytes."})
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await self._send(writer, {'ok': False, 'error': "Requests must be JSON objects, one per line."})
+                    continue
+                if isinstance(request, dict) and request.get('action') == 'quit':
+                    await self._send(writer, {'ok': True, 'result': None})
+                    break
+                if isinstance(request, dict) and request.get('action') in HEAVY_ACTIONS:
+                    reply = await asyncio.get_running_loop().run_in_executor(
+                        None, handle_request, session, request, self.catalogs, self.instrumentation)
+                else:
+                    reply = handle_request(session, request, self.catalogs, self.instrumentation)
+                await self._send(writer, reply)
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            session.state = None
+            writer.close()
+
+
+async def serve(host, port, idle_timeout, max_sessions, profile_path=None):
+    """
+    This function loads the catalogs and serves until the process is stopped.
+
+    :param profile_path: if given, every action is measured and the measurements written to this file
+    periodically
+    """
+    measured = None
+    if profile_path is not None:
+        import instrumentation
+        measured = instrumentation.Instrumentation(profile_path)
+    server = GameServer(catalog.load_catalogs(), idle_timeout, max_sessions, measured)
+    bound_host, bound_port = await server.start(host, port)
+    print(f"Listening on {bound_host}:{bound_port}", flush=True)
+    async with server.server:
+        await server.server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve many games at once over a line-based TCP protocol.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--idle-timeout', type=float, default=DEFAULT_IDLE_TIMEOUT)
+    parser.add_argument('--max-sessions', type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument('--profile', default=None, help="measure every action and write the measurements to this file")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.idle_timeout, args.max_sessions, args.profile))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,317 @@
+#Batch manager matching: which manager of the roster should run which company.
+#
+#Every manager in state.management_personnel is treated as one person who runs at most one company.
+#A manager m hired for company c raises its monthly profit from R * g (the revenue and profit margin
+#without a manager) to R * (1 + revenue boost) * (g + profit margin boost), and costs the salary. The
+#matcher maximizes the portfolio's monthly profit net of the salaries of the managers it hires, under
+#the rule hire_management applies: the salary may not exceed the company's monthly profit without a
+#manager. Companies can also be left without a manager. Profits are the unscaled figures the engine
+#caches, the same ones hire_management checks.
+#
+#That is a maximum-weight bipartite matching. Two steps keep it fast:
+#
+#1. Pruning. With k managers, each manager only needs its k best companies as candidates: if it ends
+#   up with a company outside them, one of those k is free (the other k - 1 managers hold at most
+#   k - 1 of them) and at least as good. So only the union of those short lists goes to the solver,
+#   and with the shipped roster of three managers the matcher runs in linear time in the number of
+#   companies. When there are more managers than companies, the roles are swapped.
+#
+#   The weights are computed with NumPy when it is installed, a block of managers at a time.
+#
+#2. Assignment. The pruned problem is solved with scipy.optimize.linear_sum_assignment when SciPy is
+#   installed, and with a shortest-augmenting-path Hungarian algorithm otherwise. Weights are clipped
+#   at zero, so a manager matched with a zero weight is simply not hired.
+#
+#The matcher's model deliberately differs from the game's own arithmetic in two ways:
+#
+#- Salaries. The engine never charges a salary: update_cash_balance adds every company's taxed profit
+#  and nothing else, and the salary only decides whether a manager can be hired. The matcher still
+#  subtracts the salaries it hires, so its objective is profit net of salaries as if they were paid.
+#  A plan's 'monthly_gain' is that objective; its 'cash_flow_gain' is what applying it actually
+#  changes the game's monthly cash flow by (engine.monthly_cash_flow), after difficulty, operating cost
+#  and tax.
+#- Exclusivity. hire_management lets the same roster entry run any number of companies. The matcher
+#  treats every entry as one person, so at most len(state.management_personnel) companies get a
+#  manager: three with the shipped roster. Under the game's rules alone every company would simply
+#  take the affordable manager with the largest boosts, with no matching to solve.
+
+import heapq
+
+import engine
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+class StaffingPlan:
+    """
+    A plan computed by plan_management. Apply it with apply().
+
+    'assignments' lists the (company index, manager index or None) pairs of the companies whose manager
+    changes, in the form engine.reassign_management takes, and 'monthly_gain' how much the monthly
+    profit net of salaries rises once they are applied. The engine does not charge salaries, so the
+    monthly cash flow of the game changes by 'cash_flow_gain' instead.
+    """
+
+    __slots__ = ('assignments', 'monthly_gain', 'cash_flow_gain')
+
+    def __init__(self, assignments, monthly_gain, cash_flow_gain=0.0):
+        self.assignments = assignments
+        self.monthly_gain = monthly_gain
+        self.cash_flow_gain = cash_flow_gain
+
+    def apply(self, state):
+        """
+        This function applies the plan to the game it was computed for, in one engine action.
+
+        :param state: the GameState the plan was computed for
+        :return: the list of companies that were changed.
+        """
+        return engine.apply_action(state, 'reassign_management', self.assignments)
+
+
+def _hungarian(weights, rows, columns):
+    """
+    This function solves a maximum-weight assignment with the shortest augmenting path form of the
+    Hungarian algorithm, in O(rows^2 * columns) time.
+
+    :param weights: a list of `rows` lists of `columns` weights; rows must not outnumber columns
+    :return: a list with the column assigned to every row.
+    """
+    infinity = float('inf')
+    # 1-based potentials and matching, with column 0 as the root of every augmenting path.
+    row_potential = [0.0] * (rows + 1)
+    column_potential = [0.0] * (columns + 1)
+    row_of_column = [0] * (columns + 1)
+    previous = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        row_of_column[0] = row
+        column = 0
+        distance = [infinity] * (columns + 1)
+        used = [False] * (columns + 1)
+        while True:
+            used[column] = True
+            current_row = row_of_column[column]
+            costs = weights[current_row - 1]
+            base = row_potential[current_row]
+            delta = infinity
+            next_column = 0
+            for j in range(1, columns + 1):
+                if not used[j]:
+                    reduced = -costs[j - 1] - base - column_potential[j]
+                    if reduced < distance[j]:
+                        distance[j] = reduced
+                        previous[j] = column
+                    if distance[j] < delta:
+                        delta = distance[j]
+                        next_column = j
+            for j in range(columns + 1):
+                if used[j]:
+                    row_potential[row_of_column[j]] += delta
+                    column_potential[j] -= delta
+                else:
+                    distance[j] -= delta
+            column = next_column
+            if row_of_column[column] == 0:
+                break
+        while column:
+            row_of_column[column] = row_of_column[previous[column]]
+            column = previous[column]
+    assigned = [0] * rows
+    for j in range(1, columns + 1):
+        if row_of_column[j]:
+            assigned[row_of_column[j] - 1] = j - 1
+    return assigned
+
+
+def solve_assignment(weights):
+    """
+    This function finds the assignment of rows to columns with the highest total weight, using SciPy
+    when it is installed.
+
+    :param weights: a rectangular list of lists, or a NumPy array, of non-negative weights
+    :return: a list of (row, column) pairs, one for every row or every column, whichever is fewer.
+    """
+    rows = len(weights)
+    columns = len(weights[0]) if rows else 0
+    if rows == 0 or columns == 0:
+        return []
+    if linear_sum_assignment is not None:
+        row_indexes, column_indexes = linear_sum_assignment(np.asarray(weights, dtype=float), maximize=True)
+        return list(zip(row_indexes.tolist(), column_indexes.tolist()))
+    if np is not None and isinstance(weights, np.ndarray):
+        weights = weights.tolist()
+    if rows <= columns:
+        return list(enumerate(_hungarian(weights, rows, columns)))
+    transposed = [list(column) for column in zip(*weights)]
+    return [(row, column) for column, row in enumerate(_hungarian(transposed, columns, rows))]
+
+
+def _pruned(manager_count, company_count, weight):
+    """
+    This function prunes the matching to the candidates that can be part of a best matching (see the
+    notes at the top of this file).
+
+    :param weight: a function of (company position, manager index) returning the clipped weight
+    :return: a tuple of (company positions, manager indexes, weights) where the weights are a list of
+    lists with a row per manager and a column per company.
+    """
+    if manager_count <= company_count:
+        candidates = set()
+        for manager_index in range(manager_count):
+            best = heapq.nlargest(manager_count, range(company_count), key=lambda position: weight(position, manager_index))
+            candidates.update(position for position in best if weight(position, manager_index) > 0)
+        positions = sorted(candidates)
+        manager_indexes = list(range(manager_count))
+    else:
+        candidates = set()
+        for position in range(company_count):
+            best = heapq.nlargest(company_count, range(manager_count), key=lambda manager_index: weight(position, manager_index))
+            candidates.update(manager_index for manager_index in best if weight(position, manager_index) > 0)
+        positions = list(range(company_count))
+        manager_indexes = sorted(candidates)
+    return positions, manager_indexes, [[weight(position, manager_index) for position in positions] for manager_index in manager_indexes]
+
+
+# The number of managers whose weights are computed at once by _pruned_numpy, to bound its memory.
+BLOCK_ROWS = 256
+
+
+def _pruned_numpy(managers, companies, bases):
+    """
+    This function is _pruned computed with NumPy, a block of managers at a time. The weights are the
+    same floating-point operations in the same order, so both give the same matching.
+
+    :return: a tuple of (company positions, manager indexes, weights) where the weights are an array
+    with a row per manager and a column per company.
+    """
+    revenue = np.array([base[0] for base in bases], dtype=float)
+    profit_margin = np.array([base[1] for base in bases], dtype=float)
+    base_profit = np.array([base[2] for base in bases], dtype=float)
+    capital = np.array([company.capital for company in companies], dtype=float)
+    salary = np.array([manager['salary'] for manager in managers], dtype=float)
+    revenue_boost = np.array([manager['revenue_boost'] for manager in managers], dtype=float)
+    profit_margin_boost = np.array([manager['profit_margin_boost'] for manager in managers], dtype=float)
+
+    def weights(manager_rows, company_columns):
+        m = manager_rows[:, None]
+        boosted = (revenue[company_columns] * (1 + revenue_boost[m])) * capital[company_columns] * (profit_margin[company_columns] + profit_margin_boost[m])
+        gain = boosted - salary[m] - base_profit[company_columns]
+        gain[(salary[m] > base_profit[company_columns]) | ~(gain > 0)] = 0.0
+        return gain
+
+    manager_count = len(managers)
+    company_count = len(companies)
+    all_managers = np.arange(manager_count)
+    all_companies = np.arange(company_count)
+    if manager_count == 0 or company_count == 0:
+        return [], [], np.zeros((0, 0))
+    if manager_count <= company_count:
+        keep = np.zeros(company_count, dtype=bool)
+        for start in range(0, manager_count, BLOCK_ROWS):
+            block = weights(all_managers[start:start + BLOCK_ROWS], all_companies)
+            if manager_count < company_count:
+                best = np.argpartition(-block, manager_count - 1, axis=1)[:, :manager_count]
+                keep[best[np.take_along_axis(block, best, axis=1) > 0]] = True
+            else:
+                keep |= (block > 0).any(axis=0)
+        positions = np.flatnonzero(keep)
+        manager_indexes = all_managers
+    else:
+        keep = np.zeros(manager_count, dtype=bool)
+        for start in range(0, company_count, BLOCK_ROWS):
+            # Rows are companies here, so the block is computed transposed.
+            block = weights(all_managers, all_companies[start:start + BLOCK_ROWS]).T
+            best = np.argpartition(-block, company_count - 1, axis=1)[:, :company_count]
+            keep[best[np.take_along_axis(block, best, axis=1) > 0]] = True
+        positions = all_companies
+        manager_indexes = np.flatnonzero(keep)
+    return positions.tolist(), manager_indexes.tolist(), weights(np.asarray(manager_indexes), np.asarray(positions))
+
+
+def plan_management(state):
+    """
+    This function computes which manager of the roster should run which company to get the highest
+    monthly profit net of salaries, reassigning the managers companies already have where that helps.
+    Companies run by a manager that is not in the roster are left alone.
+
+    :param state: the GameState to plan for
+    :return: a StaffingPlan.
+    """
+    managers = state.management_personnel
+    roster = {id(manager): index for index, manager in enumerate(managers)}
+    companies = []
+    bases = []
+    current = {}
+    for company in state.companies:
+        if company.management is not None and id(company.management) not in roster:
+            continue
+        revenue, profit_margin = engine._without_manager(company)
+        monthly_revenue = revenue * company.capital
+        companies.append(company)
+        bases.append((revenue, profit_margin, monthly_revenue * profit_margin))
+        if company.management is not None:
+            current[company.id] = roster[id(company.management)]
+
+    def added_profit(position, manager_index):
+        # The monthly profit net of salary the manager adds to the company.
+        revenue, profit_margin, base_profit = bases[position]
+        manager = managers[manager_index]
+        boosted = (revenue * (1 + manager['revenue_boost'])) * companies[position].capital * (profit_margin + manager['profit_margin_boost'])
+        return boosted - manager['salary'] - base_profit
+
+    def weight(position, manager_index):
+        # The added profit, or 0 if the manager cannot be hired or does not pay off.
+        if managers[manager_index]['salary'] > bases[position][2]:
+            return 0.0
+        gain = added_profit(position, manager_index)
+        return gain if gain > 0 else 0.0
+
+    if np is not None:
+        positions, manager_indexes, matrix = _pruned_numpy(managers, companies, bases)
+    else:
+        positions, manager_indexes, matrix = _pruned(len(managers), len(companies), weight)
+    target = {}
+    monthly_gain = 0.0
+    for row, column in solve_assignment(matrix):
+        if matrix[row][column] > 0:
+            target[companies[positions[column]].id] = manager_indexes[row]
+            monthly_gain += float(matrix[row][column])
+
+    assignments = []
+    for position, company in enumerate(companies):
+        manager_index = target.get(company.id)
+        previous = current.get(company.id)
+        if previous is not None:
+            monthly_gain -= added_profit(position, previous)
+        if manager_index != previous:
+            assignments.append((company.id, manager_index))
+    return StaffingPlan(assignments, monthly_gain, _cash_flow_gain(state, assignments))
+
+
+def _cash_flow_gain(state, assignments):
+    """
+    This function returns how much the monthly cash flow of the game changes once a list of (company
+    index, manager index or None) assignments is applied, computed like engine.company_figures.
+    """
+    managers = state.management_personnel
+    gain = 0.0
+    for company_index, manager_index in assignments:
+        company = state.companies[company_index]
+        revenue, profit_margin = engine._without_manager(company)
+        if manager_index is not None:
+            manager = managers[manager_index]
+            revenue *= (1 + manager['revenue_boost'])
+            profit_margin += manager['profit_margin_boost']
+        profit = revenue * company.capital * profit_margin
+        operating_cost = company.capital * engine.OPERATING_COST_RATE
+        taxed_profit = ((profit * state.difficulty_level) - operating_cost) * (1 - engine.company_tax_rate(state, company))
+        gain += taxed_profit - company.taxed_profit
+    return gain
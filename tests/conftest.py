@@ -0,0 +1,61 @@
+#Shared fixtures for the tests: the game's own catalogs, a new game with enough cash for any action, and
+#a small portfolio with a manager, an offshore company and products.
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+
+import catalog
+import engine
+
+# Indexes in the shipped catalogs.
+CONSTRUCTION = 1
+DROPSHIPPING = 2
+JOHN_DOE = 0
+ST_KITTS = 0
+
+
+@pytest.fixture(scope='session')
+def catalogs():
+    return catalog.load_catalogs(ROOT)
+
+
+@pytest.fixture
+def state(catalogs):
+    game = engine.new_game("Tester", 0.75, *catalogs)
+    game.cash_balance = 10000000.0
+    return game
+
+
+@pytest.fixture
+def portfolio(state):
+    """
+    A game with a Dropshipping company (0) and a Construction company (1) with a manager, an offshore
+    company the Construction company belongs to, and two products.
+    """
+    engine.apply_action(state, 'create_company', DROPSHIPPING, "Shop", 1000)
+    engine.apply_action(state, 'create_company', CONSTRUCTION, "Builder", 600000)
+    engine.apply_action(state, 'hire_management', 1, JOHN_DOE)
+    engine.apply_action(state, 'create_offshore_company', ST_KITTS, "Holding")
+    engine.apply_action(state, 'add_company_to_offshore', 0, 1)
+    engine.apply_action(state, 'add_product', 0, "Widget", 5000)
+    engine.apply_action(state, 'add_product', 1, "Tower", 20000)
+    return state
+
+
+def figures(state):
+    """
+    This function returns everything the actions can change in a game, for comparing two games.
+    """
+    return (state.cash_balance, state.months_passed, state.total_monthly_revenue, state.total_monthly_profit,
+            state.total_taxed_profit,
+            [(company.name, company.industry, company.capital, company.revenue, company.profit_margin, company.offshore_id,
+              None if company.management is None else company.management['name'],
+              [(product.name, product.investment, product.revenue) for product in company.products])
+             for company in state.companies],
+            [(entity.name, entity.location, entity.tax_rate, sorted(entity.companies)) for entity in state.offshore_companies])
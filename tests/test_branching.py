@@ -0,0 +1,100 @@
+import copy
+
+import pytest
+
+from conftest import CONSTRUCTION, DROPSHIPPING, JOHN_DOE, ST_KITTS, figures
+
+import branching
+import engine
+import journal
+
+ACTIONS = [
+    ('create_company', (CONSTRUCTION, "Yard", 800000)),
+    ('hire_management', (2, JOHN_DOE)),
+    ('add_company_to_offshore', (0, 2)),
+    ('add_product', (2, "Gadget", 3000)),
+    ('advance_months', (6,)),
+    ('company_action', (1, 40000)),
+    ('remove_product', (1, 0)),
+    ('fire_management', (1,)),
+    ('remove_company_from_offshore', (0, 1)),
+    ('advance_month', ()),
+]
+
+
+def test_what_if_matches_playing_a_deep_copy(portfolio):
+    before = figures(portfolio)
+    expected = copy.deepcopy(portfolio)
+    for action, args in ACTIONS:
+        engine.apply_action(expected, action, *args)
+    engine.advance_months(expected, 24)
+    branch = branching.what_if(portfolio, ACTIONS, months=24)
+    assert figures(branch) == figures(expected)
+    assert figures(portfolio) == before
+    # The game stays playable on its own after the branch.
+    engine.apply_action(portfolio, 'add_product', 1, "Crane", 1000)
+    assert figures(branch) == figures(expected)
+
+
+def test_forks_of_a_large_portfolio_do_not_see_each_others_changes(state):
+    engine.apply_action(state, 'create_companies', [(DROPSHIPPING, f"Shop {i}", 1000) for i in range(3 * branching.CHUNK + 5)])
+    engine.apply_action(state, 'create_offshore_company', ST_KITTS, "Holding")
+    before = figures(state)
+    branch = branching.fork(state)
+    engine.apply_action(branch, 'add_companies_to_offshore', 0, [1, branching.CHUNK + 1, 3 * branching.CHUNK + 4])
+    engine.apply_action(branch, 'create_company', CONSTRUCTION, "Builder", 600000)
+    assert figures(state) == before
+    kept = (branch.total_monthly_revenue, branch.total_monthly_profit, branch.total_taxed_profit)
+    engine.recompute_totals(branch)
+    assert kept == pytest.approx((branch.total_monthly_revenue, branch.total_monthly_profit, branch.total_taxed_profit))
+    assert len(branch.companies) == len(state.companies) + 1
+    assert sorted(branch.offshore_companies[0].companies) == [1, branching.CHUNK + 1, 3 * branching.CHUNK + 4]
+
+
+def test_undo_and_redo_walk_back_and_forth(portfolio):
+    timeline = branching.Timeline(portfolio)
+    steps = [figures(portfolio)]
+    for action, args in ACTIONS:
+        timeline.apply(action, *args)
+        steps.append(figures(portfolio))
+    for expected in reversed(steps[:-1]):
+        timeline.undo()
+        assert figures(portfolio) == expected
+    with pytest.raises(engine.ActionError):
+        timeline.undo()
+    for expected in steps[1:]:
+        timeline.redo()
+        assert figures(portfolio) == expected
+    with pytest.raises(engine.ActionError):
+        timeline.redo()
+
+
+def test_a_new_action_forgets_the_undone_ones(portfolio):
+    timeline = branching.Timeline(portfolio, limit=2)
+    for action, args in ACTIONS[:3]:
+        timeline.apply(action, *args)
+    timeline.undo()
+    timeline.apply('advance_month')
+    with pytest.raises(engine.ActionError):
+        timeline.redo()
+    timeline.undo()
+    timeline.undo()
+    # Only the last two actions are kept.
+    with pytest.raises(engine.ActionError):
+        timeline.undo()
+
+
+def test_a_failed_action_leaves_the_timeline_unchanged(portfolio):
+    timeline = branching.Timeline(portfolio)
+    before = figures(portfolio)
+    with pytest.raises(engine.ActionError):
+        timeline.apply('add_products', [(0, "A", 100), (1, "B", -1)])
+    assert figures(portfolio) == before
+    assert not timeline.undo_stack
+
+
+def test_a_game_with_a_journal_cannot_be_undone(catalogs, tmp_path):
+    state = journal.start_game(str(tmp_path / 'game.journal'), "Tester", 0.75, *catalogs)
+    with pytest.raises(ValueError):
+        branching.Timeline(state)
+    state.journal.close()
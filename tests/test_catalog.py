@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import catalog
+
+
+@pytest.fixture
+def lazy_path(tmp_path):
+    path = tmp_path / 'management.jsonl'
+    entries = [{'name': f"Manager {index}", 'salary': 1000 + index, 'revenue_boost': 0.1, 'profit_margin_boost': 0.01}
+               for index in range(50)]
+    path.write_text(''.join(json.dumps(entry) + '\n' for entry in entries), encoding='utf-8')
+    return str(path), entries
+
+
+def test_shipped_catalogs_load_and_index_by_name(catalogs):
+    business_types, management_personnel, offshore_locations = catalogs
+    assert business_types.get("Dropshipping")['startup_capital'] == 1000
+    assert management_personnel.index_of("John Doe") == 0
+    assert offshore_locations.get("Atlantis") is None
+
+
+def test_lazy_catalog_reads_entries_by_position_and_name(lazy_path):
+    path, entries = lazy_path
+    with catalog.load_catalog(path, use_cache=False) as lazy:
+        assert len(lazy) == len(entries)
+        assert lazy[7] == entries[7]
+        assert lazy[-1] == entries[-1]
+        assert lazy.get("Manager 12") == entries[12]
+        assert lazy[3:6] == entries[3:6]
+
+
+def test_indexing_during_iteration_does_not_disturb_it(lazy_path):
+    path, entries = lazy_path
+    with catalog.load_catalog(path, use_cache=False) as lazy:
+        seen = []
+        for position, entry in enumerate(lazy):
+            seen.append(entry)
+            assert lazy[len(entries) - 1 - position] == entries[len(entries) - 1 - position]
+        assert seen == entries
+
+
+def test_lazy_catalog_closes_its_file(lazy_path):
+    path, entries = lazy_path
+    with catalog.load_catalog(path, use_cache=False) as lazy:
+        first = lazy[0]
+    assert lazy._file.closed
+    assert lazy[0] is first
+
+
+def test_invalid_entries_are_rejected(tmp_path):
+    path = tmp_path / 'business_types.json'
+    path.write_text(json.dumps([{'name': "Shop", 'startup_capital': -5, 'revenue': 1, 'profit_margin': 0.1}]), encoding='utf-8')
+    with pytest.raises(catalog.CatalogError):
+        catalog.load_catalog(str(path), use_cache=False)
@@ -0,0 +1,138 @@
+import math
+
+import pytest
+
+from conftest import CONSTRUCTION, DROPSHIPPING, JOHN_DOE, figures
+
+import engine
+from engine import ActionError
+
+BAD_AMOUNTS = [-1e9, -1, 0, math.nan, math.inf, -math.inf, "100"]
+
+# Every action that takes money from the player, with its arguments around the amount.
+AMOUNT_ACTIONS = [
+    ('create_company', lambda amount: (DROPSHIPPING, "Shop", amount)),
+    ('create_companies', lambda amount: ([(DROPSHIPPING, "A", 1000), (DROPSHIPPING, "B", amount)],)),
+    ('company_action', lambda amount: (0, amount)),
+    ('add_product', lambda amount: (0, "Product", amount)),
+    ('add_products', lambda amount: ([(0, "A", 100), (1, "B", amount)],)),
+]
+
+
+@pytest.mark.parametrize('amount', BAD_AMOUNTS)
+@pytest.mark.parametrize('action, arguments', AMOUNT_ACTIONS, ids=[action for action, _ in AMOUNT_ACTIONS])
+def test_amounts_must_be_finite_and_positive(portfolio, action, arguments, amount):
+    before = figures(portfolio)
+    with pytest.raises(ActionError):
+        engine.apply_action(portfolio, action, *arguments(amount))
+    assert figures(portfolio) == before
+
+
+def test_actions_cannot_spend_more_than_the_cash_balance(portfolio):
+    portfolio.cash_balance = 500.0
+    before = figures(portfolio)
+    for action, arguments in AMOUNT_ACTIONS:
+        with pytest.raises(ActionError):
+            engine.apply_action(portfolio, action, *arguments(1000))
+    assert figures(portfolio) == before
+
+
+def test_create_company_pays_its_capital(state):
+    company = engine.apply_action(state, 'create_company', DROPSHIPPING, "Shop", 2500)
+    assert state.cash_balance == 10000000.0 - 2500
+    assert (company.id, company.industry, company.capital) == (0, "Dropshipping", 2500)
+    with pytest.raises(ActionError):
+        engine.apply_action(state, 'create_company', DROPSHIPPING, "Shop", 999)
+
+
+def test_bulk_action_applies_in_full_or_not_at_all(portfolio):
+    before = figures(portfolio)
+    with pytest.raises(ActionError):
+        engine.apply_action(portfolio, 'create_companies', [(DROPSHIPPING, "A", 1000), (99, "B", 1000)])
+    with pytest.raises(ActionError):
+        engine.apply_action(portfolio, 'add_companies_to_offshore', 0, [0, 1])
+    with pytest.raises(ActionError):
+        engine.apply_action(portfolio, 'reassign_management', [(0, JOHN_DOE), (0, None)])
+    assert figures(portfolio) == before
+
+
+def test_bulk_actions_match_the_single_actions(catalogs):
+    single = engine.new_game("Tester", 0.75, *catalogs, cash_balance=1e9)
+    bulk = engine.new_game("Tester", 0.75, *catalogs, cash_balance=1e9)
+    specs = [(DROPSHIPPING, "A", 1000), (CONSTRUCTION, "B", 500000), (DROPSHIPPING, "C", 3000)]
+    for spec in specs:
+        engine.apply_action(single, 'create_company', *spec)
+    engine.apply_action(bulk, 'create_companies', specs)
+    products = [(0, "P", 100), (2, "Q", 250), (0, "R", 75)]
+    for spec in products:
+        engine.apply_action(single, 'add_product', *spec)
+    engine.apply_action(bulk, 'add_products', products)
+    # add_products refreshes each company once, so the totals are summed in a different order.
+    single_figures, bulk_figures = figures(single), figures(bulk)
+    assert single_figures[2:5] == pytest.approx(bulk_figures[2:5])
+    assert single_figures[:2] + single_figures[5:] == bulk_figures[:2] + bulk_figures[5:]
+
+
+def test_hiring_and_firing_a_manager_restores_the_company(portfolio):
+    company = portfolio.companies[1]
+    revenue, profit_margin = company.revenue, company.profit_margin
+    engine.apply_action(portfolio, 'fire_management', 1)
+    engine.apply_action(portfolio, 'hire_management', 1, JOHN_DOE)
+    assert portfolio.companies[1].revenue == pytest.approx(revenue)
+    assert portfolio.companies[1].profit_margin == pytest.approx(profit_margin)
+    with pytest.raises(ActionError):
+        engine.apply_action(portfolio, 'hire_management', 1, JOHN_DOE)
+
+
+def test_cached_totals_match_a_full_recomputation(portfolio):
+    engine.apply_action(portfolio, 'remove_company_from_offshore', 0, 1)
+    engine.apply_action(portfolio, 'company_action', 0, 700)
+    engine.apply_action(portfolio, 'remove_product', 0, 0)
+    kept = (portfolio.total_monthly_revenue, portfolio.total_monthly_profit, portfolio.total_taxed_profit)
+    engine.recompute_totals(portfolio)
+    assert kept == pytest.approx((portfolio.total_monthly_revenue, portfolio.total_monthly_profit, portfolio.total_taxed_profit))
+    assert engine.advance_month(portfolio) == pytest.approx(
+        engine.update_cash_balance(portfolio.cash_balance - portfolio.total_taxed_profit, portfolio.companies,
+                                   portfolio.offshore_companies, portfolio.difficulty_level))
+
+
+def test_advance_months_matches_advancing_one_month_at_a_time(portfolio, catalogs):
+    stepped = engine.new_game("Tester", 0.75, *catalogs)
+    for slot in ('cash_balance', 'companies', 'offshore_companies', 'total_monthly_revenue', 'total_monthly_profit', 'total_taxed_profit'):
+        setattr(stepped, slot, getattr(portfolio, slot))
+    for _ in range(24):
+        engine.advance_month(stepped)
+    assert engine.apply_action(portfolio, 'advance_months', 24) == 24
+    assert portfolio.months_passed == stepped.months_passed
+    assert portfolio.cash_balance == pytest.approx(stepped.cash_balance)
+
+
+@pytest.mark.parametrize('months', [1.5, math.nan, "12"])
+def test_advance_months_takes_whole_months(portfolio, months):
+    with pytest.raises(ActionError):
+        engine.apply_action(portfolio, 'advance_months', months)
+
+
+def test_unknown_action(state):
+    with pytest.raises(ActionError, match="Unknown action"):
+        engine.apply_action(state, 'print_money', 1e9)
+
+
+def test_removing_a_product_takes_back_what_it_adds_under_any_manager(state):
+    company = engine.apply_action(state, 'create_company', CONSTRUCTION, "Builder", 600000)
+    revenue, profit_margin = company.revenue, company.profit_margin
+    engine.apply_action(state, 'add_product', 0, "Tower", 20000)
+    engine.apply_action(state, 'hire_management', 0, JOHN_DOE)
+    engine.apply_action(state, 'remove_product', 0, 0)
+    engine.apply_action(state, 'fire_management', 0)
+    assert state.companies[0].revenue == pytest.approx(revenue)
+
+    engine.apply_action(state, 'hire_management', 0, JOHN_DOE)
+    engine.apply_action(state, 'add_product', 0, "Crane", 20000)
+    engine.apply_action(state, 'fire_management', 0)
+    engine.apply_action(state, 'remove_product', 0, 0)
+    assert state.companies[0].revenue == pytest.approx(revenue)
+    assert state.companies[0].profit_margin > profit_margin
+    kept = (state.total_monthly_revenue, state.total_monthly_profit, state.total_taxed_profit)
+    engine.recompute_totals(state)
+    assert kept == pytest.approx((state.total_monthly_revenue, state.total_monthly_profit, state.total_taxed_profit))
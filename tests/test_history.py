@@ -0,0 +1,115 @@
+import csv
+import io
+import math
+from array import array
+
+import pytest
+
+from conftest import DROPSHIPPING
+
+import engine
+import history
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def merging(request, monkeypatch):
+    """
+    Runs a test with the NumPy merge and with the pure Python one.
+    """
+    if request.param == 'python':
+        monkeypatch.setattr(history, 'np', None)
+    elif history.np is None:
+        pytest.skip("NumPy is not installed")
+    return request.param
+
+
+def months(series, count):
+    # Month m has a cash balance (a stock) of m and a revenue (a flow) of 10 * m.
+    for month in range(1, count + 1):
+        series.append(month, 1, array('d', (month, 10 * month)))
+
+
+def test_the_last_tier_is_a_ring():
+    series = history.Series(1, lambda column: True, factors=(), memory_budget=5 * 24)
+    assert series.capacity == 5
+    for month in range(1, 9):
+        series.append(month, 1, array('d', (month,)))
+    assert len(series) == 5
+    assert [(start, span, values[0]) for start, span, values in series.rows()] == [(month, 1, month) for month in range(4, 9)]
+    # The ring has wrapped, so the rows come from both ends of the buffer.
+    assert len(list(series.segments())) == 2
+
+
+def test_months_merge_into_quarters_and_quarters_into_years(merging):
+    series = history.Series(2, lambda column: column == 0, factors=(3, 4), memory_budget=4 * 3 * 32)
+    assert series.capacity == 4
+    months(series, 100)
+    rows = [(start, span, tuple(values)) for start, span, values in series.rows()]
+    assert {span for _, span, _ in rows} == {1, 3, 12}
+    assert [span for _, span, _ in rows] == sorted((span for _, span, _ in rows), reverse=True)
+    assert rows[-1][0] + rows[-1][1] - 1 == 100
+    for (start, span, _), (next_start, _, _) in zip(rows, rows[1:]):
+        assert next_start == start + span
+    for start, span, (cash, revenue) in rows:
+        last = start + span - 1
+        assert cash == last
+        assert revenue == pytest.approx(10 * (start + last) / 2)
+
+
+def test_flows_are_averaged_over_the_months_that_have_figures(merging):
+    series = history.Series(1, lambda column: False, factors=(3,), memory_budget=1)
+    for start, span, value in ((1, 1, math.nan), (2, 2, 4.0), (4, 1, 10.0), (5, 1, 0.0)):
+        series.append(start, span, array('d', (value,)))
+    quarter = next(series.rows())
+    assert (quarter[0], quarter[1]) == (1, 4)
+    assert quarter[2][0] == pytest.approx((2 * 4.0 + 10.0) / 3)
+
+
+def test_a_small_budget_still_holds_a_merge_of_rows_per_tier():
+    series = history.Series(2, lambda column: False, factors=(3, 4), memory_budget=1)
+    assert series.capacity == 4
+    months(series, 50)
+    assert series.nbytes() > 1
+    roomy = history.Series(2, lambda column: False, factors=(3, 4), memory_budget=64 * 1024)
+    months(roomy, 5000)
+    assert roomy.capacity > 4
+    assert roomy.nbytes() <= 64 * 1024
+
+
+def test_company_columns_grow_within_the_budget(state):
+    state.history = history.HistoryRecorder(memory_budget=256 * 1024)
+    engine.apply_action(state, 'create_company', DROPSHIPPING, "First", 1000)
+    engine.apply_action(state, 'advance_months', 1)
+    engine.apply_action(state, 'advance_month')
+    capacity = state.history.companies.capacity
+    engine.apply_action(state, 'create_companies', [(DROPSHIPPING, f"Shop {i}", 1000) for i in range(200)])
+    engine.apply_action(state, 'advance_month')
+    assert state.history.companies.capacity < capacity
+    assert state.history.nbytes() <= 256 * 1024
+    rows = list(state.history.companies.rows())
+    assert len(rows) == 3
+    # Companies that did not exist yet have no figures.
+    assert math.isnan(rows[0][2][3]) and not math.isnan(rows[-1][2][3 * 200])
+
+
+def test_csv_is_written_oldest_row_first(state):
+    state.history = history.HistoryRecorder()
+    engine.apply_action(state, 'create_company', DROPSHIPPING, "Shop", 1000)
+    for _ in range(3):
+        engine.apply_action(state, 'advance_month')
+    engine.apply_action(state, 'create_company', DROPSHIPPING, "Late", 1000)
+    engine.apply_action(state, 'advance_months', 12)
+
+    portfolio = io.StringIO(newline='')
+    state.history.write_csv(portfolio)
+    lines = list(csv.reader(io.StringIO(portfolio.getvalue())))
+    assert lines[0] == ['start_month', 'months', *history.PORTFOLIO_FIELDS]
+    assert [(int(line[0]), int(line[1])) for line in lines[1:]] == [(1, 1), (2, 1), (3, 1), (4, 12)]
+    assert float(lines[-1][2]) == state.cash_balance
+
+    companies = io.StringIO(newline='')
+    state.history.write_csv(companies, 'companies')
+    lines = list(csv.reader(io.StringIO(companies.getvalue())))
+    assert lines[0] == ['start_month', 'months', 'company_id', *history.COMPANY_FIELDS]
+    assert [(int(line[0]), int(line[2])) for line in lines[1:]] == [(1, 0), (2, 0), (3, 0), (4, 0), (4, 1)]
+    assert float(lines[-1][5]) == state.companies[1].taxed_profit
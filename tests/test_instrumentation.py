@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from conftest import DROPSHIPPING
+
+import branching
+import engine
+import instrumentation
+
+
+def test_actions_and_the_monthly_cash_update_are_measured(state, tmp_path):
+    measured = state.instrumentation = instrumentation.Instrumentation(str(tmp_path / 'profile.json'))
+    engine.apply_action(state, 'create_company', DROPSHIPPING, "Shop", 1000)
+    for _ in range(5):
+        engine.apply_action(state, 'advance_month')
+    engine.apply_action(state, 'advance_months', 12)
+    try:
+        engine.apply_action(state, 'create_company', DROPSHIPPING, "Shop", -1)
+    except engine.ActionError:
+        pass
+    actions = measured.snapshot(state)['actions']
+    assert {name: stats['calls'] for name, stats in actions.items()} == {
+        'advance_month': 5, 'advance_months': 1, 'create_company': 2, 'update_cash_balance': 6}
+    assert actions['create_company']['errors'] == 1
+    assert state.months_passed == 17
+    assert all(isinstance(stats['net_blocks'], int) for stats in actions.values())
+    measured.dump()
+    assert json.loads((tmp_path / 'profile.json').read_text())['actions'].keys() == actions.keys()
+
+
+def test_measuring_the_cash_update_does_not_change_it(portfolio):
+    plain = branching.fork(portfolio)
+    measured = branching.fork(portfolio)
+    measured.instrumentation = instrumentation.Instrumentation(net_blocks=False)
+    for game in (plain, measured):
+        engine.apply_action(game, 'advance_month')
+        engine.apply_action(game, 'advance_months', 7, None, 1e12)
+    assert (measured.cash_balance, measured.months_passed) == (plain.cash_balance, plain.months_passed)
+    assert plain.cash_balance == pytest.approx(portfolio.cash_balance + 8 * portfolio.total_taxed_profit)
+    assert measured.instrumentation.actions['update_cash_balance'].calls == 2
+
+
+def test_a_call_that_does_nothing_has_no_net_blocks():
+    measured = instrumentation.Instrumentation()
+    for _ in range(1000):
+        measured.measure(None, 'nothing', lambda: None, ())
+    assert measured.actions == {'nothing': measured.actions['nothing']}
+    assert abs(measured.actions['nothing'].net_blocks) < 10
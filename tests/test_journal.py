@@ -0,0 +1,100 @@
+import os
+
+from conftest import CONSTRUCTION, DROPSHIPPING, JOHN_DOE, ST_KITTS, figures
+
+import engine
+import journal
+
+ACTIONS = [
+    ('create_company', (DROPSHIPPING, "Shop", 1000)),
+    ('create_company', (CONSTRUCTION, "Builder", 600000)),
+    ('hire_management', (1, JOHN_DOE)),
+    ('create_offshore_company', (ST_KITTS, "Holding")),
+    ('add_company_to_offshore', (0, 1)),
+    ('add_product', (0, "Widget", 5000)),
+    ('advance_months', (3,)),
+    ('remove_product', (0, 0)),
+    ('company_action', (0, 700)),
+    ('advance_month', ()),
+]
+
+
+def start(catalogs, path, checkpoint_interval=journal.DEFAULT_CHECKPOINT_INTERVAL):
+    return journal.start_game(str(path), "Tester", 0.75, *catalogs, cash_balance=2000000, checkpoint_interval=checkpoint_interval)
+
+
+def play(state, actions):
+    for action, args in actions:
+        engine.apply_action(state, action, *args)
+
+
+def test_replay_rebuilds_the_game(catalogs, tmp_path):
+    path = tmp_path / 'game.journal'
+    state = start(catalogs, path, checkpoint_interval=4)
+    play(state, ACTIONS)
+    state.journal.close()
+    for use_checkpoints in (True, False):
+        replayed, seq = journal.replay(str(path), use_checkpoints)
+        assert seq == len(ACTIONS)
+        assert figures(replayed) == figures(state)
+
+
+def test_resume_continues_after_a_line_cut_short(catalogs, tmp_path):
+    path = tmp_path / 'game.journal'
+    state = start(catalogs, path, checkpoint_interval=0)
+    play(state, ACTIONS[:6])
+    state.journal.close()
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write('{"seq": 7, "action": "advance_mo')
+    resumed = journal.resume(str(path))
+    play(resumed, ACTIONS[6:])
+    resumed.journal.close()
+    assert [entry['seq'] for entry in journal.read_entries(str(path))[1:]] == list(range(1, len(ACTIONS) + 1))
+
+
+def test_resume_truncates_the_lines_after_a_corrupt_one(catalogs, tmp_path):
+    path = tmp_path / 'game.journal'
+    state = start(catalogs, path, checkpoint_interval=0)
+    play(state, ACTIONS[:6])
+    state.journal.close()
+    lines = path.read_bytes().splitlines(keepends=True)
+    lines[3] = b'{"seq": 3, "action": garbage}\n'
+    path.write_bytes(b''.join(lines))
+
+    resumed = journal.resume(str(path))
+    expected = start(catalogs, tmp_path / 'expected.journal', checkpoint_interval=0)
+    play(expected, ACTIONS[:2])
+    assert figures(resumed) == figures(expected)
+    play(resumed, ACTIONS[2:])
+    resumed.journal.close()
+    seqs = [entry['seq'] for entry in journal.read_entries(str(path))[1:]]
+    assert seqs == list(range(1, len(ACTIONS) + 1))
+    assert figures(journal.replay(str(path))[0]) == figures(resumed)
+
+
+def test_resume_keeps_deleting_old_checkpoints(catalogs, tmp_path):
+    path = tmp_path / 'game.journal'
+    state = start(catalogs, path, checkpoint_interval=2)
+    play(state, ACTIONS[:6])
+    state.journal.close()
+    resumed = journal.resume(str(path), checkpoint_interval=2)
+    play(resumed, ACTIONS[6:])
+    resumed.journal.close()
+    checkpoints = sorted(name for name in os.listdir(tmp_path) if name.endswith('.bts'))
+    assert checkpoints == ['game.journal.10.bts', 'game.journal.8.bts']
+    assert figures(journal.replay(str(path))[0]) == figures(resumed)
+
+
+def test_resume_deletes_the_checkpoints_of_dropped_lines(catalogs, tmp_path):
+    path = tmp_path / 'game.journal'
+    state = start(catalogs, path, checkpoint_interval=2)
+    play(state, ACTIONS[:4])
+    state.journal.close()
+    lines = path.read_bytes().splitlines(keepends=True)
+    # Lines: start, 1, 2, checkpoint 2, 3, 4, checkpoint 4. Corrupt action 3.
+    lines[4] = b'corrupt\n'
+    path.write_bytes(b''.join(lines))
+    resumed = journal.resume(str(path), checkpoint_interval=2)
+    resumed.journal.close()
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.bts')) == ['game.journal.2.bts']
+    assert resumed.journal.seq == 2
@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from conftest import CONSTRUCTION, DROPSHIPPING, JOHN_DOE
+
+import branching
+import engine
+import ledger
+
+
+def test_the_ledger_follows_every_product_change(state):
+    engine.apply_action(state, 'create_companies', [(DROPSHIPPING, f"Shop {i}", 1000) for i in range(5)]
+                        + [(CONSTRUCTION, "Builder", 600000)])
+    state.ledger = ledger.ProductLedger.from_state(state)
+    rng = random.Random(3)
+    for step in range(300):
+        index = rng.randrange(len(state.companies))
+        if step % 3 == 2 and state.companies[index].products:
+            engine.apply_action(state, 'remove_product', index, rng.randrange(len(state.companies[index].products)))
+        elif step % 7 == 0:
+            engine.apply_action(state, 'add_products', [(index, "Batch", 50), (5, "Batch", 75)])
+        else:
+            engine.apply_action(state, 'add_product', index, f"Product {step}", rng.randrange(10, 1000))
+        if step == 100:
+            engine.apply_action(state, 'hire_management', 5, JOHN_DOE)
+    exact = ledger.ProductLedger.from_state(state)
+    assert state.ledger.summary()[:2] == (exact.summary()[0], pytest.approx(exact.summary()[1]))
+    assert state.ledger.summary()[2] == pytest.approx(exact.summary()[2])
+    for company in state.companies:
+        count, investment, revenue = state.ledger.company_summary(company.id)
+        assert count == len(company.products)
+        assert investment == pytest.approx(sum(product.investment for product in company.products))
+        assert revenue == pytest.approx(sum(product.revenue for product in company.products))
+    assert state.ledger.company_summary(len(state.companies)) == (0, 0.0, 0.0)
+    # The offset index finds every product, also after removed rows were compacted away.
+    assert state.ledger.removed_rows < len(state.ledger.names)
+    for company in state.companies:
+        for index, product in enumerate(company.products):
+            assert state.ledger.product(company.id, index) == (product.name, product.investment, product.revenue)
+    products = [(company.id, product.name, product.revenue) for company in state.companies for product in company.products]
+    best = sorted(products, key=lambda item: -item[2])[:10]
+    assert [revenue for _, _, revenue in state.ledger.top(10)] == [revenue for _, _, revenue in best]
+
+
+def ledger_figures(state):
+    exact = ledger.ProductLedger.from_state(state)
+    assert state.ledger.summary()[0] == exact.summary()[0]
+    assert state.ledger.summary()[1:] == pytest.approx(exact.summary()[1:])
+    for company in state.companies:
+        assert state.ledger.company_summary(company.id) == pytest.approx(exact.company_summary(company.id))
+        for index in range(len(company.products)):
+            assert state.ledger.product(company.id, index) == exact.product(company.id, index)
+    return state.ledger.summary()
+
+
+def test_undo_and_redo_refresh_the_ledger(portfolio):
+    engine.apply_action(portfolio, 'create_companies', [(DROPSHIPPING, f"Shop {i}", 1000) for i in range(150)])
+    portfolio.ledger = ledger.ProductLedger.from_state(portfolio)
+    timeline = branching.Timeline(portfolio)
+    steps = [('add_products', ([(index, "Batch", 10 + index) for index in range(0, 150, 7)],)), ('remove_product', (1, 0)),
+             ('create_company', (DROPSHIPPING, "Late", 1000)), ('add_product', (152, "Late product", 500))]
+    seen = [ledger_figures(portfolio)]
+    for action, args in steps:
+        timeline.apply(action, *args)
+        seen.append(ledger_figures(portfolio))
+    for expected in reversed(seen[:-1]):
+        timeline.undo()
+        assert ledger_figures(portfolio) == pytest.approx(expected)
+    for expected in seen[1:]:
+        timeline.redo()
+        assert ledger_figures(portfolio) == pytest.approx(expected)
+
+
+def test_restoring_refreshes_only_the_changed_companies(portfolio, monkeypatch):
+    engine.apply_action(portfolio, 'create_companies', [(DROPSHIPPING, f"Shop {i}", 1000) for i in range(300)])
+    portfolio.ledger = ledger.ProductLedger.from_state(portfolio)
+    timeline = branching.Timeline(portfolio)
+    timeline.apply('add_product', 200, "Widget", 100)
+    refreshed = []
+    refresh = portfolio.ledger.refresh
+    monkeypatch.setattr(portfolio.ledger, 'refresh', lambda state, ids: refreshed.append(ids) or refresh(state, ids))
+    timeline.undo()
+    timeline.redo()
+    assert refreshed == [[200], [200]]
+
+
+def test_removed_rows_are_compacted_away(state):
+    engine.apply_action(state, 'create_company', DROPSHIPPING, "Shop", 1000)
+    state.ledger = ledger.ProductLedger.from_state(state)
+    engine.apply_action(state, 'add_products', [(0, f"Product {i}", 100 + i) for i in range(4)])
+    for _ in range(3):
+        engine.apply_action(state, 'remove_product', 0, 0)
+    assert state.ledger.removed_rows == 0 and state.ledger.names == ["Product 3"]
+    assert state.ledger.product(0, 0) == ("Product 3", 103, state.companies[0].products[0].revenue)
+    assert state.ledger.top(5) == [(0, "Product 3", state.companies[0].products[0].revenue)]
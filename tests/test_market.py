@@ -0,0 +1,97 @@
+import math
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from conftest import CONSTRUCTION, DROPSHIPPING, ST_KITTS, figures
+
+import engine
+import history
+import instrumentation
+import journal
+import market
+
+
+def build(state):
+    engine.apply_action(state, 'create_companies', [(DROPSHIPPING, f"Shop {i}", 1000 + i) for i in range(20)])
+    engine.apply_action(state, 'create_company', CONSTRUCTION, "Builder", 600000)
+    engine.apply_action(state, 'create_offshore_company', ST_KITTS, "Holding")
+    engine.apply_action(state, 'add_companies_to_offshore', 0, [3, 20])
+
+
+def model(state, seed=11):
+    return market.MarketModel(state.business_types, state.offshore_locations, seed=seed, event_probability=0.5)
+
+
+def test_market_months_are_journaled_and_replay(catalogs, tmp_path):
+    path = tmp_path / 'game.journal'
+    state = journal.start_game(str(path), "Tester", 0.75, *catalogs, cash_balance=10000000, checkpoint_interval=5)
+    build(state)
+    for _ in range(3):
+        market.advance_month(state, model(state))
+    engine.apply_action(state, 'add_product', 0, "Widget", 500)
+    assert market.advance_months(state, model(state), 24, target_cash=1e12) == 24
+    state.journal.close()
+    actions = [entry['action'] for entry in journal.read_entries(str(path)) if 'action' in entry]
+    assert actions.count('advance_market_months') == 4
+    market._models.clear()
+    for use_checkpoints in (True, False):
+        replayed, _ = journal.replay(str(path), use_checkpoints)
+        assert figures(replayed) == figures(state)
+        assert replayed.months_passed == 27
+
+
+def test_a_model_rebuilt_from_its_settings_plays_the_same_months(state, catalogs):
+    build(state)
+    rebuilt = engine.new_game("Tester", 0.75, *catalogs)
+    rebuilt.cash_balance = 10000000.0
+    build(rebuilt)
+    assert figures(rebuilt) == figures(state)
+    market.advance_months(state, model(state), 12)
+    market._models.clear()
+    assert engine.apply_action(rebuilt, 'advance_market_months', model(state).settings(), 12) == 12
+    assert rebuilt.cash_balance == state.cash_balance
+
+
+def test_history_records_what_the_market_months_produced(state):
+    build(state)
+    state.history = history.HistoryRecorder()
+    markets = model(state)
+    portfolio = markets.portfolio(state)
+    expected = [markets.figures(portfolio, month, state.difficulty_level) for month in range(6)]
+    cash = [state.cash_balance]
+    for _ in range(6):
+        cash.append(market.advance_month(state, markets))
+    rows = list(state.history.portfolio.rows())
+    assert [row[0] for row in rows] == list(range(1, 7))
+    for (start, span, values), (revenue, profit, taxed_profit), before, after in zip(rows, expected, cash, cash[1:]):
+        assert values[0] == after
+        assert values[3] == pytest.approx(after - before)
+        assert values[1:3] == pytest.approx([revenue.sum(), profit.sum()])
+        assert values[1] != pytest.approx(state.total_monthly_revenue)
+    revenue, profit, taxed_profit = expected[-1]
+    last = list(state.history.companies.rows())[-1][2]
+    assert list(last[:3 * len(state.companies)]) == pytest.approx([value for company in zip(revenue, profit, taxed_profit) for value in company])
+
+
+def test_market_months_are_measured(state):
+    build(state)
+    state.instrumentation = instrumentation.Instrumentation()
+    market.advance_months(state, model(state), 5)
+    assert state.instrumentation.snapshot()['actions']['advance_market_months']['calls'] == 1
+
+
+@pytest.mark.parametrize('settings, months', [
+    ([1, 2], 3), ({'seed': 1}, 2.5), ({'seed': 1}, "3"), ({'seed': 1, 'bogus': 2}, 3), ({'seed': [1]}, 3),
+    ({'seed': -1}, 3), ({'demand_persistence': 1}, 3), ({'tax_shock': math.nan}, 3), ({'event_probability': True}, 3),
+])
+def test_malformed_market_months_are_refused(portfolio, settings, months):
+    before = figures(portfolio)
+    with pytest.raises(engine.ActionError):
+        engine.apply_action(portfolio, 'advance_market_months', settings, months)
+    assert figures(portfolio) == before
+
+
+def test_every_setting_of_a_model_is_checked(state):
+    assert market.SETTING_CHECKS.keys() == model(state).settings().keys()
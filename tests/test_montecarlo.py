@@ -0,0 +1,56 @@
+import pytest
+
+import montecarlo
+
+RUNS = 24
+MONTHS = 36
+
+
+def config(strategy):
+    return {'strategy': strategy, 'base_seed': 7, 'difficulty_levels': montecarlo.DIFFICULTY_LEVELS,
+            'starting_cash': (2000, 20000), 'months': MONTHS, 'target_cash': 30000, 'market': False, 'record': False}
+
+
+def assert_same_stats(merged, single):
+    assert (merged.runs, merged.bankrupt, merged.reached_target) == (single.runs, single.bankrupt, single.reached_target)
+    assert (merged.cash_min, merged.cash_max) == (single.cash_min, single.cash_max)
+    assert merged.cash_histogram == single.cash_histogram
+    assert merged.months_to_bankruptcy == single.months_to_bankruptcy
+    assert merged.months_to_target == single.months_to_target
+    assert merged.cash_mean == pytest.approx(single.cash_mean)
+    assert merged.cash_stdev == pytest.approx(single.cash_stdev)
+    for percent in (0, 10, 50, 90, 100):
+        assert merged.cash_percentile(percent) == single.cash_percentile(percent)
+
+
+@pytest.mark.parametrize('strategy', ['dropshipping', 'expansion'])
+def test_chunks_merge_into_the_summary_of_a_single_pass(catalogs, strategy):
+    totals = montecarlo.run_batch(catalogs, RUNS, strategy, workers=1, base_seed=7, starting_cash=(2000, 20000),
+                                  months=MONTHS, target_cash=30000, chunk_size=5)
+    montecarlo._init_worker(catalogs)
+    single, _ = montecarlo.run_chunk(config(strategy), 0, RUNS)
+    assert set(totals) == set(single)
+    for level in totals:
+        assert_same_stats(totals[level], single[level])
+    assert sum(stats.runs for stats in totals.values()) == RUNS
+
+
+def test_each_run_is_summarised_by_its_own_outcome(catalogs):
+    montecarlo._init_worker(catalogs)
+    levels = montecarlo.DIFFICULTY_LEVELS
+    expected = {level: montecarlo.OutcomeStats() for level in levels}
+    for run_index in range(8):
+        one, _ = montecarlo.run_chunk(config('expansion'), run_index, run_index + 1)
+        level = levels[run_index % len(levels)]
+        assert one[level].runs == 1
+        expected[level].merge(one[level])
+    totals, _ = montecarlo.run_chunk(config('expansion'), 0, 8)
+    for level in levels:
+        assert_same_stats(expected[level], totals[level])
+
+
+@pytest.mark.parametrize('cash', [-2.5e7, -3.0, -0.5, 0.0, 0.99, 1.0, 1234.5, 9.9e9])
+def test_a_cash_amount_is_at_or_above_its_bucket_floor(cash):
+    bucket = montecarlo.cash_bucket(cash)
+    assert montecarlo.bucket_floor(bucket) <= cash
+    assert cash < montecarlo.bucket_floor(bucket + 1)
@@ -0,0 +1,72 @@
+import itertools
+
+import pytest
+
+from conftest import CONSTRUCTION, DROPSHIPPING, figures
+
+import engine
+import offshore
+
+
+@pytest.fixture
+def mixed(state):
+    """
+    A game with two profitable companies and one that loses money.
+    """
+    engine.apply_action(state, 'create_company', DROPSHIPPING, "Shop", 1000)
+    engine.apply_action(state, 'create_company', CONSTRUCTION, "Builder", 600000)
+    loser = engine.apply_action(state, 'create_company', DROPSHIPPING, "Loser", 50000)
+    loser.revenue = 0.001
+    engine.refresh_company(state, loser)
+    assert offshore.pre_tax_figure(state, loser) < 0
+    return state
+
+
+def best_gain(state, horizon, budget):
+    """
+    This function finds the best net gain by trying every choice of at most two new offshore companies.
+    """
+    rates = [engine.DEFAULT_TAX_RATE] + [entity.tax_rate for entity in state.offshore_companies]
+    locations = state.offshore_locations
+    best = 0.0
+    for size in (0, 1, 2):
+        for chosen in itertools.combinations(range(len(locations)), size):
+            cost = sum(locations[index]['setup_cost'] for index in chosen)
+            if cost > budget:
+                continue
+            available = rates + [locations[index]['tax_rate'] for index in chosen]
+            monthly = 0.0
+            for company in state.companies:
+                figure = offshore.pre_tax_figure(state, company)
+                rate = min(available) if figure > 0 else max(available)
+                monthly += figure * (engine.company_tax_rate(state, company) - rate)
+            best = max(best, monthly * horizon - cost)
+    return best
+
+
+@pytest.mark.parametrize('horizon, budget', [(1, 10000000), (24, 10000000), (24, 30000), (600, 60000)])
+def test_plan_is_the_best_choice_of_new_offshore_companies(mixed, horizon, budget):
+    plan = offshore.plan_offshore(mixed, horizon, budget)
+    assert plan.gain == pytest.approx(best_gain(mixed, horizon, budget))
+    assert plan.setup_cost <= budget
+
+
+def test_applying_the_plan_adds_its_monthly_gain(mixed):
+    before = mixed.total_taxed_profit
+    plan = offshore.plan_offshore(mixed, 24)
+    plan.apply(mixed)
+    assert mixed.total_taxed_profit - before == pytest.approx(plan.monthly_gain)
+
+
+@pytest.mark.parametrize('new_offshore_companies, assignments', [
+    ([(1, "Holding")], [(0, 0.0)]),
+    ([(1, "Holding")], [(0, True)]),
+    ([(1.0, "Holding")], [(0, 0)]),
+    ([(1, "Holding")], [(0.0, 0)]),
+    ([(1, "Holding")], [(0, "0")]),
+])
+def test_malformed_plans_leave_the_game_unchanged(mixed, new_offshore_companies, assignments):
+    before = figures(mixed)
+    with pytest.raises(engine.ActionError):
+        engine.apply_action(mixed, 'reassign_offshore', new_offshore_companies, assignments)
+    assert figures(mixed) == before
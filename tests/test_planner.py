@@ -0,0 +1,33 @@
+import heapq
+import time
+
+import engine
+import planner
+
+
+def test_memory_counts_every_frontier_push(state, monkeypatch):
+    pushed = []
+    push = heapq.heappush
+
+    def heappush(heap, entry):
+        pushed.append(entry[3])
+        push(heap, entry)
+
+    monkeypatch.setattr(planner.heapq, 'heappush', heappush)
+    context = (state.player_name, state.difficulty_level, state.business_types, state.management_personnel, state.offshore_locations)
+    search = planner._Search(context, 1e8, state.months_passed + 24, planner.DEFAULT_FRACTIONS, planner.DEFAULT_MAX_COMPANIES,
+                             None, time.time() + 3600, 1 << 62, 300)
+    search.add(planner.snapshot(state), frozenset(), None)
+    search.run()
+    assert len(pushed) == search.pushes
+    assert search.memory == sum(planner._node_bytes(node) for node in pushed)
+
+
+def test_plan_replays_to_its_cash_balance(catalogs):
+    state = engine.new_game("Planner", 1, *catalogs)
+    plan = planner.plan_cash_target(state, 1000000, max_months=60, max_expansions=500)
+    assert plan.actions is not None
+    assert state.months_passed == 0
+    plan.apply(state)
+    assert (state.months_passed, state.cash_balance) == (plan.months, plan.cash_balance)
+    assert planner.format_plan(plan).endswith(('best among the generated moves)', f"stopped by {plan.stopped})"))
@@ -0,0 +1,53 @@
+import pytest
+
+from conftest import CONSTRUCTION, DROPSHIPPING, ST_KITTS
+
+import engine
+import render
+
+
+@pytest.mark.parametrize('item_count, pages', [(0, 1), (1, 1), (20, 1), (21, 2), (40, 2), (41, 3)])
+def test_page_count(item_count, pages):
+    assert render.page_count(item_count) == pages
+
+
+def test_numbers_continue_across_pages():
+    items = [f"item {i}" for i in range(1, 46)]
+    pages = [render.page_lines(items, page, str) for page in range(3)]
+    assert [len(lines) for lines in pages] == [21, 21, 6]
+    assert pages[1][0] == "21. item 21"
+    assert pages[2][-2] == "45. item 45"
+    assert [lines[-1] for lines in pages] == [f"-- Page {page} of 3 (45 entries) --" for page in (1, 2, 3)]
+    # A list that fits on one page has no footer.
+    assert render.page_lines(items[:3], 0, str) == ["1. item 1", "2. item 2", "3. item 3"]
+
+
+@pytest.fixture
+def companies(state):
+    for index in range(12):
+        engine.apply_action(state, 'create_company', DROPSHIPPING, f"Shop {index}", 1000 + 100 * (index * 7 % 12))
+    engine.apply_action(state, 'create_company', CONSTRUCTION, "Builder", 600000)
+    return state
+
+
+def test_top_companies_are_the_most_profitable_in_order(companies):
+    ranked = sorted(enumerate(companies.companies, 1), key=lambda numbered: numbered[1]['monthly_profit'], reverse=True)
+    assert render.top_companies(companies.companies, 4) == ranked[:4]
+    assert render.top_companies(companies.companies, 4)[0][1].name == "Builder"
+
+
+def test_large_portfolios_are_summarised(companies):
+    engine.apply_action(companies, 'create_offshore_company', ST_KITTS, "Holding")
+    lines = render.player_info_lines(companies, top=3)
+    assert "Companies: 13 (Construction: 1, Dropshipping: 12)" in lines
+    assert "Top 3 by monthly profit:" in lines
+    numbered = [line for line in lines if line[:1].isdigit()]
+    assert [line.split('.')[0] for line in numbered] == ['13', '6', '11', '1']
+    assert numbered[-1] == "1. Holding (St Kitts and Nevis) - 0 companies"
+
+
+def test_small_portfolios_are_listed_in_full(portfolio):
+    lines = render.player_info_lines(portfolio)
+    assert lines[lines.index("Companies:") + 1].startswith("1. Shop (Dropshipping) - Management: None")
+    assert lines[lines.index("Companies:") + 2].startswith("2. Builder (Construction) - Management: John Doe")
+    assert lines[lines.index("Offshore Companies:") + 1].endswith(" - 1 companies")
@@ -0,0 +1,79 @@
+import math
+import random
+
+import pytest
+
+import montecarlo
+import results
+
+OUTCOMES = ('bankrupt', 'target', 'horizon')
+
+
+@pytest.fixture
+def runs():
+    rng = random.Random(3)
+    rows = []
+    for index in range(250):
+        difficulty = rng.choice((0.25, 0.5, 1.0))
+        final_cash = rng.choice((-1.0, 1.0)) * rng.randint(0, 10 ** rng.randint(1, 8)) + rng.random()
+        rows.append((1000.0 + index, rng.choice(('game', 'montecarlo:expansion')), f"Player {index % 4}", difficulty,
+                     final_cash, rng.randint(1, 600), rng.choice(OUTCOMES), 1, 0, 0, 0.0, '{}'))
+    return rows
+
+
+@pytest.fixture
+def store(tmp_path, runs):
+    with results.ResultsStore(str(tmp_path / 'results.db'), batch_size=7) as store:
+        store.add_many(runs)
+        store.flush()
+        yield store
+
+
+@pytest.mark.parametrize('group_by', results.AGGREGATE_GROUPS)
+def test_aggregates_match_the_runs(store, runs, group_by):
+    column = results.RUN_COLUMNS.index(group_by)
+    expected = {}
+    for row in runs:
+        expected.setdefault(row[column], []).append(row)
+    aggregates = store.aggregates(group_by)
+    assert sorted(aggregates) == sorted(expected)
+    for key, rows in expected.items():
+        cash = [row[4] for row in rows]
+        summary = aggregates[key]
+        assert summary['runs'] == len(rows)
+        assert summary['bankrupt'] == sum(row[6] == 'bankrupt' for row in rows)
+        assert summary['target'] == sum(row[6] == 'target' for row in rows)
+        assert summary['mean_cash'] == pytest.approx(math.fsum(cash) / len(rows))
+        assert (summary['min_cash'], summary['max_cash']) == (min(cash), max(cash))
+        assert summary['mean_months'] == pytest.approx(sum(row[5] for row in rows) / len(rows))
+    assert len(store) == len(runs)
+
+
+@pytest.mark.parametrize('difficulty', [None, 0.5])
+def test_rank_and_percentile_match_the_sorted_runs(store, runs, difficulty):
+    cash = sorted(row[4] for row in runs if difficulty is None or row[3] == difficulty)
+    for percent in (0, 1, 25, 50, 90, 100):
+        assert store.percentile(percent, difficulty) == cash[math.floor(percent / 100 * (len(cash) - 1))]
+    for final_cash in (cash[0], cash[len(cash) // 2], cash[-1] + 1, 0.0):
+        assert store.rank(final_cash, difficulty) == 1 + sum(value > final_cash for value in cash)
+    assert [row[3] for row in store.leaderboard(5, difficulty)] == cash[:-6:-1]
+
+
+def test_an_empty_store_has_no_percentile(tmp_path):
+    with results.ResultsStore(str(tmp_path / 'results.db')) as store:
+        assert len(store) == 0
+        assert store.percentile(50) is None
+        assert store.aggregates() == {}
+
+
+def test_simulated_runs_are_stored_in_full(tmp_path, catalogs):
+    with results.ResultsStore(str(tmp_path / 'results.db'), batch_size=5) as store:
+        totals = montecarlo.run_batch(catalogs, 16, 'dropshipping', workers=1, starting_cash=(2000, 20000), months=24,
+                                      target_cash=30000, chunk_size=3, results=store)
+        aggregates = store.aggregates('difficulty')
+        assert len(store) == 16
+        for level, stats in totals.items():
+            summary = aggregates[level]
+            assert (summary['runs'], summary['bankrupt'], summary['target']) == (stats.runs, stats.bankrupt, stats.reached_target)
+            assert summary['mean_cash'] == pytest.approx(stats.cash_mean)
+            assert (summary['min_cash'], summary['max_cash']) == (stats.cash_min, stats.cash_max)
@@ -0,0 +1,38 @@
+import pytest
+
+from conftest import figures
+
+import engine
+import savegame
+
+
+def test_save_and_load_round_trip(portfolio, tmp_path):
+    engine.apply_action(portfolio, 'advance_months', 7)
+    path = str(tmp_path / 'game.bts')
+    savegame.save_game(portfolio, path)
+    loaded = savegame.load_game(path)
+    assert figures(loaded) == figures(portfolio)
+    assert (loaded.player_name, loaded.difficulty_level) == (portfolio.player_name, portfolio.difficulty_level)
+    for company in loaded.companies:
+        if company.offshore:
+            assert loaded.offshore_companies[company.offshore_id].companies[company.id] is company
+    assert engine.advance_month(loaded) == engine.advance_month(portfolio)
+
+
+def test_open_save_reads_companies_on_demand(portfolio, tmp_path):
+    path = str(tmp_path / 'game.bts')
+    savegame.save_game(portfolio, path)
+    with savegame.open_save(path) as save:
+        assert len(save) == len(portfolio.companies)
+        company = save.company(1)
+        assert (company.name, company.revenue, [product.name for product in company.products]) == \
+            (portfolio.companies[1].name, portfolio.companies[1].revenue, ["Tower"])
+        with pytest.raises(IndexError):
+            save.company(len(portfolio.companies))
+
+
+def test_a_file_that_is_not_a_save_is_rejected(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(b'not a save game at all')
+    with pytest.raises(savegame.SaveError):
+        savegame.load_game(str(path))
@@ -0,0 +1,58 @@
+import itertools
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from conftest import CONSTRUCTION, DROPSHIPPING, ST_KITTS
+
+import engine
+import sensitivity
+from models import OffshoreEntity
+
+IRELAND = 2
+
+
+@pytest.fixture
+def groups(portfolio):
+    """
+    The portfolio with companies in two offshore companies in St Kitts and Nevis and one in Ireland,
+    besides the Dropshipping company that pays the default tax rate.
+    """
+    engine.apply_action(portfolio, 'create_company', DROPSHIPPING, "Outlet", 4000)
+    engine.apply_action(portfolio, 'create_company', CONSTRUCTION, "Quarry", 900000)
+    engine.apply_action(portfolio, 'create_offshore_company', IRELAND, "Dublin")
+    engine.apply_action(portfolio, 'create_offshore_company', ST_KITTS, "Basseterre")
+    engine.apply_action(portfolio, 'add_company_to_offshore', 1, 2)
+    engine.apply_action(portfolio, 'add_company_to_offshore', 2, 3)
+    return portfolio
+
+
+def test_every_grid_point_matches_the_engine(groups, monkeypatch):
+    grid = {'difficulty_levels': [0.5, 1.0], 'default_tax_rates': [0.1, 0.15, 0.3], 'operating_cost_rates': [0.03, 0.05],
+            'location_tax_rates': {'Ireland': [0.125, 0.2]}}
+    result = sensitivity.sweep(groups, **grid)
+    assert result.axes == ('difficulty_level', 'default_tax_rate', 'operating_cost_rate', 'tax_rate:St Kitts and Nevis',
+                           'tax_rate:Ireland')
+    assert result.cash_flow.shape == (2, 3, 2, 1, 2)
+    st_kitts_rate = groups.offshore_companies[0].tax_rate
+    for index in itertools.product(*(range(size) for size in result.cash_flow.shape)):
+        parameters = result.parameters(index)
+        assert parameters['tax_rate:St Kitts and Nevis'] == st_kitts_rate
+        monkeypatch.setattr(engine, 'DEFAULT_TAX_RATE', parameters['default_tax_rate'])
+        monkeypatch.setattr(engine, 'OPERATING_COST_RATE', parameters['operating_cost_rate'])
+        offshore_companies = [OffshoreEntity(entity.id, entity.name, entity.location, parameters['tax_rate:' + entity.location])
+                              for entity in groups.offshore_companies]
+        cash_flow = engine.update_cash_balance(0.0, groups.companies, offshore_companies, parameters['difficulty_level'])
+        assert result.cash_flow[index] == pytest.approx(cash_flow)
+
+
+def test_the_current_parameters_give_the_monthly_cash_flow(groups):
+    result = sensitivity.sweep(groups)
+    assert len(result) == 1
+    assert result.argmax()['monthly_cash_flow'] == pytest.approx(engine.monthly_cash_flow(groups))
+
+
+def test_locations_without_offshore_members_are_refused(groups):
+    with pytest.raises(ValueError, match="Panama"):
+        sensitivity.sweep(groups, location_tax_rates={'Panama': [0.0]})
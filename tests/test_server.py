@@ -0,0 +1,87 @@
+import asyncio
+import json
+import math
+
+import pytest
+
+from conftest import DROPSHIPPING, figures
+
+import server
+
+
+@pytest.fixture
+def session(catalogs):
+    session = server.Session()
+    reply = server.handle_request(session, {'action': 'new_game', 'args': ["Tester", 0.75]}, catalogs)
+    assert reply['ok']
+    session.state.cash_balance = 10000000.0
+    assert server.handle_request(session, {'action': 'create_company', 'args': [DROPSHIPPING, "Shop", 1000]}, catalogs)['ok']
+    return session
+
+
+@pytest.mark.parametrize('action, args, error', [
+    ('create_companies', [[[0, "x"]]], "Every company needs"),
+    ('create_companies', [[[DROPSHIPPING, "A", 1000], 5]], "Every company needs"),
+    ('add_products', [[[0, "A"]]], "Every product needs"),
+    ('reassign_management', [[[0]]], "Every assignment needs"),
+    ('reassign_offshore', [[[0, "Holding"]], [[0, 0.0]]], "Invalid offshore company number"),
+    ('add_companies_to_offshore', ["0", [0]], "Invalid offshore company number"),
+    ('advance_months', [10 ** 400], "at most"),
+    ('advance_months', [12, "0"], "thresholds must be numbers"),
+    ('hire_management', ["0", "0"], "Invalid company number"),
+    ('company_action', [0], "Invalid arguments for company_action."),
+    ('hire_management', [0], "Invalid arguments for hire_management."),
+])
+def test_malformed_arguments_are_answered(session, catalogs, action, args, error):
+    before = figures(session.state)
+    reply = server.handle_request(session, {'action': action, 'args': args}, catalogs)
+    assert not reply['ok'] and error in reply['error']
+    assert figures(session.state) == before
+
+
+@pytest.mark.parametrize('action, args', [
+    ('advance_months', [server.MAX_MONTHS + 1]),
+    ('advance_market_months', [{'seed': 1}, server.MAX_MONTHS + 1]),
+    ('create_companies', [[[DROPSHIPPING, "A", 1000]] * (server.MAX_BATCH + 1)]),
+    ('reassign_offshore', [[], [[0, None]] * (server.MAX_BATCH + 1)]),
+])
+def test_requests_beyond_the_limits_are_refused(session, catalogs, action, args):
+    before = figures(session.state)
+    reply = server.handle_request(session, {'action': action, 'args': args}, catalogs)
+    assert not reply['ok'] and "at most" in reply['error']
+    assert figures(session.state) == before
+    assert server.handle_request(session, {'action': 'advance_months', 'args': [server.MAX_MONTHS]}, catalogs)['ok']
+
+
+@pytest.mark.parametrize('amount', [-1000, 0, math.inf, math.nan])
+def test_amounts_that_are_not_finite_and_positive_are_refused(session, catalogs, amount):
+    before = figures(session.state)
+    for action, args in (('create_company', [DROPSHIPPING, "Shop", amount]), ('company_action', [0, amount]),
+                         ('add_product', [0, "Widget", amount]), ('add_products', [[[0, "Widget", amount]]])):
+        reply = server.handle_request(session, {'action': action, 'args': args}, catalogs)
+        assert not reply['ok'] and "positive amount" in reply['error']
+    assert figures(session.state) == before
+    assert session.actions == 1
+
+
+def test_heavy_actions_are_served_from_a_worker_thread(catalogs):
+    async def play():
+        game_server = server.GameServer(catalogs)
+        host, port = await game_server.start('127.0.0.1', 0)
+        reader, writer = await asyncio.open_connection(host, port)
+        replies = []
+        for request in ({'action': 'new_game', 'args': ["Tester", 1]},
+                        {'action': 'create_companies', 'args': [[[DROPSHIPPING, "A", 1000], [DROPSHIPPING, "B", 1000]]]},
+                        {'action': 'advance_market_months', 'args': [{'seed': 1}, 12]},
+                        {'action': 'status'}):
+            writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            replies.append(json.loads(await reader.readline()))
+        writer.close()
+        await game_server.close()
+        return replies
+
+    new_game, created, played, status = asyncio.run(play())
+    assert created['ok'] and [company['name'] for company in created['result']] == ["A", "B"]
+    assert played == dict(status, result=12)
+    assert status['months_passed'] == 12 and status['companies'] == 2
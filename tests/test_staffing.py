@@ -0,0 +1,53 @@
+import itertools
+
+import pytest
+
+from conftest import CONSTRUCTION, DROPSHIPPING
+
+import branching
+import engine
+import staffing
+
+
+def net_profit(state):
+    return sum(company.monthly_profit - (company.management['salary'] if company.management is not None else 0)
+               for company in state.companies)
+
+
+@pytest.fixture
+def companies(state):
+    for index, (industry, capital) in enumerate([(CONSTRUCTION, 600000), (CONSTRUCTION, 2000000), (DROPSHIPPING, 50000),
+                                                 (CONSTRUCTION, 900000), (DROPSHIPPING, 1000)]):
+        engine.apply_action(state, 'create_company', industry, f"Company {index}", capital)
+    return state
+
+
+def test_plan_matches_a_brute_force_search(companies):
+    plan = staffing.plan_management(companies)
+    before = net_profit(companies)
+    best = 0.0
+    managers = range(len(companies.management_personnel))
+    for chosen in itertools.product([None, *managers], repeat=len(companies.companies)):
+        hired = [manager for manager in chosen if manager is not None]
+        if len(hired) != len(set(hired)):
+            continue
+        trial = branching.fork(companies)
+        try:
+            engine.apply_action(trial, 'reassign_management', list(enumerate(chosen)))
+        except engine.ActionError:
+            continue
+        best = max(best, net_profit(trial) - before)
+    assert plan.monthly_gain == pytest.approx(best)
+
+
+def test_applying_the_plan_changes_the_profit_and_cash_flow_as_predicted(companies):
+    plan = staffing.plan_management(companies)
+    net_before, cash_flow_before = net_profit(companies), engine.monthly_cash_flow(companies)
+    plan.apply(companies)
+    assert net_profit(companies) - net_before == pytest.approx(plan.monthly_gain)
+    assert engine.monthly_cash_flow(companies) - cash_flow_before == pytest.approx(plan.cash_flow_gain)
+    # Every roster entry runs at most one company.
+    hired = [company.management['name'] for company in companies.companies if company.management is not None]
+    assert 0 < len(hired) <= len(companies.management_personnel)
+    assert len(hired) == len(set(hired))
+    assert staffing.plan_management(companies).assignments == []
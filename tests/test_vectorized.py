@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from conftest import CONSTRUCTION, DROPSHIPPING
+
+import engine
+import vectorized
+
+
+@pytest.fixture
+def companies(portfolio):
+    for index in range(20):
+        industry, capital = ((CONSTRUCTION, 600000), (DROPSHIPPING, 1000))[index % 2]
+        engine.apply_action(portfolio, 'create_company', industry, f"Company {index}", capital + 37 * index)
+    engine.apply_action(portfolio, 'add_companies_to_offshore', 0, [2, 5, 11])
+    return portfolio
+
+
+def test_tax_rates_are_resolved_like_the_engine(companies):
+    assert vectorized.resolve_tax_rates(companies.companies, companies.offshore_companies) == \
+        [engine.company_tax_rate(companies, company) for company in companies.companies]
+
+
+@pytest.mark.parametrize('difficulty_level', [0.5, 0.75, 1.3])
+def test_cash_update_matches_the_engine_exactly(companies, difficulty_level):
+    arrays = vectorized.PortfolioArrays.from_companies(companies.companies, companies.offshore_companies)
+    assert len(arrays) == len(companies.companies)
+    for cash_balance in (0.0, 12345.678, -1e6):
+        assert arrays.update_cash_balance(cash_balance, difficulty_level) == \
+            engine.update_cash_balance(cash_balance, companies.companies, companies.offshore_companies, difficulty_level)
+
+
+def test_an_empty_portfolio_leaves_the_cash_unchanged(state):
+    arrays = vectorized.PortfolioArrays.from_companies([], [])
+    assert len(arrays) == 0
+    assert arrays.update_cash_balance(4321.5, state.difficulty_level) == 4321.5